@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Download images and files referenced by exported markdown
+Notion serves attachments from signed S3 URLs that expire within hours, so
+this stage fetches them with bounded concurrency, stores each one once by
+content hash, and rewrites the markdown to point at the local copy
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import mimetypes
+import tempfile
+import threading
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, unquote
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from export_manifest import load_manifest
+from link_rewrite import notion_page_id
+from tracing import span, traced_main
+
+ATTACHMENTS_DIRNAME = '_attachments'
+URL_INDEX_FILENAME = '.attachments.json'
+
+# Hosts Notion uses for uploaded files; images are downloaded from any host
+NOTION_FILE_HOSTS = (
+    'prod-files-secure.s3.us-west-2.amazonaws.com',
+    's3.us-west-2.amazonaws.com',
+    'file.notion.so',
+    'www.notion.so',
+)
+# Of those, the hosts whose links are signed: the query string is only the
+# signature and its expiry, so every link to one file differs there
+SIGNED_FILE_HOSTS = (
+    'prod-files-secure.s3.us-west-2.amazonaws.com',
+    's3.us-west-2.amazonaws.com',
+    'file.notion.so',
+)
+
+# [text](url) and ![alt](url "title")
+LINK_RE = re.compile(r'(!?)\[([^\]\n]*)\]\((https?://[^\s)]+)((?:\s+"[^"\n]*")?)\)')
+
+def url_key(url: str) -> str:
+    """Stable key for a URL: signed Notion file links lose their query, others keep it
+
+    Elsewhere the query can name a different file (?id=2) or rendition (?w=800).
+    """
+    parts = urlsplit(url)
+    query = '' if (parts.hostname or '').lower() in SIGNED_FILE_HOSTS else parts.query
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+class AttachmentDownloader:
+    def __init__(self, output_dir: str, workers: int = 8, timeout: int = 60,
+                 extra_hosts: Iterable[str] = ()):
+        self.output_dir = Path(output_dir)
+        self.store_dir = self.output_dir / ATTACHMENTS_DIRNAME
+        self.workers = workers
+        self.timeout = timeout
+        self.file_hosts = set(NOTION_FILE_HOSTS) | set(extra_hosts)
+        self.index_file = self.store_dir / URL_INDEX_FILENAME
+        self.url_index: Dict[str, str] = {}
+        if self.index_file.exists():
+            with open(self.index_file) as f:
+                self.url_index = json.load(f)
+        self.stats = {'downloaded': 0, 'cached': 0, 'deduplicated': 0, 'failed': 0, 'rewritten_files': 0}
+        self._lock = threading.Lock()
+
+    def wants(self, is_image: bool, url: str) -> bool:
+        """Images are always localized; plain links only when they point at Notion file storage"""
+        if not is_image and notion_page_id(url):
+            return False  # A link to a page (link_rewrite.py's job), not a file
+        return is_image or urlsplit(url).hostname in self.file_hosts
+
+    def stored_path(self, url: str) -> Optional[Path]:
+        name = self.url_index.get(url_key(url))
+        if name and (self.store_dir / name).exists():
+            return self.store_dir / name
+        return None
+
+    def _extension(self, url: str, content_type: str) -> str:
+        suffix = Path(unquote(urlsplit(url).path)).suffix.lower()
+        if suffix and len(suffix) <= 6:
+            return suffix
+        return mimetypes.guess_extension(content_type.split(';')[0].strip()) or ''
+
+    def download(self, url: str) -> Optional[Path]:
+        """Fetch one URL into the content-addressed store (streamed, hashed on the fly)"""
+        existing = self.stored_path(url)
+        if existing:
+            with self._lock:
+                self.stats['cached'] += 1
+            return existing
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        for attempt in range(3):
+            tmp_path = None
+            try:
+                with span('download', 'request', host=urlsplit(url).hostname, attempt=attempt), \
+                        urllib.request.urlopen(url, timeout=self.timeout) as response:
+                    digest = hashlib.sha256()
+                    with tempfile.NamedTemporaryFile(dir=self.store_dir, delete=False, suffix='.part') as tmp:
+                        tmp_path = Path(tmp.name)
+                        while True:
+                            block = response.read(1 << 16)
+                            if not block:
+                                break
+                            digest.update(block)
+                            tmp.write(block)
+                    ext = self._extension(url, response.headers.get('Content-Type', ''))
+
+                sha = digest.hexdigest()
+                name = f"{sha[:2]}/{sha}{ext}"
+                final_path = self.store_dir / name
+                with self._lock:
+                    if final_path.exists():
+                        tmp_path.unlink()
+                        self.stats['deduplicated'] += 1
+                    else:
+                        final_path.parent.mkdir(exist_ok=True)
+                        os.replace(tmp_path, final_path)
+                        self.stats['downloaded'] += 1
+                    self.url_index[url_key(url)] = name
+                return final_path
+            except Exception as e:
+                if tmp_path and tmp_path.exists():
+                    tmp_path.unlink()
+                error = e
+        print(f"   ⚠️  Could not download {url_key(url)[:80]}: {error}")
+        with self._lock:
+            self.stats['failed'] += 1
+        return None
+
+    def localize(self, markdown_files: List[str]) -> Dict[str, int]:
+        """Download every referenced attachment in the files and rewrite their links"""
+        contents: Dict[Path, str] = {}
+        urls: Dict[str, str] = {}
+        for file_path in markdown_files:
+            path = Path(file_path)
+            if path.suffix != '.md' or not path.exists():
+                continue
+            text = path.read_text(encoding='utf-8')
+            found = False
+            for bang, _, url, _ in LINK_RE.findall(text):
+                if self.wants(bool(bang), url):
+                    urls.setdefault(url_key(url), url)
+                    found = True
+            if found:
+                contents[path] = text
+
+        # One download per distinct file, however many pages reference it
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = dict(zip(urls, pool.map(self.download, urls.values())))
+
+        for path, text in contents.items():
+            def rewrite(match):
+                bang, label, url, title = match.groups()
+                local = results.get(url_key(url)) if self.wants(bool(bang), url) else None
+                if not local:
+                    return match.group(0)
+                rel = Path(os.path.relpath(local, path.parent)).as_posix()
+                return f"{bang}[{label}]({rel}{title})"
+
+            new_text = LINK_RE.sub(rewrite, text)
+            if new_text != text:
+                tmp_path = path.with_suffix('.md.tmp')
+                tmp_path.write_text(new_text, encoding='utf-8')
+                os.replace(tmp_path, path)
+                self.stats['rewritten_files'] += 1
+
+        self.save_index()
+        return self.stats
+
+    def save_index(self) -> None:
+        if not self.url_index:
+            return
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(self.url_index, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, self.index_file)
+
+def localize_last_run(output_dir: str, workers: int = 8) -> Optional[Dict[str, int]]:
+    """Localize attachments for every file the last export run wrote"""
+    manifest = load_manifest(output_dir)
+    if not manifest:
+        return None
+    files = [f for page in manifest.get('pages', []) for f in page.get('files', [])]
+    with span('attachments', 'post', files=len(files)):
+        return AttachmentDownloader(output_dir, workers=workers).localize(files)
+
+def print_stats(stats: Dict[str, int]) -> None:
+    print(f"🖼️  Attachments: {stats['downloaded']} downloaded, {stats['cached']} already stored, "
+          f"{stats['deduplicated']} duplicates, {stats['failed']} failed; "
+          f"{stats['rewritten_files']} file(s) rewritten")
+
+def main():
+    parser = argparse.ArgumentParser(description='Download attachments referenced by exported markdown')
+    parser.add_argument('files', nargs='*', help='Markdown files (default: files written by the last export run)')
+    parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    parser.add_argument('--workers', '-w', type=int, default=int(os.getenv('ATTACHMENT_WORKERS', '8')),
+                        help='Concurrent downloads (default: 8)')
+    parser.add_argument('--host', action='append', default=[],
+                        help='Extra host whose plain links count as attachments (repeatable)')
+    args = parser.parse_args()
+
+    downloader = AttachmentDownloader(args.output, workers=args.workers, extra_hosts=args.host)
+    if args.files:
+        files = args.files
+    else:
+        manifest = load_manifest(args.output)
+        if not manifest:
+            print("ℹ️  No run manifest found. Run an export first or pass files explicitly.")
+            return 0
+        files = [f for page in manifest.get('pages', []) for f in page.get('files', [])]
+
+    stats = downloader.localize(files)
+    print_stats(stats)
+    # An expired or forbidden link keeps its original URL; that's no reason to stop run.sh
+    # before the corpus and the search index have read the page feed
+    if stats['failed']:
+        print(f"⚠️  {stats['failed']} attachment(s) kept their remote link (see above)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(traced_main('attachments', main)())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite
+Starts fake_notion.js with a synthetic workspace and runs the scan and each
+exporter against it, reporting pages/sec, API requests per page and peak
+memory per stage. No Notion token or network access is needed.
+
+    python bench.py                                  # 200 pages, 4 databases x 25 rows
+    python bench.py --pages 2000 --latency 50 --rps 3
+    python bench.py --stages scan,export --json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from page_graph import PageGraph
+
+STAGES = ('scan', 'export', 'hierarchical', 'all')
+STAGE_NAMES = {
+    'scan': 'scan (get_page_ids.js)',
+    'export': 'export_notion.py',
+    'hierarchical': 'export_notion_hierarchical.py',
+    'all': 'export_all.js (run.sh)',
+}
+FAKE_TOKEN = 'secret_fake_benchmark_token'
+
+class FakeNotionServer:
+    """fake_notion.js in a child process, for the duration of a with block"""
+
+    def __init__(self, options: List[str]):
+        self.options = options
+        self.process = None
+        self.info = {}
+
+    def __enter__(self):
+        self.process = subprocess.Popen(['node', 'fake_notion.js', '--port', '0', *self.options],
+                                        stdout=subprocess.PIPE, text=True)
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError('fake_notion.js did not start')
+        self.info = json.loads(line)
+        self.url = f"http://127.0.0.1:{self.info['port']}"
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+    def call(self, path: str) -> Dict:
+        with urllib.request.urlopen(f"{self.url}{path}", timeout=10) as response:
+            return json.load(response)
+
+def run_measured(args: List[str], env: Dict[str, str], log_file: Path, capture: bool = False):
+    """Run one stage; returns (stdout, exit code, seconds, peak RSS MB of the stage's process tree)
+
+    wait4 reports the peak RSS of the child and every descendant it waited for,
+    so Node workers started by a Python exporter are included.
+    """
+    start = time.perf_counter()
+    with open(log_file, 'w') as log:
+        process = subprocess.Popen(args, env=env, text=True,
+                                   stdout=subprocess.PIPE if capture else log, stderr=log)
+        out = process.stdout.read() if capture else ''
+        if capture:
+            process.stdout.close()
+        _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return out, process.returncode, time.perf_counter() - start, usage.ru_maxrss / 1024
+
+def run_benchmark(args) -> Optional[Dict]:
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(f"❌ Unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+        return None
+
+    options = ['--pages', args.pages, '--depth', args.depth, '--databases', args.databases,
+               '--rows', args.rows, '--blocks', args.blocks, '--latency', args.latency,
+               '--jitter', args.jitter, '--rps', args.rps, '--throttle', args.throttle]
+    work_dir = Path(tempfile.mkdtemp(prefix='notion-bench-'))
+    results = []
+    try:
+        with FakeNotionServer([str(o) for o in options]) as server:
+            env = {
+                **os.environ,
+                'NOTION_BASE_URL': server.url,
+                'NOTION_TOKEN': FAKE_TOKEN,
+                'NOTION_PAGE_ID': server.info['rootPageId'],
+                'DOWNLOAD_ATTACHMENTS': 'false',
+                # The fake API has no limit of its own unless --rps gives it one
+                'API_RATE': os.getenv('API_RATE', str(args.rps or 0)),
+            }
+            # Every stage exports what the scan finds, so the scan always runs first
+            scan_dir = work_dir / 'scan'
+            scan_dir.mkdir()
+            server.call('/__reset')
+            out, code, seconds, peak = run_measured(
+                ['node', 'get_page_ids.js', FAKE_TOKEN, server.info['rootPageId'], 'true'],
+                env, work_dir / 'scan.log', capture=True)
+            scan = json.loads(out) if code == 0 else {}
+            page_ids = scan.get('pageIds', [])
+            (scan_dir / 'structure.json').write_text(json.dumps(scan))
+            if 'scan' in stages:
+                results.append(stage_result('scan', code, seconds, peak, len(page_ids), server.call('/__stats')))
+            if not page_ids:
+                print(f"❌ Scan failed, see {work_dir / 'scan.log'}")
+                args.keep = True
+                return None
+
+            for stage in [s for s in stages if s != 'scan']:
+                output_dir = work_dir / stage
+                output_dir.mkdir()
+                # The exporters read the scan result, as after `notion_cli.py full`
+                shutil.copy(scan_dir / 'structure.json', output_dir / 'structure.json')
+                PageGraph(str(output_dir)).replace(scan)
+                stage_env = {
+                    **env,
+                    'OUTPUT_DIR': str(output_dir),
+                    'NOTION_PAGE_IDS': server.info['rootPageId'],
+                }
+                command = {
+                    'export': ['python', 'export_notion.py'],
+                    'hierarchical': ['python', 'export_notion_hierarchical.py'],
+                    'all': ['node', 'export_all.js'],
+                }[stage]
+                server.call('/__reset')
+                _, code, seconds, peak = run_measured(command, stage_env, work_dir / f'{stage}.log')
+                results.append(stage_result(stage, code, seconds, peak, len(page_ids), server.call('/__stats')))
+                if code != 0:
+                    args.keep = True
+    finally:
+        if args.keep:
+            print(f"📁 Benchmark output and logs kept in: {work_dir}/")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'workspace': {
+            'pages': server.info['pages'],
+            'databases': server.info['databases'],
+            'latency_ms': args.latency,
+            'rps': args.rps,
+            'throttle': args.throttle,
+        },
+        'stages': results,
+    }
+
+def stage_result(stage: str, code: int, seconds: float, peak_mb: float, pages: int, stats: Dict) -> Dict:
+    return {
+        'stage': stage,
+        'success': code == 0,
+        'pages': pages,
+        'seconds': round(seconds, 3),
+        'pages_per_second': round(pages / seconds, 2) if seconds else None,
+        'requests': stats['requests'],
+        'requests_per_page': round(stats['requests'] / pages, 2) if pages else None,
+        'rate_limited': stats['throttled'],
+        'peak_rss_mb': round(peak_mb, 1),
+        'endpoints': stats['endpoints'],
+    }
+
+def print_results(result: Dict) -> None:
+    workspace = result['workspace']
+    limits = []
+    if workspace['latency_ms']:
+        limits.append(f"{workspace['latency_ms']}ms latency")
+    if workspace['rps']:
+        limits.append(f"{workspace['rps']} req/s limit")
+    if workspace['throttle']:
+        limits.append(f"{workspace['throttle']:.0%} random 429s")
+    print(f"\n📊 Synthetic workspace: {workspace['pages']} pages, {workspace['databases']} databases"
+          + (f" ({', '.join(limits)})" if limits else ""))
+    print(f"   {'stage':<31} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'requests':>9} "
+          f"{'req/page':>9} {'429s':>6} {'peak RSS MB':>12}")
+    for r in result['stages']:
+        status = '' if r['success'] else '  ❌ failed'
+        print(f"   {STAGE_NAMES[r['stage']]:<31} {r['pages']:>6} {r['seconds']:>8.2f} "
+              f"{r['pages_per_second'] or 0:>8.1f} {r['requests']:>9} {r['requests_per_page'] or 0:>9.2f} "
+              f"{r['rate_limited']:>6} {r['peak_rss_mb']:>12.1f}{status}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scan and exporters against a local fake Notion API')
+    parser.add_argument('--pages', type=int, default=200, help='Regular pages in the workspace (default: 200)')
+    parser.add_argument('--depth', type=int, default=3, help='Depth of the page tree (default: 3)')
+    parser.add_argument('--databases', type=int, default=4, help='Databases (default: 4)')
+    parser.add_argument('--rows', type=int, default=25, help='Rows per database (default: 25)')
+    parser.add_argument('--blocks', type=int, default=40, help='Top-level blocks per page (default: 40)')
+    parser.add_argument('--latency', type=int, default=0, help='Added latency per request in ms (default: 0)')
+    parser.add_argument('--jitter', type=int, default=0, help='Random extra latency up to this many ms (default: 0)')
+    parser.add_argument('--rps', type=float, default=0, help='Answer 429 above this many requests/s (default: off)')
+    parser.add_argument('--throttle', type=float, default=0, help='Fraction of requests answered with 429 (default: 0)')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"Stages to run (default: {','.join(STAGES)})")
+    parser.add_argument('--keep', action='store_true', help='Keep the exported files and logs')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    if not result:
+        return 1
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_results(result)
+    return 0 if all(r['success'] for r in result['stages']) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
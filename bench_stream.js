@@ -0,0 +1,189 @@
+/**
+ * Memory benchmark for the streaming page writer
+ * Exports a synthetic page (default 50,000 blocks, including large tables and
+ * nested lists) from an in-process fake Notion client and reports peak RSS
+ *
+ * Usage:
+ *   node bench_stream.js [--blocks 50000] [--mode stream|buffered|both]
+ *
+ * Each mode runs in its own process so the peak RSS numbers don't mix.
+ * Blocks go through notion-to-md, so run it where the real package is
+ * installed (the container); other renderers give numbers that don't compare.
+ */
+
+const { NotionToMarkdown } = require("notion-to-md");
+const { spawnSync } = require('child_process');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { PageStreamer } = require('./notion_stream');
+
+const args = process.argv.slice(2);
+const option = (name, fallback) => {
+  const i = args.indexOf(name);
+  return i >= 0 && args[i + 1] ? args[i + 1] : fallback;
+};
+const TOTAL_BLOCKS = parseInt(option('--blocks', '50000'), 10);
+const MODE = option('--mode', 'both');
+
+const PAGE_ID = 'bench-page';
+const TABLE_ROWS = 200;
+const TABLE_EVERY = 2500;   // One table per this many top-level blocks
+const LIST_CHILDREN = 3;    // Every 10th list item has nested children
+
+function richText(content, bold = false) {
+  return [{
+    type: 'text',
+    text: { content, link: null },
+    annotations: { bold, italic: false, strikethrough: false, underline: false, code: false, color: 'default' },
+    plain_text: content,
+    href: null,
+  }];
+}
+
+/**
+ * Synthetic block i of the page; generated on demand so the fake API holds no tree
+ */
+function topLevelBlock(i) {
+  const id = `b${i}`;
+  const text = `Block ${i}: the quick brown fox jumps over the lazy dog while the export keeps streaming.`;
+  if (i % TABLE_EVERY === TABLE_EVERY - 1) {
+    return { id, type: 'table', has_children: true, table: { table_width: 4, has_column_header: true, has_row_header: false } };
+  }
+  switch (i % 10) {
+    case 0: return { id, type: 'heading_2', has_children: false, heading_2: { rich_text: richText(`Section ${i}`), is_toggleable: false, color: 'default' } };
+    case 3:
+    case 4: return { id, type: 'bulleted_list_item', has_children: i % 10 === 3, bulleted_list_item: { rich_text: richText(text), color: 'default' } };
+    case 7: return { id, type: 'code', has_children: false, code: { rich_text: richText(`const x${i} = ${i};\nconsole.log(x${i});`), language: 'javascript', caption: [] } };
+    default: return { id, type: 'paragraph', has_children: false, paragraph: { rich_text: richText(text, i % 5 === 0), color: 'default' } };
+  }
+}
+
+function childBlocks(blockId) {
+  const [, kind, index] = blockId.match(/^(b|t)(\d+)/) || [];
+  if (kind === 't') return [];
+  if (blockId.startsWith('b') && topLevelBlock(Number(index)).type === 'table') {
+    return Array.from({ length: TABLE_ROWS }, (_, r) => ({
+      id: `t${index}-${r}`,
+      type: 'table_row',
+      has_children: false,
+      table_row: { cells: [0, 1, 2, 3].map(c => richText(`r${r}c${c} cell value ${index}`)) },
+    }));
+  }
+  return Array.from({ length: LIST_CHILDREN }, (_, c) => ({
+    id: `t${index}-${c}`,
+    type: 'bulleted_list_item',
+    has_children: false,
+    bulleted_list_item: { rich_text: richText(`Nested item ${c} of block ${index}`), color: 'default' },
+  }));
+}
+
+/**
+ * Just enough of the Notion client for blocks.children.list and pages.retrieve
+ */
+function createFakeClient(totalBlocks) {
+  // Top-level count so nested list children and table rows bring the total to totalBlocks
+  const perTop = 1 + (LIST_CHILDREN / 10) + (TABLE_ROWS / TABLE_EVERY);
+  const topLevel = Math.max(1, Math.round(totalBlocks / perTop));
+  let requests = 0;
+
+  const list = async ({ block_id, page_size = 100, start_cursor }) => {
+    requests++;
+    const start = start_cursor ? Number(start_cursor) : 0;
+    let results;
+    let total;
+    if (block_id === PAGE_ID) {
+      total = topLevel;
+      results = [];
+      for (let i = start; i < Math.min(start + page_size, total); i++) results.push(topLevelBlock(i));
+    } else {
+      const all = childBlocks(block_id);
+      total = all.length;
+      results = all.slice(start, start + page_size);
+    }
+    const next = start + results.length;
+    return { object: 'list', results, has_more: next < total, next_cursor: next < total ? String(next) : null };
+  };
+
+  return {
+    blocks: { children: { list } },
+    pages: { retrieve: async () => ({ id: PAGE_ID, properties: { title: { title: richText('Benchmark page') } } }) },
+    requestCount: () => requests,
+  };
+}
+
+async function runMode(mode) {
+  const notion = createFakeClient(TOTAL_BLOCKS);
+  const n2m = new NotionToMarkdown({ notionClient: notion, config: { parseChildPages: true } });
+  const outDir = fs.mkdtempSync(path.join(os.tmpdir(), 'bench-stream-'));
+  const outPath = path.join(outDir, 'page.md');
+  const renderCell = (cell) => cell.map(rt => rt.plain_text).join('');
+
+  let peakHeap = 0;
+  const sampler = setInterval(() => {
+    peakHeap = Math.max(peakHeap, process.memoryUsage().heapUsed);
+  }, 20);
+
+  const start = Date.now();
+  let blocks = 0;
+  if (mode === 'stream') {
+    const streamer = new PageStreamer({ notion, n2m, renderCell });
+    await streamer.streamPage(PAGE_ID, outPath);
+    blocks = streamer.blocks;
+  } else {
+    const mdblocks = await n2m.pageToMarkdown(PAGE_ID);
+    const mdString = n2m.toMarkdownString(mdblocks);
+    fs.writeFileSync(outPath, mdString.parent || '', 'utf8');
+  }
+  clearInterval(sampler);
+
+  const result = {
+    mode,
+    blocks: blocks || null,
+    requests: notion.requestCount(),
+    seconds: (Date.now() - start) / 1000,
+    outputMb: fs.statSync(outPath).size / 1048576,
+    peakRssMb: process.resourceUsage().maxRSS / 1024,
+    peakHeapMb: peakHeap / 1048576,
+  };
+  fs.rmSync(outDir, { recursive: true, force: true });
+  return result;
+}
+
+function printTable(results) {
+  console.log(`\n📊 Synthetic page: ${TOTAL_BLOCKS} blocks`);
+  console.log('   mode      blocks   requests  seconds  output MB  peak RSS MB  peak heap MB');
+  for (const r of results) {
+    console.log(
+      `   ${r.mode.padEnd(8)} ${String(r.blocks ?? '-').padStart(7)} ${String(r.requests).padStart(10)}` +
+      ` ${r.seconds.toFixed(2).padStart(8)} ${r.outputMb.toFixed(1).padStart(10)}` +
+      ` ${r.peakRssMb.toFixed(1).padStart(12)} ${r.peakHeapMb.toFixed(1).padStart(13)}`
+    );
+  }
+}
+
+(async () => {
+  if (MODE === 'both') {
+    const results = [];
+    for (const mode of ['stream', 'buffered']) {
+      const child = spawnSync(process.execPath, [__filename, '--blocks', String(TOTAL_BLOCKS), '--mode', mode, '--json'], {
+        encoding: 'utf8',
+        maxBuffer: 1 << 20,
+      });
+      if (child.status !== 0) {
+        console.error(`❌ ${mode} run failed:\n${child.stderr}`);
+        process.exit(1);
+      }
+      results.push(JSON.parse(child.stdout));
+    }
+    printTable(results);
+    return;
+  }
+
+  const result = await runMode(MODE);
+  if (args.includes('--json')) console.log(JSON.stringify(result));
+  else printTable([result]);
+})().catch((err) => {
+  console.error(err);
+  process.exit(1);
+});
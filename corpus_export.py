@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+JSONL corpus export for retrieval pipelines
+Streams one record per page (and optionally heading-aware chunks) from the
+exporter's page feed in a single sequential pass
+
+Files are append-only: a page is only re-appended when its content changes,
+and a later line supersedes earlier lines with the same page id. Run with
+--compact to rewrite the files keeping just the latest record per page.
+"""
+
+import os
+import re
+import sys
+import json
+import bisect
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from search_index import FEED_FILENAME, feed_body
+from tracing import traced_main
+
+CORPUS_DIRNAME = '.corpus'
+PAGES_FILENAME = 'pages.jsonl'
+CHUNKS_FILENAME = 'chunks.jsonl'
+STATE_FILENAME = 'state.json'
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*\S)\s*$')
+FENCE_RE = re.compile(r'^\s*(```|~~~)')
+# Approximate tokens: words and individual punctuation marks
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_RE.findall(text))
+
+def split_sections(markdown: str) -> List[Tuple[List[str], str]]:
+    """Split markdown at headings (ignoring fenced code) into (heading path, text)"""
+    sections = []
+    path: List[Tuple[int, str]] = []
+    current: List[str] = []
+    in_fence = False
+
+    def flush():
+        text = '\n'.join(current).strip()
+        if text:
+            sections.append(([title for _, title in path], text))
+        current.clear()
+
+    for line in markdown.splitlines():
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING_RE.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, match.group(2)))
+        current.append(line)
+    flush()
+    return sections
+
+class Chunker:
+    """Packs heading sections into chunks of at most `size` chars or tokens
+
+    Small neighbouring sections are packed together; a section larger than
+    `size` is split into overlapping windows, preferring paragraph breaks.
+    """
+
+    def __init__(self, size: int = 1500, overlap: int = 200, unit: str = 'chars'):
+        if overlap >= size:
+            raise ValueError("chunk overlap must be smaller than chunk size")
+        self.size = size
+        self.overlap = overlap
+        self.unit = unit
+
+    def measure(self, text: str) -> int:
+        return count_tokens(text) if self.unit == 'tokens' else len(text)
+
+    def _unit_offsets(self, text: str) -> List[int]:
+        """Char offset where each unit starts (plus the end of the text)"""
+        if self.unit == 'tokens':
+            return [m.start() for m in TOKEN_RE.finditer(text)] + [len(text)]
+        return list(range(len(text) + 1))
+
+    def _windows(self, text: str) -> Iterator[str]:
+        offsets = self._unit_offsets(text)
+        units = len(offsets) - 1
+        start = 0
+        while start < units:
+            end = min(start + self.size, units)
+            if end < units:
+                # Back off to the last paragraph (or line) break in the second half
+                lo, hi = offsets[start + self.size // 2], offsets[end]
+                cut = text.rfind('\n\n', lo, hi)
+                if cut < 0:
+                    cut = text.rfind('\n', lo, hi)
+                if cut > lo:
+                    end = bisect.bisect_right(offsets, cut) - 1
+            window = text[offsets[start]:offsets[end]].strip()
+            if window:
+                yield window
+            if end >= units:
+                break
+            start = max(end - self.overlap, start + 1)
+
+    def chunk(self, markdown: str) -> List[Dict]:
+        chunks: List[Dict] = []
+        pending: List[str] = []
+        pending_headings: List[str] = []
+        pending_size = 0
+        separator = self.measure('\n\n')
+
+        def flush():
+            if pending:
+                chunks.append({'headings': pending_headings, 'text': '\n\n'.join(pending)})
+                pending.clear()
+
+        for headings, text in split_sections(markdown):
+            size = self.measure(text)
+            if size > self.size:
+                flush()
+                for window in self._windows(text):
+                    chunks.append({'headings': headings, 'text': window})
+                continue
+            if pending and pending_size + separator + size > self.size:
+                flush()
+            if not pending:
+                pending_headings = headings
+                pending_size = 0
+            else:
+                pending_size += separator
+            pending.append(text)
+            pending_size += size
+        flush()
+
+        for index, chunk in enumerate(chunks):
+            chunk['chunk_index'] = index
+            chunk['chars'] = len(chunk['text'])
+            chunk['tokens'] = count_tokens(chunk['text'])
+        return chunks
+
+class CorpusWriter:
+    def __init__(self, corpus_dir: Path, chunker: Optional[Chunker] = None):
+        self.corpus_dir = Path(corpus_dir)
+        self.corpus_dir.mkdir(parents=True, exist_ok=True)
+        self.chunker = chunker
+        self.state_file = self.corpus_dir / STATE_FILENAME
+        self.state: Dict[str, str] = {}
+        if self.state_file.exists():
+            with open(self.state_file) as f:
+                self.state = json.load(f)
+        # Chunk settings are part of the revision so changing them re-chunks everything
+        self.settings = f"{chunker.size}/{chunker.overlap}/{chunker.unit}" if chunker else 'pages'
+
+    def revision(self, record: Dict) -> str:
+        payload = json.dumps(
+            [record.get('title'), record.get('database'), record.get('properties'),
+             record.get('body'), self.settings],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    def write_feed(self, feed_path: Path) -> Dict[str, int]:
+        """Append changed pages from the feed; one sequential read, one append per file"""
+        counts = {'appended': 0, 'unchanged': 0, 'chunks': 0}
+        exported_at = datetime.now().isoformat()
+        chunks_out = open(self.corpus_dir / CHUNKS_FILENAME, 'a', encoding='utf-8') if self.chunker else None
+        try:
+            with open(feed_path, encoding='utf-8') as feed, \
+                 open(self.corpus_dir / PAGES_FILENAME, 'a', encoding='utf-8') as pages_out:
+                for line in feed:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    record['body'] = feed_body(record, feed_path.parent)
+                    if record['body'] is None:
+                        continue
+                    page_id = record['id'].replace('-', '')
+                    revision = self.revision(record)
+                    if self.state.get(page_id) == revision:
+                        counts['unchanged'] += 1
+                        continue
+
+                    markdown = record['body']
+                    page = {
+                        'id': page_id,
+                        'title': record.get('title'),
+                        'database': record.get('database'),
+                        'properties': record.get('properties') or {},
+                        'last_edited_time': record.get('last_edited_time'),
+                        'path': record.get('path'),
+                        'markdown': markdown,
+                        'chars': len(markdown),
+                        'tokens': count_tokens(markdown),
+                        'revision': revision,
+                        'exported_at': exported_at,
+                    }
+                    pages_out.write(json.dumps(page, ensure_ascii=False) + '\n')
+
+                    if chunks_out:
+                        for chunk in self.chunker.chunk(markdown):
+                            chunks_out.write(json.dumps({
+                                'id': f"{page_id}#{chunk['chunk_index']}",
+                                'page_id': page_id,
+                                'title': page['title'],
+                                'database': page['database'],
+                                'last_edited_time': page['last_edited_time'],
+                                'revision': revision,
+                                **chunk,
+                            }, ensure_ascii=False) + '\n')
+                            counts['chunks'] += 1
+
+                    self.state[page_id] = revision
+                    counts['appended'] += 1
+        finally:
+            if chunks_out:
+                chunks_out.close()
+        self.save_state()
+        return counts
+
+    def save_state(self) -> None:
+        tmp_file = self.state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def compact(self) -> Dict[str, int]:
+        """Rewrite each corpus file keeping only the current revision of every page"""
+        kept = {}
+        for filename, key in ((PAGES_FILENAME, 'id'), (CHUNKS_FILENAME, 'page_id')):
+            path = self.corpus_dir / filename
+            if not path.exists():
+                continue
+            tmp_path = path.with_suffix('.tmp')
+            kept[filename] = 0
+            with open(path, encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+                for line in src:
+                    record = json.loads(line)
+                    if self.state.get(record[key]) == record.get('revision'):
+                        dst.write(line)
+                        kept[filename] += 1
+            os.replace(tmp_path, path)
+        return kept
+
+def main():
+    parser = argparse.ArgumentParser(description='Export exported pages as a JSONL corpus for retrieval pipelines')
+    parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    parser.add_argument('--corpus-dir', help=f'Corpus directory (default: <output>/{CORPUS_DIRNAME})')
+    parser.add_argument('--chunks', action='store_true',
+                        default=os.getenv('CORPUS_CHUNKS', 'false').lower() == 'true',
+                        help='Also write heading-aware chunks to chunks.jsonl')
+    parser.add_argument('--chunk-size', type=int, default=int(os.getenv('CORPUS_CHUNK_SIZE', '1500')),
+                        help='Maximum chunk size (default: 1500)')
+    parser.add_argument('--chunk-overlap', type=int, default=int(os.getenv('CORPUS_CHUNK_OVERLAP', '200')),
+                        help='Overlap between windows of an oversized section (default: 200)')
+    parser.add_argument('--chunk-unit', choices=['chars', 'tokens'], default=os.getenv('CORPUS_CHUNK_UNIT', 'chars'),
+                        help='Unit for size and overlap (tokens are approximate word pieces)')
+    parser.add_argument('--compact', action='store_true', help='Drop superseded records after writing')
+    args = parser.parse_args()
+
+    corpus_dir = Path(args.corpus_dir) if args.corpus_dir else Path(args.output) / CORPUS_DIRNAME
+    chunker = Chunker(args.chunk_size, args.chunk_overlap, args.chunk_unit) if args.chunks else None
+    writer = CorpusWriter(corpus_dir, chunker)
+
+    feed_path = Path(args.output) / FEED_FILENAME
+    if feed_path.exists():
+        counts = writer.write_feed(feed_path)
+        print(f"📚 Corpus: {counts['appended']} pages appended, {counts['unchanged']} unchanged"
+              + (f", {counts['chunks']} chunks" if chunker else ""))
+    else:
+        print("ℹ️  No exported pages to add to the corpus")
+
+    if args.compact:
+        kept = writer.compact()
+        print(f"🗜️  Compacted: " + ", ".join(f"{name} {count} records" for name, count in kept.items()))
+    print(f"📁 Corpus saved to: {corpus_dir}/")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(traced_main('corpus_export', main)())
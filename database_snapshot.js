@@ -0,0 +1,134 @@
+/**
+ * Database snapshots
+ * A columnar copy of every exported database in output/_databases/: one CSV
+ * (for notebooks) and one JSONL file per database, plus index.json with each
+ * row's last_edited_time. export_all.js builds _Overview.md from these and
+ * rewrites it only when a database's rows changed.
+ */
+
+const fs = require('fs').promises;
+const path = require('path');
+
+const SNAPSHOT_DIRNAME = '_databases';
+const INDEX_FILENAME = 'index.json';
+
+function csvField(value) {
+  const text = value == null ? '' : String(value);
+  return /[",\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
+}
+
+// Position of each property in the database schema (unknown properties sort after, by name)
+function propertyRanker(propertyOrder) {
+  const rank = new Map((propertyOrder || []).map((key, index) => [key, index]));
+  return (a, b) => {
+    const indexA = rank.has(a) ? rank.get(a) : Infinity;
+    const indexB = rank.has(b) ? rank.get(b) : Infinity;
+    if (indexA !== indexB) return indexA < indexB ? -1 : 1;
+    return indexA === Infinity ? a.localeCompare(b) : 0;
+  };
+}
+
+// Every property the rows have, in schema order
+function columns(propertyOrder, rows) {
+  const keys = new Set();
+  for (const row of rows) {
+    for (const key of Object.keys(row.properties)) keys.add(key);
+  }
+  return [...keys].sort(propertyRanker(propertyOrder));
+}
+
+function toCsv(propertyOrder, rows) {
+  const props = columns(propertyOrder, rows);
+  const lines = [['id', 'title', 'last_edited_time', ...props].map(csvField).join(',')];
+  for (const row of rows) {
+    lines.push([row.id, row.title, row.last_edited_time, ...props.map(p => row.properties[p])]
+      .map(csvField).join(','));
+  }
+  return lines.join('\r\n') + '\r\n';
+}
+
+async function writeAtomic(file, content) {
+  const tmpFile = `${file}.tmp`;
+  await fs.writeFile(tmpFile, content, 'utf8');
+  await fs.rename(tmpFile, file);
+}
+
+class DatabaseSnapshots {
+  constructor(outputDir) {
+    this.dir = path.join(outputDir, SNAPSHOT_DIRNAME);
+    this.indexFile = path.join(this.dir, INDEX_FILENAME);
+    this.index = null;
+  }
+
+  async load() {
+    if (!this.index) {
+      try {
+        this.index = JSON.parse(await fs.readFile(this.indexFile, 'utf8'));
+      } catch {
+        this.index = { databases: {} };
+      }
+    }
+    return this.index;
+  }
+
+  async has(dbId) {
+    return Boolean((await this.load()).databases[dbId]);
+  }
+
+  async propertyOrder(dbId) {
+    const entry = (await this.load()).databases[dbId];
+    return entry ? entry.propertyOrder : [];
+  }
+
+  // Stored rows of one database ({ id, title, last_edited_time, properties }), in view order
+  async rows(dbId) {
+    const entry = (await this.load()).databases[dbId];
+    if (!entry) return [];
+    try {
+      const text = await fs.readFile(path.join(this.dir, entry.jsonl), 'utf8');
+      return text.split('\n').filter(Boolean).map(line => JSON.parse(line));
+    } catch {
+      return [];
+    }
+  }
+
+  // Replace a database's rows; returns false (and writes nothing) when they are unchanged
+  async write(dbId, dbName, propertyOrder, rows) {
+    const index = await this.load();
+    const previous = index.databases[dbId];
+    const jsonl = rows.map(row => JSON.stringify(row) + '\n').join('');
+    const entry = { name: dbName, jsonl: `${dbName}.jsonl`, csv: `${dbName}.csv`, propertyOrder };
+
+    if (previous && previous.jsonl === entry.jsonl &&
+        JSON.stringify(previous.propertyOrder) === JSON.stringify(propertyOrder)) {
+      const stored = await fs.readFile(path.join(this.dir, previous.jsonl), 'utf8').catch(() => null);
+      if (stored === jsonl) return false;
+    }
+
+    await fs.mkdir(this.dir, { recursive: true });
+    await writeAtomic(path.join(this.dir, entry.jsonl), jsonl);
+    await writeAtomic(path.join(this.dir, entry.csv), toCsv(propertyOrder, rows));
+    if (previous && previous.jsonl !== entry.jsonl) {
+      // Renamed database: drop the files under the old name
+      await fs.rm(path.join(this.dir, previous.jsonl), { force: true });
+      await fs.rm(path.join(this.dir, previous.csv), { force: true });
+    }
+    entry.rows = Object.fromEntries(rows.map(row => [row.id, row.last_edited_time]));
+    entry.updated_at = new Date().toISOString();
+    index.databases[dbId] = entry;
+    return true;
+  }
+
+  async save() {
+    if (!this.index) return;
+    await fs.mkdir(this.dir, { recursive: true });
+    await writeAtomic(this.indexFile, JSON.stringify(this.index, null, 1));
+  }
+}
+
+module.exports = {
+  SNAPSHOT_DIRNAME,
+  propertyRanker,
+  toCsv,
+  DatabaseSnapshots,
+};
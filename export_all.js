@@ -0,0 +1,1634 @@
+/**
+ * Custom-formatted export used by run.sh
+ * Exports every scanned page into per-database folders with property headers
+ * and _Overview.md tables.
+ *
+ * Usage:
+ *   node export_all.js             # Full export of the scanned pages (output/.page_graph.sqlite)
+ *   node export_all.js --changes   # Re-export pages edited since the last run, in place
+ *   node export_all.js --deadline 5m [--priority "Tasks,Notes"]
+ *                                  # Newest edits first; stop after 5 minutes
+ *   node export_all.js --resume    # Export what the deadline left over
+ *   node export_all.js --only "Tasks" [--subtree <id>] [--since 7d] [--with-related]
+ *                                  # Re-export part of the graph in place (page_graph.py selection)
+ *   node export_all.js --shards 4 --shard-index 0
+ *                                  # One shard of a full export (export_shards.py merges them)
+ *   node export_all.js --stream    # Export scan batches from stdin as they arrive (export_pipeline.py)
+ */
+
+const { NotionToMarkdown } = require('notion-to-md');
+const fs = require('fs').promises;
+const path = require('path');
+const { ExportManifest, createNotionClient, apiLimiter, relaunchProfiled, snapshotHeap, loadPageIds,
+  loadGraphPages, jsonLines, parseDuration, tracer, startTracing } = require('./notion_utils');
+const { PageStreamer, MarkdownFileWriter, tableRowHtml } = require('./notion_stream');
+const { DatabaseSnapshots, propertyRanker } = require('./database_snapshot');
+const { PropertyValues } = require('./property_values');
+
+const OUTPUT_BASE = process.env.OUTPUT_DIR || '/app/output';
+// Where every exported page lives, with the properties its database overview needs
+const LOCATIONS_FILE = path.join(OUTPUT_BASE, '.page_locations.json');
+const PAGE_INDEX_FILE = path.join(OUTPUT_BASE, '.page_index.json');
+// One comma-separated item of a property value; a [title](url) link counts as one item
+const LINK_ITEM_RE = /\[(?:[^\]\\]|\\.)*\]\([^)]*\)|[^,]+/g;
+// High-water mark of the last change scan (see notion_cli.py watch)
+const WATCH_STATE_FILE = path.join(OUTPUT_BASE, '.watch_state.json');
+// Pages a --deadline run left for --resume (same file as export_schedule.py)
+const REMAINDER_FILE = path.join(OUTPUT_BASE, '.export_remainder.json');
+
+// Scheduling: time budget in seconds and the databases to export first
+const argValue = (name) => process.argv.includes(name) ? process.argv[process.argv.indexOf(name) + 1] : null;
+const EXPORT_DEADLINE = parseDuration(argValue('--deadline') || process.env.EXPORT_DEADLINE);
+const EXPORT_PRIORITY = (argValue('--priority') || process.env.EXPORT_PRIORITY || '')
+  .split(',').map(p => p.trim()).filter(Boolean);
+// Selective export: page_graph.py --only / --subtree / --since arguments, and whether
+// related pages that haven't been exported yet come along
+const EXPORT_SELECTION = [
+  ['--only', argValue('--only') || process.env.EXPORT_ONLY],
+  ['--subtree', argValue('--subtree') || process.env.EXPORT_SUBTREE],
+  ['--since', argValue('--since') || process.env.EXPORT_SINCE],
+  ['--shards', argValue('--shards')],
+  ['--shard-index', argValue('--shard-index')]
+].filter(([, value]) => value).flat();
+// A shard writes its part of a full export into its own OUTPUT_DIR (see export_shards.py)
+const SHARDED = parseInt(argValue('--shards') || '1', 10) > 1;
+const EXPORT_RELATED = process.argv.includes('--with-related') ||
+  ['1', 'true'].includes((process.env.EXPORT_RELATED || '').toLowerCase());
+
+const notion = createNotionClient(process.env.NOTION_TOKEN);
+// Relations/rollups past 25 references, cached by page last_edited_time (see property_values.js)
+const propertyValues = new PropertyValues(notion, OUTPUT_BASE);
+const n2m = new NotionToMarkdown({
+  notionClient: notion,
+  config: {
+    separateChildPage: true,
+    parseChildPages: true
+  }
+});
+
+// Custom transformers to ensure images are preserved
+n2m.setCustomTransformer('image', async (block) => {
+  const imageUrl = block.image?.file?.url || block.image?.external?.url || '';
+  const caption = block.image?.caption?.map(t => t.plain_text).join('') || '';
+  
+  if (imageUrl) {
+    return caption ? `![${caption}](${imageUrl})\n*${caption}*` : `![](${imageUrl})`;
+  }
+  return '';
+});
+
+// Ensure emojis in all text blocks are preserved with proper Unicode handling
+n2m.setCustomTransformer('paragraph', async (block) => {
+  const text = block.paragraph?.rich_text?.map(t => {
+    // Ensure proper emoji and Unicode handling
+    return t.plain_text ? String(t.plain_text).normalize('NFC') : '';
+  }).join('') || '';
+  return text + '\n';
+});
+
+// Custom transformer for handling database property emojis
+n2m.setCustomTransformer('callout', async (block) => {
+  const icon = block.callout?.icon?.emoji || '';
+  const text = block.callout?.rich_text?.map(t => String(t.plain_text || '').normalize('NFC')).join('') || '';
+  return icon ? `${icon} ${text}\n` : text + '\n';
+});
+
+// ---------- TABLES: deterministic HTML emitter (Pandoc-friendly) ----------
+const DEBUG_TABLES = process.env.DEBUG_TABLES === '1' || process.env.DEBUG_TABLES === 'true';
+
+function escapeHtml(s) {
+  return String(s)
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;')
+    .replace(/'/g, '&#39;');
+}
+
+function renderRichTextPieceToHtml(rt) {
+  if (!rt) return '';
+
+  let text = '';
+  if (rt.type === 'text') text = (rt.text && rt.text.content) ? rt.text.content : (rt.plain_text || '');
+  else if (rt.type === 'equation') text = (rt.equation && rt.equation.expression) ? rt.equation.expression : (rt.plain_text || '');
+  else text = rt.plain_text || '';
+
+  let html = escapeHtml(text).replace(/\n/g, '<br />');
+
+  const href = rt.href;
+  if (href) {
+    html = '<a href="' + escapeHtml(href) + '">' + html + '</a>';
+  }
+
+  const ann = rt.annotations || {};
+  if (ann.code) html = '<code>' + html + '</code>';
+  if (ann.bold) html = '<strong>' + html + '</strong>';
+  if (ann.italic) html = '<em>' + html + '</em>';
+  if (ann.strikethrough) html = '<del>' + html + '</del>';
+  if (ann.underline) html = '<u>' + html + '</u>';
+
+  return html;
+}
+
+function renderCellToHtml(cellRichTextArray) {
+  const parts = Array.isArray(cellRichTextArray) ? cellRichTextArray : [];
+  return parts.map(renderRichTextPieceToHtml).join('');
+}
+
+async function listAllChildren(blockId) {
+  const out = [];
+  let cursor = undefined;
+  while (true) {
+    const resp = await notion.blocks.children.list({
+      block_id: blockId,
+      page_size: 100,
+      start_cursor: cursor,
+    });
+    out.push(...resp.results);
+    if (!resp.has_more) break;
+    cursor = resp.next_cursor;
+  }
+  return out;
+}
+
+// Override Notion table blocks: emit raw HTML table so Pandoc -> LaTeX is stable
+n2m.setCustomTransformer('table', async (block) => {
+  const rows = await listAllChildren(block.id);
+  const firstRow = rows.find(r => r.type === 'table_row');
+  if (DEBUG_TABLES && firstRow) {
+    console.error('DEBUG_TABLE_BLOCK:', JSON.stringify({ id: block.id, table: block.table }, null, 2));
+    console.error('DEBUG_TABLE_FIRST_ROW_JSON:', JSON.stringify(firstRow, null, 2));
+  }
+
+  const hasColHeader = !!(block.table && block.table.has_column_header);
+  const hasRowHeader = !!(block.table && block.table.has_row_header);
+
+  const parsedRows = rows
+    .filter(r => r.type === 'table_row')
+    .map(r => (r.table_row && r.table_row.cells ? r.table_row.cells : []).map(cell => renderCellToHtml(cell)));
+
+  if (parsedRows.length === 0) return '';
+
+  const maxCols = Math.max.apply(null, parsedRows.map(r => r.length));
+  const norm = parsedRows.map(r => {
+    const rr = r.slice();
+    while (rr.length < maxCols) rr.push('');
+    return rr;
+  });
+
+  const thead = hasColHeader ? norm[0] : null;
+  const tbody = hasColHeader ? norm.slice(1) : norm;
+
+  const parts = ['\n<table>\n'];
+  if (thead) parts.push('  <thead>\n', tableRowHtml(thead, { header: true }), '  </thead>\n');
+  parts.push('  <tbody>\n');
+  tbody.forEach((r) => parts.push(tableRowHtml(r, { rowHeader: hasRowHeader })));
+  parts.push('  </tbody>\n</table>\n');
+  return parts.join('');
+});
+
+// Prevent row blocks from being rendered separately (avoid duplicates)
+n2m.setCustomTransformer('table_row', async () => '');
+
+// ---------- CODE BLOCKS: preserve ASCII diagrams + optional bold/emojis ----------
+function looksLikeAsciiDiagram(s) {
+  const str = String(s || '');
+  if (/[\u2500-\u257F\u2580-\u259F\u25A0-\u25FF\u2190-\u21FF\u2600-\u26FF\u2700-\u27BF]/u.test(str)) {
+    return true;
+  }
+  return /(<==>|<->|==>|<==|->|<-|\|->|<-\|)/.test(str);
+}
+
+function escapeLatexForFancyVerbatimCommandchars(s) {
+  return String(s)
+    .replace(/\\/g, '\\textbackslash{}')
+    .replace(/\{/g, '\\textbraceleft{}')
+    .replace(/\}/g, '\\textbraceright{}');
+}
+
+function renderRichTextArrayToPlainText(richTextArray) {
+  const parts = Array.isArray(richTextArray) ? richTextArray : [];
+  return parts.map(rt => String((rt && rt.plain_text) ? rt.plain_text : '').normalize('NFC')).join('');
+}
+
+function renderRichTextArrayToPandocDiagramBlocks(richTextArray) {
+  const parts = Array.isArray(richTextArray) ? richTextArray : [];
+
+  const htmlInner = parts.map(rt => {
+    const text = String((rt && rt.plain_text) ? rt.plain_text : '').normalize('NFC');
+    const escaped = escapeHtml(text);
+    if (rt && rt.annotations && rt.annotations.bold) return '<strong>' + escaped + '</strong>';
+    return escaped;
+  }).join('');
+
+  const latexInner = parts.map(rt => {
+    const text = String((rt && rt.plain_text) ? rt.plain_text : '').normalize('NFC');
+    const escaped = escapeLatexForFancyVerbatimCommandchars(text);
+    if (rt && rt.annotations && rt.annotations.bold) return '\\textbf{' + escaped + '}';
+    return escaped;
+  }).join('');
+
+  const htmlBlock = '<pre class="notion-ascii-diagram"><code>' + htmlInner + '</code></pre>';
+  const latexBlock =
+'\\begin{Verbatim}[commandchars=\\\\\\{\\}]\n' +
+latexInner + '\n' +
+'\\end{Verbatim}';
+
+  return '\n\n~~~{=html}\n' + htmlBlock + '\n~~~\n\n~~~{=latex}\n' + latexBlock + '\n~~~\n\n';
+}
+
+n2m.setCustomTransformer('code', async (block) => {
+  const lang = ((block.code && block.code.language) ? block.code.language : '').toLowerCase();
+  const rich = (block.code && block.code.rich_text) ? block.code.rich_text : [];
+  const plain = renderRichTextArrayToPlainText(rich);
+
+  const isDiagram = lang === 'plain text' || lang === 'text' || lang === 'plain' || looksLikeAsciiDiagram(plain);
+  if (isDiagram) return renderRichTextArrayToPandocDiagramBlocks(rich);
+
+  const fenceLang = lang && lang !== 'plain text' ? lang : '';
+  const fence = fenceLang ? '~~~' + fenceLang : '~~~';
+  return '\n\n' + fence + '\n' + plain + '\n~~~\n\n';
+});
+
+// Build a lookup table for all pages
+const pageIdToTitle = {};
+
+// Page objects already fetched (database rows from queryDatabaseRows) are reused, and
+// the ones retrieved here are added to `pages` for groupPagesByDatabase
+async function buildPageLookup(pageIds, pages = new Map()) {
+  for (const pageId of pageIds) {
+    try {
+      const cleanId = pageId.replace(/-/g, '');
+      let page = pages.get(cleanId);
+      if (!page) {
+        page = await notion.pages.retrieve({ page_id: cleanId });
+        pages.set(cleanId, page);
+      }
+      
+      let title = 'Untitled';
+      for (const [key, value] of Object.entries(page.properties)) {
+        if (value.type === 'title' && value.title?.[0]?.plain_text) {
+          title = value.title[0].plain_text;
+          break;
+        }
+      }
+      pageIdToTitle[cleanId] = title;
+    } catch (e) {
+      // Ignore lookup errors
+    }
+  }
+  return pages;
+}
+
+// Format property value based on type
+function formatPropertyValue(property) {
+  switch (property.type) {
+    case 'title':
+      return property.title.map(t => t.plain_text || '').join('');
+    case 'rich_text':
+      return property.rich_text.map(t => t.plain_text || '').join('');
+    case 'number':
+      return property.number ? property.number.toString() : '';
+    case 'select':
+      // Preserve emojis in select options - ensure proper UTF-8 handling
+      if (property.select && property.select.name) {
+        // Convert to ensure proper emoji handling
+        return String(property.select.name);
+      }
+      return '';
+    case 'multi_select':
+      // Preserve emojis in multi-select options - ensure proper UTF-8 handling
+      if (property.multi_select && Array.isArray(property.multi_select)) {
+        return property.multi_select.map(s => String(s.name || '')).join(', ');
+      }
+      return '';
+    case 'date':
+      if (property.date) {
+        const start = property.date.start;
+        const end = property.date.end;
+        return end ? `${start} → ${end}` : start;
+      }
+      return '';
+    case 'checkbox':
+      return property.checkbox ? '✓' : '✗';
+    case 'url':
+      return property.url || '';
+    case 'email':
+      return property.email || '';
+    case 'phone_number':
+      return property.phone_number || '';
+    case 'files':
+      return property.files.map(f => f.name).join(', ');
+    case 'formula':
+      if (property.formula) {
+        switch (property.formula.type) {
+          case 'string': return property.formula.string || '';
+          case 'number': return property.formula.number ? property.formula.number.toString() : '';
+          case 'boolean': return property.formula.boolean ? 'true' : 'false';
+          case 'date': return property.formula.date ? property.formula.date.start : '';
+        }
+      }
+      return '';
+    case 'relation':
+      // Link each related page; link_rewrite.py makes the exported ones relative
+      return property.relation.map(r => {
+        const cleanId = r.id.replace(/-/g, '');
+        const title = pageIdToTitle[cleanId] || `Page ${cleanId.slice(0, 8)}`;
+        return `[${title.replace(/[\[\]]/g, '\\$&')}](https://www.notion.so/${cleanId})`;
+      }).join(', ');
+    case 'rollup':
+      if (property.rollup) {
+        switch (property.rollup.type) {
+          case 'number': return property.rollup.number ? property.rollup.number.toString() : '';
+          case 'date': return property.rollup.date ? property.rollup.date.start : '';
+          case 'array': return property.rollup.array.map(formatPropertyValue).filter(Boolean).join(', ');
+        }
+      }
+      return '';
+    case 'people':
+      return property.people.map(p => p.name || p.person?.email || 'Unknown').join(', ');
+    case 'created_time':
+      return property.created_time;
+    case 'created_by':
+      return property.created_by.name || property.created_by.person?.email || 'Unknown';
+    case 'last_edited_time':
+      return property.last_edited_time;
+    case 'last_edited_by':
+      return property.last_edited_by.name || property.last_edited_by.person?.email || 'Unknown';
+    default:
+      return '';
+  }
+}
+
+// Get ALL data sources in the workspace dynamically
+// API 2025-09-03: Search now returns data_source objects instead of database
+async function getAllDatabases() {
+  console.log('🔍 Discovering ALL data sources in your Notion workspace (API 2025-09-03)...');
+  const databases = {};
+  
+  try {
+    // Search for all data sources in the workspace (API 2025-09-03)
+    const response = await notion.search({
+      filter: {
+        property: 'object',
+        value: 'data_source'  // Changed from 'database' for API 2025-09-03
+      },
+      page_size: 100
+    });
+    
+    // Map each data source by its parent database ID for compatibility
+    for (const ds of response.results) {
+      // API 2025-09-03: data sources have parent.database_id
+      const dbId = ds.parent?.database_id || ds.id;
+      const dataSourceId = ds.id;
+      const title = ds.title?.[0]?.plain_text || 'Untitled Database';
+      // Map by BOTH database_id and data_source_id for compatibility
+      databases[dbId] = title;
+      databases[dataSourceId] = title;  // Pages reference by data_source_id
+      console.log(`   Found data source: ${title} (ID: ${ds.id})`);
+    }
+    
+    console.log(`\n📊 Found ${Object.keys(databases).length} data sources total\n`);
+  } catch (error) {
+    // Fallback: try with 'database' filter for backwards compatibility
+    console.log('   ⚠️ data_source search failed, trying database fallback...');
+    try {
+      const response = await notion.search({
+        filter: { property: 'object', value: 'database' },
+        page_size: 100
+      });
+      for (const db of response.results) {
+        const title = db.title?.[0]?.plain_text || 'Untitled Database';
+        databases[db.id] = title;
+      }
+      console.log(`\n📊 Found ${Object.keys(databases).length} databases (fallback)\n`);
+    } catch (fallbackError) {
+      console.log('   ⚠️ Could not get databases:', fallbackError.message);
+    }
+  }
+  
+  return databases;
+}
+
+// Rows per data source among scan entries
+function countRows(entries) {
+  const rowCounts = new Map();
+  for (const entry of entries) {
+    if (entry.dataSourceId) rowCounts.set(entry.dataSourceId, (rowCounts.get(entry.dataSourceId) || 0) + 1);
+  }
+  return rowCounts;
+}
+
+// Database rows among scan `entries`, 100 per request: dataSources.query returns
+// full page objects (properties and parent included), so the rows need no
+// pages.retrieve of their own. Only data sources of these entries are queried, and
+// only where that takes fewer requests than retrieving the rows one by one
+// (`rowCounts`: rows per data source in the scan). Rows of a data source that
+// can't be queried are left to the per-page path.
+async function queryDatabaseRows(entries, rowCounts, pages) {
+  const byDataSource = new Map();
+  for (const entry of entries) {
+    if (!entry.fromDatabase || !entry.dataSourceId) continue;
+    if (!byDataSource.has(entry.dataSourceId)) byDataSource.set(entry.dataSourceId, new Set());
+    byDataSource.get(entry.dataSourceId).add(entry.id.replace(/-/g, ''));
+  }
+  for (const [dataSourceId, wanted] of byDataSource) {
+    if (Math.ceil((rowCounts.get(dataSourceId) || 0) / 100) < wanted.size) {
+      await queryDataSourceRows(dataSourceId, wanted, pages);
+    }
+  }
+}
+
+async function queryDataSourceRows(dataSourceId, wanted, rows) {
+  let cursor = undefined;
+  try {
+    do {
+      const response = await notion.dataSources.query({
+        data_source_id: dataSourceId,
+        page_size: 100,
+        start_cursor: cursor
+      });
+      for (const page of response.results) {
+        const id = page.id.replace(/-/g, '');
+        if (page.object === 'page' && wanted.has(id)) rows.set(id, page);
+      }
+      cursor = response.has_more ? response.next_cursor : undefined;
+    } while (cursor);
+  } catch (error) {
+    console.log(`   ⚠️ Could not query data source ${dataSourceId}: ${error.message}`);
+  }
+}
+
+// Property order of a database's schema, retrieved once per data source (not per row)
+const schemaOrders = new Map();
+function schemaPropertyOrder(dataSourceId, databaseId) {
+  const key = dataSourceId || databaseId;
+  if (!schemaOrders.has(key)) {
+    const retrieve = async () => {
+      // API 2025-09-03: Use dataSources.retrieve for data source schema
+      if (dataSourceId && notion.dataSources) {
+        const dataSource = await notion.dataSources.retrieve({ data_source_id: dataSourceId });
+        return Object.keys(dataSource.properties || {});
+      } else if (databaseId) {
+        // Fallback to databases.retrieve
+        const database = await notion.databases.retrieve({ database_id: databaseId });
+        return Object.keys(database.properties || {});
+      }
+      return [];
+    };
+    schemaOrders.set(key, retrieve().catch(e => {
+      console.log(`Could not retrieve schema for ${key}: ${e.message}`);
+      return null;
+    }));
+  }
+  return schemaOrders.get(key);
+}
+
+// Get page info including parent database/data source and all properties
+// API 2025-09-03: Pages can have data_source_id parent
+async function getPageInfo(pageId) {
+  try {
+    const page = await notion.pages.retrieve({ page_id: pageId });
+    return await pageInfoFromPage(page);
+  } catch {
+    return { title: 'Untitled', parentId: null, parentType: null, properties: {} };
+  }
+}
+
+// Build page info from a page object (pages.retrieve or search result)
+async function pageInfoFromPage(page) {
+  // Relations/rollups the page object cut off (no-op once completed)
+  await propertyValues.complete(page);
+  
+  // Get title
+  let title = 'Untitled';
+  const properties = {};
+  const propertyOrder = []; // Track the order of properties
+  
+  // Preserve the order of properties as they appear in the API response
+  for (const [key, value] of Object.entries(page.properties)) {
+    propertyOrder.push(key);
+    if (value.type === 'title' && value.title?.[0]?.plain_text) {
+      title = value.title[0].plain_text;
+    }
+    // Store all properties for database items
+    properties[key] = formatPropertyValue(value);
+  }
+  
+  // API 2025-09-03: Check for data_source_id first, then database_id
+  const dataSourceId = page.parent.data_source_id || null;
+  const parentId = page.parent.database_id || page.parent.page_id || null;
+  
+  // If this is a database/data source item, try to get the schema
+  let databasePropertyOrder = [];
+  if (dataSourceId || (parentId && page.parent.type === 'database_id')) {
+    databasePropertyOrder = (await schemaPropertyOrder(dataSourceId, parentId)) || propertyOrder;
+  } else {
+    databasePropertyOrder = propertyOrder;
+  }
+  
+  return {
+    title,
+    parentId: dataSourceId || parentId,  // Prefer data source ID
+    parentType: page.parent.type,
+    dataSourceId,
+    properties,
+    propertyOrder: databasePropertyOrder,
+    fullPage: page
+  };
+}
+
+// Generic formatting for ALL database entries
+function formatDatabaseProperties(dbName, pageInfo, entryNumber) {
+  // Clean up database name to remove numbering
+  const cleanDbName = dbName.replace(/^\d+\.\s*/, '');
+  
+  // Determine the entry label based on database name patterns
+  let entryLabel = 'Entry';
+  if (cleanDbName.includes('Meeting')) {
+    entryLabel = 'Meeting';
+  } else if (cleanDbName.includes('Paper') || cleanDbName.includes('Literature')) {
+    entryLabel = 'Paper';
+  } else if (cleanDbName.includes('Issue')) {
+    entryLabel = 'Issue';
+  } else if (cleanDbName.includes('Implementation')) {
+    entryLabel = 'Implementation';
+  } else if (cleanDbName.includes('Week')) {
+    entryLabel = 'Week';
+  }
+  
+  // Use Nr property if available, otherwise use entryNumber
+  const entryNum = pageInfo.properties['Nr'] || pageInfo.properties['#'] || entryNumber;
+  
+  // Create header
+  let header = `## ${cleanDbName} — ${entryLabel} ${entryNum}: ${pageInfo.title}\n\n`;
+  
+  // Use the dynamic property order from the database if available
+  const propertyOrder = pageInfo.propertyOrder || [];
+  
+  // Sort properties using the database's property order (positions looked up once, not per comparison)
+  const byPropertyOrder = propertyRanker(propertyOrder);
+  const sortedProperties = Object.entries(pageInfo.properties)
+    .filter(([key, value]) => value && key !== pageInfo.title)
+    .sort(([keyA], [keyB]) => byPropertyOrder(keyA, keyB));
+  
+  // Add ALL properties in the sorted order
+  let propertiesText = '';
+  for (const [key, value] of sortedProperties) {
+    // Convert to string and ensure proper UTF-8 handling - normalize Unicode
+    const strValue = String(value).normalize('NFC');
+    
+    // Special formatting for certain property types
+    if ((key === 'Entry' || key === 'Summary' || key === 'Description' || key === 'Notes') && strValue.length > 50) {
+      propertiesText += `**${key}:**  \n${strValue}  \n\n`;
+    } else if (key.includes('Related') || key.includes('References')) {
+      // Format relations as bullet points (commas inside link titles don't split)
+      const items = (strValue.match(LINK_ITEM_RE) || [])
+        .map(v => v.trim()).filter(v => v);
+      if (items.length > 0) {
+        propertiesText += `**${key}:**  \n`;
+        items.forEach(item => {
+          propertiesText += `- ${item}  \n`;
+        });
+        propertiesText += '\n';
+      }
+    } else {
+      propertiesText += `**${key}:** ${strValue}  \n`;
+    }
+  }
+  
+  return header + propertiesText;
+}
+
+function stripExportArtifacts(s) {
+  return String(s || '')
+    .replace(/^\s*\*\*Generated:\*\*.*(?:\r?\n)?/gmi, '')
+    .replace(/^\s*\*\*Config:\*\*.*(?:\r?\n)?/gmi, '')
+    .replace(/^\s*Generated:\s*.*(?:\r?\n)?/gmi, '');
+}
+
+// Blocks are rendered and written one at a time, so memory stays bounded on huge pages.
+// Child pages are skipped here because every page is exported to its own file anyway.
+const streamer = new PageStreamer({
+  notion,
+  n2m,
+  renderCell: renderCellToHtml,
+  transform: stripExportArtifacts,
+  childPages: 'skip'
+});
+
+// API requests and blocks a page's export used, for the manifest (see export_estimate.py)
+const usageNow = () => ({ requests: apiLimiter.stats.requests, blocks: streamer.blocks });
+function usageSince(start) {
+  const now = usageNow();
+  return { requests: now.requests - start.requests, blocks: now.blocks - start.blocks };
+}
+
+// Stream markdown with custom formatting straight to outputPath
+async function writeCustomMarkdown(outputPath, pageId, pageInfo, dbName, entryNumber) {
+  const writer = new MarkdownFileWriter(outputPath, stripExportArtifacts);
+  try {
+    // Add custom formatted properties for database items
+    if (pageInfo.parentType === 'database_id' && dbName) {
+      await writer.write(formatDatabaseProperties(dbName, pageInfo, entryNumber));
+    } else {
+      // For non-database pages, just use the title
+      await writer.write(`# ${pageInfo.title}\n\n`);
+    }
+    
+    // Add page content
+    await writer.write('\n## Content\n\n');
+    const headerBytes = writer.bytes;
+    
+    try {
+      await streamer.streamChildren(pageId, writer, 0, { files: [] });
+      if (writer.bytes === headerBytes) {
+        await writer.write('*No content available*');
+      }
+    } catch (error) {
+      await writer.write(`\n\n*Error retrieving content: ${error.message}*`);
+    }
+  } finally {
+    await writer.close();
+  }
+}
+
+// Create database overview table with ALL columns dynamically
+// Uses the database's property order for consistent column ordering
+async function createDatabaseOverview(dbName, pages) {
+  const cleanDbName = dbName.replace(/^\d+\.\s*/, '');
+  let content = `# ${dbName} - Overview\n\n`;
+  content += `Total Entries: ${pages.length}\n\n`;
+  
+  if (pages.length === 0) {
+    content += '*No entries in this database*\n';
+    return content;
+  }
+  
+  // Collect all unique property keys across all pages
+  const allProperties = new Set();
+  allProperties.add('#'); // Always add entry number
+  
+  // Get the property order from the first page that has it
+  const databasePropertyOrder = overviewPropertyOrder(pages);
+  
+  // Collect all properties
+  for (const { info } of pages) {
+    for (const key of Object.keys(info.properties)) {
+      if (key && key !== info.title) {
+        allProperties.add(key);
+      }
+    }
+  }
+  
+  const propertyArray = Array.from(allProperties);
+  
+  // Sort properties using the database's property order
+  const byPropertyOrder = propertyRanker(databasePropertyOrder);
+  propertyArray.sort((a, b) => {
+    // Always put # first
+    if (a === '#') return -1;
+    if (b === '#') return 1;
+    return byPropertyOrder(a, b);
+  });
+  
+  // Build table header
+  let tableHeader = '|';
+  let tableSeparator = '|';
+  
+  for (const prop of propertyArray) {
+    if (prop === '#') {
+      tableHeader += ' # |';
+      tableSeparator += '---|';
+    } else {
+      tableHeader += ` ${prop} |`;
+      tableSeparator += '---|';
+    }
+  }
+  
+  tableHeader += '\n';
+  tableSeparator += '\n';
+  
+  content += tableHeader;
+  content += tableSeparator;
+  
+  // Add rows
+  let counter = 0;
+  for (const { info } of pages) {
+    counter++;
+    let row = '|';
+    
+    for (const prop of propertyArray) {
+      if (prop === '#') {
+        row += ` ${counter} |`;
+      } else {
+        const value = info.properties[prop] || '';
+        // Remove newlines but preserve emojis - normalize Unicode for proper emoji handling
+        let cleanValue = String(value)
+          .normalize('NFC')  // Normalize Unicode to handle composite characters and emojis
+          .replace(/\n+/g, ' ')  // Replace newlines with spaces
+          .replace(/\s+/g, ' ')  // Replace multiple spaces with single space
+          .replace(/^#+\s*/g, '') // Remove markdown headers only at start
+          .trim();
+        
+        // Preserve emojis while truncating long values for the table
+        let displayValue = cleanValue;
+        if (cleanValue.includes('](')) {
+          // Relations: cut between whole links so they still resolve
+          displayValue = truncateLinks(cleanValue, 50);
+        } else if (cleanValue.length > 50) {
+          // Truncate but try to avoid breaking emojis
+          displayValue = cleanValue.substring(0, 47);
+          // Check if we might have broken an emoji at the end
+          const lastChar = displayValue.charCodeAt(displayValue.length - 1);
+          if (lastChar >= 0xD800 && lastChar <= 0xDBFF) {
+            // High surrogate, we might have split an emoji
+            displayValue = displayValue.substring(0, displayValue.length - 1);
+          }
+          displayValue += '...';
+        }
+        // Escape pipe characters but preserve all Unicode including emojis
+        const escapedValue = displayValue.replace(/\|/g, '\\|');
+        row += ` ${escapedValue} |`;
+      }
+    }
+    
+    content += row + '\n';
+  }
+  
+  return content;
+}
+
+// Keep whole [title](url) items while their titles fit in maxLength characters
+function truncateLinks(value, maxLength) {
+  const items = value.match(LINK_ITEM_RE) || [];
+  const kept = [];
+  let visible = 0;
+  for (const item of items) {
+    visible += item.replace(/\]\([^)]*\)$/, '').length;
+    if (kept.length > 0 && visible > maxLength - 3) break;
+    kept.push(item.trim());
+  }
+  return kept.join(', ') + (kept.length < items.length ? ', ...' : '');
+}
+
+// Group pages by database/data source for proper ordering
+// API 2025-09-03: Pages can have data_source_id parent type
+// Page objects in `pages` (query results, lookup pass) are used as they are
+async function groupPagesByDatabase(pageIds, pages = new Map()) {
+  const grouped = {};
+  const standalone = [];
+  
+  for (const pageId of pageIds) {
+    const cleanId = pageId.replace(/-/g, '');
+    const page = pages.get(cleanId);
+    const pageInfo = page ? await pageInfoFromPage(page) : await getPageInfo(cleanId);
+    
+    // API 2025-09-03: Check for both database_id and data_source_id parent types
+    const isFromDatabase = pageInfo.parentType === 'database_id' || 
+                           pageInfo.parentType === 'data_source_id' ||
+                           pageInfo.dataSourceId;
+    
+    if (isFromDatabase && pageInfo.parentId) {
+      if (!grouped[pageInfo.parentId]) {
+        grouped[pageInfo.parentId] = [];
+      }
+      grouped[pageInfo.parentId].push({ id: cleanId, info: pageInfo });
+    } else {
+      standalone.push({ id: cleanId, info: pageInfo });
+    }
+  }
+  
+  return { grouped, standalone };
+}
+
+// Feed of written pages for search_index.py (Python side owns the SQLite index).
+// The page was streamed to disk; the indexer reads it from `path`, so it is never
+// held in memory here.
+async function appendSearchFeed(outputBase, outputPath, id, info, dbName) {
+  const record = {
+    id,
+    title: info.title,
+    database: dbName,
+    properties: info.properties,
+    last_edited_time: info.fullPage ? info.fullPage.last_edited_time : null,
+    path: path.relative(outputBase, outputPath)
+  };
+  await fs.appendFile(path.join(outputBase, '.search_feed.jsonl'), JSON.stringify(record) + '\n', 'utf8');
+}
+
+// Sort database pages to match Notion's default view order
+function sortDatabasePages(pages) {
+  return [...pages].sort((a, b) => {
+    // Try to sort by Nr or # property first
+    const aNr = a.info.properties['Nr'] || a.info.properties['#'];
+    const bNr = b.info.properties['Nr'] || b.info.properties['#'];
+    
+    if (aNr !== undefined && bNr !== undefined) {
+      // Convert to numbers if possible
+      const aNum = parseInt(aNr);
+      const bNum = parseInt(bNr);
+      if (!isNaN(aNum) && !isNaN(bNum)) {
+        return aNum - bNum;
+      }
+    }
+    
+    // Fall back to title alphabetical sorting
+    return a.info.title.localeCompare(b.info.title);
+  });
+}
+
+// Numbered, filesystem-safe markdown filename
+function pageFilename(number, title) {
+  return `${String(number).padStart(2, '0')}. ${title}.md`
+    .replace(/[^a-zA-Z0-9 .-]/g, '')
+    .trim();
+}
+
+// Schema property order of a database: from the first page that has one
+function overviewPropertyOrder(pages) {
+  const withOrder = pages.find(({ info }) => info.propertyOrder && info.propertyOrder.length > 0);
+  return withOrder ? withOrder.info.propertyOrder : [];
+}
+
+// One row of a database snapshot (see database_snapshot.js)
+function snapshotRow(id, info) {
+  return {
+    id,
+    title: info.title,
+    last_edited_time: info.fullPage ? info.fullPage.last_edited_time : (info.lastEdited || null),
+    properties: info.properties
+  };
+}
+
+// Store a database's rows in _databases/ and rewrite its _Overview.md only if they changed
+async function updateDatabase(snapshots, dbId, dbName, sortedPages) {
+  const folderPath = path.join(OUTPUT_BASE, dbName);
+  const propertyOrder = overviewPropertyOrder(sortedPages);
+  const changed = await snapshots.write(dbId, dbName, propertyOrder,
+    sortedPages.map(({ id, info }) => snapshotRow(id, info)));
+  const overviewExists = await fs.access(path.join(folderPath, '_Overview.md')).then(() => true, () => false);
+  if (!changed && overviewExists) {
+    console.log(`   📊 Overview unchanged: ${dbName}/_Overview.md`);
+    return;
+  }
+  // Built from the snapshot rows: titles and formatted properties only
+  const rows = sortedPages.map(({ id, info }) => ({ id, info: { title: info.title, properties: info.properties, propertyOrder } }));
+  await fs.mkdir(folderPath, { recursive: true });
+  await writeDatabaseOverview(folderPath, dbName, rows);
+}
+
+async function writeDatabaseOverview(folderPath, dbName, sortedPages) {
+  const overviewContent = await createDatabaseOverview(dbName, sortedPages);
+  const overviewPath = path.join(folderPath, '_Overview.md');
+  // Write with UTF-8 encoding to preserve emojis
+  await tracer.span(`${dbName}/_Overview.md`, 'write', () => fs.writeFile(overviewPath, overviewContent, 'utf8'));
+  console.log(`   📊 Created overview: ${dbName}/_Overview.md`);
+}
+
+async function readJson(file, fallback = null) {
+  try {
+    return JSON.parse(await fs.readFile(file, 'utf8'));
+  } catch {
+    return fallback;
+  }
+}
+
+async function writeJson(file, data) {
+  const tmpFile = file.replace(/\.json$/, '.tmp');
+  await fs.writeFile(tmpFile, JSON.stringify(data, null, 1), 'utf8');
+  await fs.rename(tmpFile, file);
+}
+
+// Merge the exported pages into .page_index.json (id -> file), which
+// link_rewrite.py uses to turn links between pages into relative links
+async function updatePageIndex(pages) {
+  const index = await readJson(PAGE_INDEX_FILE, {});
+  for (const [id, entry] of Object.entries(pages)) {
+    index[id] = { path: entry.path.split(path.sep).join('/'), title: entry.title };
+  }
+  await writeJson(PAGE_INDEX_FILE, index);
+}
+
+// Location entry for .page_locations.json (everything needed to re-export in place)
+function locationEntry(outputPath, info, dbId, dbName) {
+  return {
+    path: path.relative(OUTPUT_BASE, outputPath),
+    title: info.title,
+    database: dbName,
+    databaseId: dbId,
+    parentType: info.parentType,
+    lastEdited: info.fullPage ? info.fullPage.last_edited_time : null,
+    properties: info.properties,
+    propertyOrder: info.propertyOrder || []
+  };
+}
+
+// One page to export, with its place in the output fixed up front (numbering
+// follows Notion's view order, whatever order the jobs then run in)
+function exportJob(id, info, dbId, dbName, filename, entryNumber) {
+  return {
+    id,
+    info,
+    dbId,
+    dbName,
+    filename,
+    entryNumber,
+    title: info.title,
+    lastEdited: info.fullPage ? info.fullPage.last_edited_time : null
+  };
+}
+
+// Priority databases first (EXPORT_PRIORITY / --priority, titles or ids), then newest edits
+function scheduleJobs(jobs, priority) {
+  const wanted = priority.map(p => p.toLowerCase().replace(/-/g, ''));
+  const rank = (job) => {
+    const keys = [(job.dbName || '').toLowerCase().replace(/-/g, ''), (job.dbId || '').replace(/-/g, '')];
+    const index = wanted.findIndex(p => keys.includes(p));
+    return index === -1 ? wanted.length : index;
+  };
+  return [...jobs].sort((a, b) =>
+    rank(a) - rank(b) || (b.lastEdited || '').localeCompare(a.lastEdited || ''));
+}
+
+// Export jobs in order until the deadline (epoch ms); returns the jobs left over
+async function runJobs(jobs, { deadline, manifest, locations, createdFolders }) {
+  const remaining = [];
+  let processed = 0;
+  for (const job of jobs) {
+    if (deadline && Date.now() >= deadline) {
+      remaining.push(job);
+      continue;
+    }
+    processed++;
+    const pageStart = Date.now();
+    const pageUsage = usageNow();
+    const folderPath = job.dbName ? path.join(OUTPUT_BASE, job.dbName) : OUTPUT_BASE;
+    const span = tracer.begin(job.title, 'page', { id: job.id, database: job.dbName });
+    
+    try {
+      console.log(`[${processed}/${jobs.length}] Exporting: ${job.title}`);
+      const info = job.info || await getPageInfo(job.id);
+      
+      if (!createdFolders.has(folderPath)) {
+        await fs.mkdir(folderPath, { recursive: true });
+        createdFolders.add(folderPath);
+        if (job.dbName) console.log(`   📁 Created folder: ${job.dbName}`);
+      }
+      const outputPath = path.join(folderPath, job.filename);
+      
+      // Stream custom formatted markdown to disk
+      await writeCustomMarkdown(outputPath, job.id, info, job.dbName, job.entryNumber);
+      await appendSearchFeed(OUTPUT_BASE, outputPath, job.id, info, job.dbName);
+      
+      const usage = usageSince(pageUsage);
+      manifest.recordPage(job.id, info.title, [outputPath], (Date.now() - pageStart) / 1000,
+        job.dbName ? { folder: job.dbName, ...usage } : usage);
+      locations.pages[job.id] = locationEntry(outputPath, info, job.dbId, job.dbName);
+      snapshotHeap(job.id);
+      
+      console.log(`   ✅ Saved to: ${job.dbName ? `${job.dbName}/` : ''}${job.filename}`);
+      if (job.dbName) console.log(`      Properties: ${Object.keys(info.properties).length} fields`);
+    } catch (error) {
+      manifest.recordPage(job.id, job.title, [], (Date.now() - pageStart) / 1000,
+        job.dbName ? { folder: job.dbName, error: error.message } : { error: error.message });
+      console.log(`   ❌ Failed: ${error.message}`);
+    } finally {
+      span.end();
+    }
+  }
+  return remaining;
+}
+
+// Save what a deadline left over for --resume (see export_schedule.py), or clear it
+async function saveRemainder(remaining) {
+  if (remaining.length === 0) {
+    const previous = await readJson(REMAINDER_FILE);
+    if (previous && previous.exporter === 'export_all.js') await fs.rm(REMAINDER_FILE, { force: true });
+    return;
+  }
+  await writeJson(REMAINDER_FILE, {
+    exporter: 'export_all.js',
+    created_at: new Date().toISOString().slice(0, 19),
+    pages: remaining.length,
+    jobs: remaining.map(({ info, ...job }) => job),
+    // Relation titles from the lookup pass, so a resume doesn't repeat it
+    titles: pageIdToTitle
+  });
+  console.log(`\n⏱️  Deadline reached: ${remaining.length} page(s) left for later, saved to ${REMAINDER_FILE}`);
+  console.log('   Run node export_all.js --resume to finish them');
+}
+
+async function exportAll() {
+  // Scan entries say which pages are rows of which data source; NOTION_PAGE_IDS alone doesn't
+  const scan = await loadGraphPages(OUTPUT_BASE).catch(() => null);
+  const pageIds = scan ? scan.map(entry => entry.id) : await loadPageIds(OUTPUT_BASE);
+  
+  // Get ALL databases in the workspace
+  const databases = await getAllDatabases();
+  
+  // Database rows of the scan come in bulk from their data sources, 100 per request
+  const pages = new Map();
+  if (scan) {
+    console.log('Querying data sources for their rows...');
+    await queryDatabaseRows(scan, countRows(scan), pages);
+    console.log(`   ${pages.size} database rows fetched in bulk\n`);
+  }
+  
+  // Then build the page lookup for relations (retrieving only the other pages)
+  console.log('Building complete page lookup for relations...');
+  await buildPageLookup(pageIds, pages);
+  console.log(`   Found ${Object.keys(pageIdToTitle).length} pages for lookup\n`);
+  
+  // Relations/rollups past 25 references, all pages' at once
+  await propertyValues.completeAll(pages.values());
+  
+  // Create base folders - use the mounted volume path
+  const outputBase = OUTPUT_BASE;
+  await fs.mkdir(outputBase, { recursive: true });
+  console.log('📁 Creating folder structure dynamically based on your Notion workspace...\n');
+  
+  console.log(`📥 Grouping and exporting ${pageIds.length} pages...\n`);
+  
+  // Group pages by database for proper ordering (from the page objects fetched above)
+  const { grouped, standalone } = await groupPagesByDatabase(pageIds, pages);
+  pages.clear();
+  
+  const run = newRun();
+  const jobs = [...databaseJobs(grouped, databases, run), ...standaloneJobs(standalone)];
+  
+  // Recently edited pages (and priority databases) first, until the deadline
+  if (run.deadline) console.log(`⏱️  Deadline: ${EXPORT_DEADLINE}s\n`);
+  const remaining = await runJobs(scheduleJobs(jobs, EXPORT_PRIORITY), run);
+  await finishExport(run, remaining);
+}
+
+// State of one full export run (shared by exportAll and streamExport)
+function newRun() {
+  return {
+    deadline: EXPORT_DEADLINE ? Date.now() + EXPORT_DEADLINE * 1000 : null,
+    manifest: new ExportManifest(OUTPUT_BASE, 'run.sh'),
+    locations: { databases: {}, pages: {} },
+    createdFolders: new Set(),
+    databaseOverviews: {}
+  };
+}
+
+// Database pages: numbered in Notion's default view order
+function databaseJobs(grouped, databases, { databaseOverviews, locations }) {
+  const jobs = [];
+  for (const [dbId, pages] of Object.entries(grouped)) {
+    const dbName = databases[dbId] || 'Unknown Database';
+    
+    // Sort pages to match Notion's default view order
+    const sortedPages = sortDatabasePages(pages);
+    
+    // Store sorted pages for overview
+    databaseOverviews[dbId] = { dbName, sortedPages };
+    locations.databases[dbId] = dbName;
+    
+    let counter = 0;
+    for (const { id, info } of sortedPages) {
+      counter++;
+      // Use Nr property from Notion if available, otherwise use sequential counter
+      const nrValue = info.properties['Nr'] || info.properties['#'] || info.properties['nr'];
+      jobs.push(exportJob(id, info, dbId, dbName, pageFilename(nrValue || counter, info.title), nrValue || counter));
+    }
+  }
+  return jobs;
+}
+
+// Standalone pages: numbered by title
+function standaloneJobs(standalone) {
+  const sortedStandalone = [...standalone].sort((a, b) =>
+    a.info.title.localeCompare(b.info.title)
+  );
+  return sortedStandalone.map(({ id, info }, index) =>
+    exportJob(id, info, null, null, pageFilename(index + 1, info.title), index + 1));
+}
+
+// Overviews, manifest, page locations and index, remainder and watch state of a full run
+async function finishExport(run, remaining) {
+  const { manifest, createdFolders, databaseOverviews } = run;
+  const outputBase = OUTPUT_BASE;
+  // Pages this run didn't write (a --deadline cut, failures) keep the files of earlier runs
+  const previous = await readJson(LOCATIONS_FILE, { databases: {}, pages: {} });
+  const locations = {
+    databases: { ...previous.databases, ...run.locations.databases },
+    pages: { ...previous.pages, ...run.locations.pages }
+  };
+  
+  // Database snapshots and overview tables (from the grouped properties, no API calls),
+  // listing only rows that have a file; --resume adds the rest as it writes them
+  const snapshots = new DatabaseSnapshots(outputBase);
+  for (const [dbId, { dbName, sortedPages }] of Object.entries(databaseOverviews)) {
+    const written = sortedPages.filter(({ id }) => locations.pages[id]);
+    if (written.length === 0) continue;
+    createdFolders.add(path.join(outputBase, dbName));
+    await updateDatabase(snapshots, dbId, dbName, written);
+  }
+  await snapshots.save();
+  await propertyValues.save();
+  
+  manifest.api = apiLimiter.summary();
+  const { totals } = manifest.summary();
+  manifest.save();
+  await writeJson(LOCATIONS_FILE, locations);
+  await updatePageIndex(locations.pages);
+  await saveRemainder(remaining);
+  
+  // A full export is the baseline for change scans: start watching from now
+  const newest = Object.values(locations.pages).map(p => p.lastEdited).filter(Boolean).sort().pop();
+  await writeJson(WATCH_STATE_FILE, { cursor: newest || null, last_poll: new Date().toISOString(), changed: 0 });
+  
+  console.log(`\n✅ Exported ${totals.pages} pages with custom formatting (${totals.failed} failed)!`);
+  apiLimiter.report();
+  propertyValues.report();
+  console.log('\n📊 Folder structure created:');
+  
+  // List the created structure
+  for (const folder of createdFolders) {
+    if (folder === outputBase) continue;
+    const folderName = path.basename(folder);
+    console.log('   📁 ' + folderName + '/ [with _Overview.md]');
+  }
+}
+
+// Titles of the pages rows relate to that the scan hasn't reached yet (kept in `pages`
+// for when they do), so relation links get the same titles as in a full export;
+// `tried` keeps pages that can't be retrieved from being asked for again
+async function lookupRelatedPages(rows, pages, tried) {
+  const related = new Set();
+  for (const page of rows) {
+    for (const property of Object.values(page.properties)) {
+      if (property.type !== 'relation') continue;
+      for (const { id } of property.relation) {
+        const cleanId = id.replace(/-/g, '');
+        if (!(cleanId in pageIdToTitle) && !tried.has(cleanId)) related.add(cleanId);
+      }
+    }
+  }
+  for (const id of related) tried.add(id);
+  await buildPageLookup([...related], pages);
+}
+
+/**
+ * --stream: export while the scan is still running (see export_pipeline.py)
+ * Scan batches arrive on stdin, one per line: a page once its subtree has
+ * been walked, or all new rows of a database. Rows are numbered within their
+ * database, so they are exported as soon as it has been scanned. Standalone
+ * pages are numbered by title across the whole scan and wait for its end.
+ */
+async function streamExport() {
+  if (EXPORT_SELECTION.length) console.log(`⚠️  ${EXPORT_SELECTION.join(' ')} ignored: --stream exports the whole scan\n`);
+  const databases = await getAllDatabases();
+  await fs.mkdir(OUTPUT_BASE, { recursive: true });
+  const run = newRun();
+  if (run.deadline) console.log(`⏱️  Deadline: ${EXPORT_DEADLINE}s\n`);
+  const pages = new Map();
+  const tried = new Set();
+  const standalone = [];
+  const remaining = [];
+  // Rows per data source scanned so far (the totals aren't known until the scan ends)
+  const rowCounts = new Map();
+  let scanned = 0;
+  
+  for await (const { batch } of jsonLines(process.stdin)) {
+    const ids = batch.map(entry => entry.id.replace(/-/g, ''));
+    scanned += ids.length;
+    for (const [dataSourceId, count] of countRows(batch)) {
+      rowCounts.set(dataSourceId, (rowCounts.get(dataSourceId) || 0) + count);
+    }
+    await queryDatabaseRows(batch, rowCounts, pages);
+    await buildPageLookup(ids, pages);
+    await propertyValues.completeAll(ids.filter(id => pages.has(id)).map(id => pages.get(id)));
+    await lookupRelatedPages(ids.filter(id => pages.has(id)).map(id => pages.get(id)), pages, tried);
+    
+    const grouped = await groupPagesByDatabase(ids, pages);
+    for (const id of ids) pages.delete(id);
+    standalone.push(...grouped.standalone);
+    const jobs = databaseJobs(grouped.grouped, databases, run);
+    if (jobs.length) {
+      console.log(`📥 ${jobs.length} database page(s) (${scanned} scanned so far)\n`);
+      remaining.push(...await runJobs(scheduleJobs(jobs, EXPORT_PRIORITY), run));
+    }
+  }
+  
+  console.log(`📥 Scan finished: ${standalone.length} standalone page(s) of ${scanned}\n`);
+  remaining.push(...await runJobs(scheduleJobs(standaloneJobs(standalone), EXPORT_PRIORITY), run));
+  await finishExport(run, remaining);
+}
+
+// --resume: export the pages a deadline left over, into the places the full run gave them
+async function resumeExport() {
+  const remainder = await readJson(REMAINDER_FILE);
+  if (!remainder || remainder.exporter !== 'export_all.js') {
+    console.log('✅ Nothing to resume: the last export finished');
+    return;
+  }
+  const locations = await readJson(LOCATIONS_FILE, { databases: {}, pages: {} });
+  Object.assign(pageIdToTitle, remainder.titles || {});
+  
+  console.log(`📥 Resuming: ${remainder.jobs.length} page(s) left on ${remainder.created_at}\n`);
+  const manifest = new ExportManifest(OUTPUT_BASE, 'run.sh');
+  const deadline = EXPORT_DEADLINE ? Date.now() + EXPORT_DEADLINE * 1000 : null;
+  const before = new Map(remainder.jobs.map(job => [job.id, locations.pages[job.id]]));
+  const remaining = await runJobs(scheduleJobs(remainder.jobs, EXPORT_PRIORITY),
+    { deadline, manifest, locations, createdFolders: new Set() });
+  
+  // The cut run's overviews only list the rows it wrote: add the ones written now
+  const changedRows = {};
+  const touchedDatabases = new Set();
+  for (const [id, previous] of before) {
+    const entry = locations.pages[id];
+    if (!entry || entry === previous) continue;
+    changedRows[id] = entry;
+    if (entry.databaseId) touchedDatabases.add(entry.databaseId);
+  }
+  await patchDatabases(touchedDatabases, changedRows, locations);
+  
+  manifest.api = apiLimiter.summary();
+  const { totals } = manifest.summary();
+  manifest.save();
+  await writeJson(LOCATIONS_FILE, locations);
+  await updatePageIndex(locations.pages);
+  await saveRemainder(remaining);
+  console.log(`\n✅ Exported ${totals.pages} remaining page(s) (${totals.failed} failed)`);
+  apiLimiter.report();
+}
+
+// Pages edited since the high-water mark, newest first (search sorted by last_edited_time).
+// last_edited_time has minute precision, so pages from the mark's own minute come back
+// again and are skipped when their timestamp matches what was exported.
+async function findChangedPages(since, locations) {
+  const changed = [];
+  let cursor = undefined;
+  do {
+    const response = await notion.search({
+      filter: { property: 'object', value: 'page' },
+      sort: { direction: 'descending', timestamp: 'last_edited_time' },
+      page_size: 100,
+      start_cursor: cursor
+    });
+    for (const page of response.results) {
+      if (since && page.last_edited_time < since) return changed;
+      const id = page.id.replace(/-/g, '');
+      const known = locations.pages[id];
+      if (page.in_trash || page.archived) continue;
+      if (known && known.lastEdited === page.last_edited_time) continue;
+      if (!known && !isInExportScope(page, locations)) continue;
+      changed.push(page);
+    }
+    cursor = response.has_more ? response.next_cursor : undefined;
+  } while (cursor);
+  return changed;
+}
+
+// New pages are only picked up in exported databases or under exported pages
+function isInExportScope(page, locations) {
+  const parent = page.parent || {};
+  if (locations.databases[parent.data_source_id] || locations.databases[parent.database_id]) return true;
+  return Boolean(parent.page_id && locations.pages[parent.page_id.replace(/-/g, '')]);
+}
+
+// Entry number of an existing file ("07. Title.md" -> 7)
+function entryNumberFromPath(filePath) {
+  const match = path.basename(filePath).match(/^(\d+)\./);
+  return match ? parseInt(match[1], 10) : null;
+}
+
+// Re-export only pages edited since the last run, into the files they already have
+async function exportChanges() {
+  const locations = await readJson(LOCATIONS_FILE);
+  if (!locations) {
+    console.log('❌ No previous export found. Run a full export (./run.sh) first.');
+    process.exitCode = 2;
+    return;
+  }
+  const state = await readJson(WATCH_STATE_FILE, {});
+  const since = state.cursor || null;
+  
+  // Relations resolve against titles from the last export instead of a lookup pass
+  for (const [id, entry] of Object.entries(locations.pages)) {
+    pageIdToTitle[id] = entry.title;
+  }
+  
+  console.log(`🔍 Checking for pages edited since ${since || 'the beginning'}...`);
+  const changed = await findChangedPages(since, locations);
+  const pollTime = new Date().toISOString();
+  if (changed.length === 0) {
+    await writeJson(WATCH_STATE_FILE, { ...state, last_poll: pollTime, changed: 0, failed: 0 });
+    console.log('✅ No changes');
+    return;
+  }
+  
+  console.log(`📥 Re-exporting ${changed.length} changed page(s)...\n`);
+  await propertyValues.completeAll(changed);
+  const manifest = new ExportManifest(OUTPUT_BASE, 'watch');
+  const touchedDatabases = new Set();
+  const changedRows = {};
+  let databases = null;
+  let cursor = since;
+  let failed = 0;
+  
+  // Oldest first, so the cursor never moves past a page that failed to export
+  for (const page of changed.reverse()) {
+    const id = page.id.replace(/-/g, '');
+    const pageStart = Date.now();
+    const pageUsage = usageNow();
+    const known = locations.pages[id];
+    let info = { title: id };
+    const span = tracer.begin(id, 'page', { id });
+    
+    try {
+      info = await pageInfoFromPage(page);
+      pageIdToTitle[id] = info.title;
+      
+      let dbId = known ? known.databaseId : null;
+      let dbName = known ? known.database : null;
+      const isFromDatabase = info.parentType === 'database_id' ||
+                             info.parentType === 'data_source_id' ||
+                             info.dataSourceId;
+      if (!known && isFromDatabase && info.parentId) {
+        dbId = info.parentId;
+        dbName = locations.databases[dbId];
+        if (!dbName) {
+          databases = databases || await getAllDatabases();
+          dbName = databases[dbId] || 'Unknown Database';
+          locations.databases[dbId] = dbName;
+        }
+      }
+      
+      const nrValue = info.properties['Nr'] || info.properties['#'] || info.properties['nr'];
+      let outputPath;
+      if (known) {
+        outputPath = path.join(OUTPUT_BASE, known.path);
+      } else {
+        // New page: next number in its folder
+        const siblings = Object.values(locations.pages).filter(p => (p.databaseId || null) === dbId).length;
+        const folderPath = dbName ? path.join(OUTPUT_BASE, dbName) : OUTPUT_BASE;
+        outputPath = path.join(folderPath, pageFilename(nrValue || siblings + 1, info.title));
+      }
+      const entryNumber = nrValue || entryNumberFromPath(outputPath);
+      
+      await fs.mkdir(path.dirname(outputPath), { recursive: true });
+      await writeCustomMarkdown(outputPath, id, info, dbName, entryNumber);
+      await appendSearchFeed(OUTPUT_BASE, outputPath, id, info, dbName);
+      
+      manifest.recordPage(id, info.title, [outputPath], (Date.now() - pageStart) / 1000, { folder: dbName, ...usageSince(pageUsage) });
+      locations.pages[id] = locationEntry(outputPath, info, dbId, dbName);
+      changedRows[id] = locations.pages[id];
+      if (dbId) touchedDatabases.add(dbId);
+      if (!failed) cursor = page.last_edited_time;
+      snapshotHeap(id);
+      
+      console.log(`   ✅ ${known ? 'Updated' : 'Added'}: ${path.relative(OUTPUT_BASE, outputPath)}`);
+    } catch (error) {
+      failed++;
+      manifest.recordPage(id, info.title, [], (Date.now() - pageStart) / 1000, { error: error.message });
+      console.log(`   ❌ Failed: ${info.title}: ${error.message}`);
+    } finally {
+      span.end({ title: info.title });
+    }
+  }
+  
+  await patchDatabases(touchedDatabases, changedRows, locations);
+  await propertyValues.save();
+  
+  await writeJson(LOCATIONS_FILE, locations);
+  await updatePageIndex(locations.pages);
+  manifest.api = apiLimiter.summary();
+  manifest.save();
+  await writeJson(WATCH_STATE_FILE, {
+    cursor,
+    last_poll: pollTime,
+    changed: changed.length - failed,
+    failed
+  });
+  console.log(`\n✅ Updated ${changed.length - failed} page(s) (${failed} failed)`);
+  apiLimiter.report();
+  propertyValues.report();
+}
+
+// Patch re-exported rows (id -> location entry) into their databases' snapshots and
+// rebuild those databases' overviews from them (no API calls); other databases are untouched
+async function patchDatabases(touchedDatabases, changedRows, locations) {
+  const snapshots = new DatabaseSnapshots(OUTPUT_BASE);
+  for (const dbId of touchedDatabases) {
+    const dbName = locations.databases[dbId];
+    const rows = new Map();
+    if (await snapshots.has(dbId)) {
+      const propertyOrder = await snapshots.propertyOrder(dbId);
+      for (const row of await snapshots.rows(dbId)) {
+        rows.set(row.id, { id: row.id, info: { ...row, lastEdited: row.last_edited_time, propertyOrder } });
+      }
+    } else {
+      // Output from before snapshots: start from the stored properties
+      for (const [id, entry] of Object.entries(locations.pages)) {
+        if (entry.databaseId === dbId) rows.set(id, { id, info: entry });
+      }
+    }
+    for (const [id, entry] of Object.entries(changedRows)) {
+      if (entry.databaseId === dbId) rows.set(id, { id, info: entry });
+    }
+    await updateDatabase(snapshots, dbId, dbName, sortDatabasePages([...rows.values()]));
+  }
+  await snapshots.save();
+}
+
+// Page objects for scan entries: rows in bulk where that pays (see queryDatabaseRows),
+// the rest retrieved one by one
+async function fetchSelectedPages(entries, rowCounts, pages) {
+  await queryDatabaseRows(entries, rowCounts, pages);
+  await buildPageLookup(entries.map(entry => entry.id), pages);
+}
+
+// Related pages in the scan that the last export didn't write, one hop from `rows`
+function unexportedRelatedPages(rows, graphIds, locations, selectedIds) {
+  const related = new Set();
+  for (const page of rows) {
+    for (const property of Object.values(page.properties)) {
+      if (property.type !== 'relation') continue;
+      for (const { id } of property.relation) {
+        const cleanId = id.replace(/-/g, '');
+        if (graphIds.has(cleanId) && !locations.pages[cleanId] && !selectedIds.has(cleanId)) related.add(cleanId);
+      }
+    }
+  }
+  return related;
+}
+
+/**
+ * --only / --subtree / --since (EXPORT_ONLY, EXPORT_SUBTREE, EXPORT_SINCE): export
+ * just part of the scanned graph (see PageSelection in page_graph.py)
+ * Selected pages go into the files the last export gave them, new ones get the
+ * next number in their folder, and only their databases' snapshots and
+ * _Overview.md are patched. Relations resolve against the titles of exported
+ * pages; only the missing ones are looked up, and with --with-related
+ * (EXPORT_RELATED) related pages that were never exported are exported too.
+ *
+ * --shards N --shard-index i runs the same way on one shard of the graph.
+ * Standalone pages are then numbered by title across the whole graph, and
+ * related pages are left to their own shards, so the merged shards are the
+ * files of one full export.
+ */
+async function selectiveExport() {
+  const graph = await loadGraphPages(OUTPUT_BASE);
+  let selected;
+  try {
+    selected = await loadGraphPages(OUTPUT_BASE, EXPORT_SELECTION);
+  } catch {
+    // page_graph.py has named the --only / --subtree entries that match nothing
+    console.error(`❌ Selection failed: ${EXPORT_SELECTION.join(' ')}`);
+    process.exitCode = 1;
+    return;
+  }
+  console.log(`🎯 Selective export (${EXPORT_SELECTION.join(' ')}): ${selected.length} of ${graph.length} page(s)\n`);
+  if (selected.length === 0) {
+    console.log('ℹ️  Nothing selected (no page edited in that time, or an empty shard)');
+    return;
+  }
+  
+  // Titles of every scanned page (the scan reads them the same way), then of the exported ones
+  const locations = await readJson(LOCATIONS_FILE, { databases: {}, pages: {} });
+  for (const entry of graph) {
+    if (entry.title) pageIdToTitle[entry.id.replace(/-/g, '')] = entry.title;
+  }
+  for (const [id, entry] of Object.entries(locations.pages)) {
+    pageIdToTitle[id] = entry.title;
+  }
+  const rowCounts = countRows(graph);
+  
+  const pages = new Map();
+  await fetchSelectedPages(selected, rowCounts, pages);
+  const ids = selected.map(entry => entry.id.replace(/-/g, ''));
+  await propertyValues.completeAll(ids.filter(id => pages.has(id)).map(id => pages.get(id)));
+  
+  if (EXPORT_RELATED && !SHARDED) {
+    const graphIds = new Map(graph.map(entry => [entry.id.replace(/-/g, ''), entry]));
+    const related = unexportedRelatedPages(ids.filter(id => pages.has(id)).map(id => pages.get(id)),
+      graphIds, locations, new Set(ids));
+    if (related.size) {
+      console.log(`🔗 ${related.size} related page(s) not exported yet come along\n`);
+      const entries = [...related].map(id => graphIds.get(id));
+      await fetchSelectedPages(entries, rowCounts, pages);
+      await propertyValues.completeAll([...related].filter(id => pages.has(id)).map(id => pages.get(id)));
+      ids.push(...related);
+    }
+  }
+  // Titles of related pages outside the scan (a full export, and so a shard, goes without)
+  if (!SHARDED) {
+    await lookupRelatedPages(ids.filter(id => pages.has(id)).map(id => pages.get(id)), pages, new Set());
+  }
+  
+  const { grouped, standalone } = await groupPagesByDatabase(ids, pages);
+  pages.clear();
+  
+  // Known pages keep their files; new ones are numbered after their folder's last entry
+  let databases = null;
+  const folderCounts = new Map();
+  for (const entry of Object.values(locations.pages)) {
+    const key = entry.databaseId || null;
+    folderCounts.set(key, (folderCounts.get(key) || 0) + 1);
+  }
+  const standaloneNumbers = new Map(SHARDED ? graph
+    .filter(entry => !entry.fromDatabase)
+    .sort((a, b) => (a.title || 'Untitled').localeCompare(b.title || 'Untitled'))
+    .map((entry, index) => [entry.id.replace(/-/g, ''), index + 1]) : []);
+  const jobs = [];
+  const place = async ({ id, info }, groupDbId) => {
+    const known = locations.pages[id];
+    const nrValue = info.properties['Nr'] || info.properties['#'] || info.properties['nr'];
+    if (known) {
+      jobs.push(exportJob(id, info, known.databaseId || null, known.database || null,
+        path.basename(known.path), nrValue || entryNumberFromPath(known.path)));
+      return;
+    }
+    let dbName = null;
+    if (groupDbId) {
+      dbName = locations.databases[groupDbId];
+      if (!dbName) {
+        databases = databases || await getAllDatabases();
+        dbName = databases[groupDbId] || 'Unknown Database';
+        locations.databases[groupDbId] = dbName;
+      }
+    }
+    const number = (!groupDbId && standaloneNumbers.get(id)) || (folderCounts.get(groupDbId) || 0) + 1;
+    folderCounts.set(groupDbId, (folderCounts.get(groupDbId) || 0) + 1);
+    jobs.push(exportJob(id, info, groupDbId, dbName, pageFilename(nrValue || number, info.title), nrValue || number));
+  };
+  for (const [dbId, rows] of Object.entries(grouped)) {
+    for (const row of sortDatabasePages(rows)) await place(row, dbId);
+  }
+  for (const page of [...standalone].sort((a, b) => a.info.title.localeCompare(b.info.title))) {
+    await place(page, null);
+  }
+  
+  const manifest = new ExportManifest(OUTPUT_BASE, SHARDED ? 'run.sh' : 'selective');
+  const deadline = EXPORT_DEADLINE ? Date.now() + EXPORT_DEADLINE * 1000 : null;
+  if (deadline) console.log(`⏱️  Deadline: ${EXPORT_DEADLINE}s\n`);
+  const before = new Map(jobs.map(job => [job.id, locations.pages[job.id]]));
+  const remaining = await runJobs(scheduleJobs(jobs, EXPORT_PRIORITY),
+    { deadline, manifest, locations, createdFolders: new Set() });
+  
+  // Only the databases of the pages just written
+  const changedRows = {};
+  const touchedDatabases = new Set();
+  for (const [id, previous] of before) {
+    const entry = locations.pages[id];
+    if (!entry || entry === previous) continue;
+    changedRows[id] = entry;
+    if (entry.databaseId) touchedDatabases.add(entry.databaseId);
+  }
+  await patchDatabases(touchedDatabases, changedRows, locations);
+  await propertyValues.save();
+  
+  manifest.api = apiLimiter.summary();
+  const { totals } = manifest.summary();
+  manifest.save();
+  await writeJson(LOCATIONS_FILE, locations);
+  await updatePageIndex(changedRows);
+  // A remainder of an earlier run stays, minus what was just exported
+  const previous = await readJson(REMAINDER_FILE);
+  const left = new Set(remaining.map(job => job.id));
+  const kept = previous && previous.exporter === 'export_all.js'
+    ? previous.jobs.filter(job => !changedRows[job.id] && !left.has(job.id)) : [];
+  await saveRemainder([...kept, ...remaining]);
+  
+  console.log(`\n✅ Exported ${totals.pages} selected page(s) (${totals.failed} failed), ` +
+    `${touchedDatabases.size} database(s) patched`);
+  apiLimiter.report();
+  propertyValues.report();
+}
+
+// --profile: run again under the V8 CPU profiler (see profiling.py)
+relaunchProfiled(OUTPUT_BASE);
+// --trace: Chrome trace timeline of this run (see tracing.py)
+startTracing(OUTPUT_BASE);
+
+if (process.argv.includes('--changes')) {
+  exportChanges().catch((error) => {
+    console.error(error);
+    process.exitCode = 1;
+  });
+} else if (process.argv.includes('--resume')) {
+  resumeExport().catch((error) => {
+    console.error(error);
+    process.exitCode = 1;
+  });
+} else if (process.argv.includes('--stream')) {
+  streamExport().catch((error) => {
+    console.error(error);
+    process.exitCode = 1;
+  });
+} else if (EXPORT_SELECTION.length) {
+  selectiveExport().catch((error) => {
+    console.error(error);
+    process.exitCode = 1;
+  });
+} else {
+  exportAll().catch((error) => {
+    console.error(error);
+    process.exitCode = 1;
+  });
+}
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Dry-run cost estimator
+Estimates the API requests, wall-clock time and disk use of a full export from
+the scanned page tree and the per-page costs recorded in the last run's
+manifest, and flags the pages most likely to be slow or time out
+"""
+
+import os
+import sys
+import argparse
+import statistics
+from typing import Dict, List, Optional
+
+from export_manifest import load_manifest
+from export_plan import clean_id, load_structure
+
+# Notion's documented average limit per integration
+DEFAULT_RATE = 3.0
+# Pages slower than this (in the last run) are flagged as timeout-prone
+DEFAULT_PAGE_TIMEOUT = 60
+# Requests per page when there is no history at all: one children list plus one nested container
+DEFAULT_REQUESTS_PER_PAGE = 2
+
+def _median(values: List[float], fallback: float) -> float:
+    return statistics.median(values) if values else fallback
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+def estimate(output_dir: str, rate: float = DEFAULT_RATE,
+             page_timeout: float = DEFAULT_PAGE_TIMEOUT) -> Optional[Dict]:
+    """Estimate the cost of exporting every scanned page; None if nothing is known yet"""
+    manifest = load_manifest(output_dir) or {}
+    history = {clean_id(p['id']): p for p in manifest.get('pages', []) if 'error' not in p}
+    failed = {clean_id(p['id']): p.get('error', '') for p in manifest.get('failures', [])}
+
+    pages = load_structure(output_dir)
+    if not pages:
+        # No scan: the last run's pages are the best guess at what the next one exports
+        pages = [{'id': p['id'], 'title': p.get('title')} for p in manifest.get('pages', [])]
+    if not pages:
+        return None
+
+    measured = [p for p in history.values() if 'requests' in p]
+    per_page_requests = _median([p['requests'] for p in measured], DEFAULT_REQUESTS_PER_PAGE)
+    per_page_bytes = _median([p['bytes'] for p in history.values()], 0)
+
+    # Requests the last run made outside per-page exports (titles, schemas, searches), spread per page
+    api = manifest.get('api') or {}
+    overhead = 0.0
+    if api.get('requests') and measured:
+        overhead = max(0, api['requests'] - sum(p['requests'] for p in measured)) / len(measured)
+    # Observed pace of the last run (includes throttling); the rate limit when there is none
+    seconds_per_request = 1 / rate
+    if api.get('requests') and manifest.get('duration_seconds'):
+        seconds_per_request = max(seconds_per_request, manifest['duration_seconds'] / api['requests'])
+
+    rows = []
+    for page in pages:
+        page_id = clean_id(page['id'])
+        last = history.get(page_id)
+        requests = (last['requests'] if last and 'requests' in last else per_page_requests) + overhead
+        rows.append({
+            'id': page_id,
+            'title': page.get('title') or (last or {}).get('title') or page_id[:8],
+            'measured': last is not None,
+            'requests': requests,
+            'blocks': (last or {}).get('blocks'),
+            'seconds': last['seconds'] if last else requests * seconds_per_request,
+            'bytes': last['bytes'] if last else per_page_bytes,
+            'failed_last_run': failed.get(page_id),
+        })
+
+    total_requests = sum(r['requests'] for r in rows)
+    # Page times come from the last run, but the run can't go faster than the rate limit
+    total_seconds = max(sum(r['seconds'] for r in rows), total_requests / rate)
+    return {
+        'pages': len(rows),
+        'measured': sum(1 for r in rows if r['measured']),
+        'requests': round(total_requests),
+        'seconds': total_seconds,
+        'bytes': sum(r['bytes'] for r in rows),
+        'rate': rate,
+        'last_run_seconds': manifest.get('duration_seconds'),
+        'throttle_seconds': api.get('throttle_seconds'),
+        'largest': sorted(rows, key=lambda r: (r['seconds'], r['requests']), reverse=True),
+        'at_risk': [r for r in rows if r['seconds'] > page_timeout or r['failed_last_run']],
+        'page_timeout': page_timeout,
+    }
+
+def print_estimate(result: Optional[Dict], top: int = 10) -> None:
+    if not result:
+        print("ℹ️  Nothing to estimate yet: run a scan (python notion_cli.py scan) first")
+        return
+    print(f"📐 Export estimate (dry run): {result['pages']} pages, "
+          f"{result['measured']} with timings from the last run")
+    print(f"   📡 API requests: ~{result['requests']:,} (~{result['requests'] / result['pages']:.1f} per page)")
+    last = f" (last run: {format_duration(result['last_run_seconds'])})" if result.get('last_run_seconds') else ""
+    print(f"   ⏱️  Wall clock: ~{format_duration(result['seconds'])} at {result['rate']:g} req/s{last}")
+    if result.get('throttle_seconds'):
+        print(f"   ⏳ Last run was throttled for {result['throttle_seconds']:.1f}s")
+    print(f"   💾 Disk: ~{format_bytes(result['bytes'])} of markdown")
+
+    if top and result['largest']:
+        print(f"\n🐢 Slowest pages:")
+        for row in result['largest'][:top]:
+            source = '' if row['measured'] else ' (estimated)'
+            blocks = f", {row['blocks']} blocks" if row.get('blocks') is not None else ''
+            print(f"   • {row['title'][:50]} ({row['id'][:8]}...): {row['seconds']:.1f}s, "
+                  f"{row['requests']:.0f} requests{blocks}, {format_bytes(row['bytes'])}{source}")
+
+    if result['at_risk']:
+        print(f"\n⚠️  Timeout-prone pages (over {result['page_timeout']:g}s, or failed last time):")
+        for row in result['at_risk'][:top or None]:
+            reason = f"failed: {row['failed_last_run'].splitlines()[0][:80]}" if row['failed_last_run'] \
+                else f"{row['seconds']:.1f}s"
+            print(f"   • {row['title'][:50]} ({row['id'][:8]}...): {reason}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Estimate the cost of a full export without running it')
+    parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'Sustained API requests per second (default: {DEFAULT_RATE:g})')
+    parser.add_argument('--page-timeout', type=float, default=DEFAULT_PAGE_TIMEOUT,
+                        help=f'Flag pages slower than this many seconds (default: {DEFAULT_PAGE_TIMEOUT})')
+    parser.add_argument('--top', type=int, default=10, help='How many of the slowest pages to list')
+    args = parser.parse_args()
+
+    result = estimate(args.output, args.rate, args.page_timeout)
+    print_estimate(result, args.top)
+    return 0 if result else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
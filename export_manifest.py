@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Per-run export manifest
+Records pages, files, bytes, failures and timings for each export run so
+status reporting never has to walk the output tree
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_FILENAME = '.export_manifest.json'
+ROOT_FOLDER = '.'
+
+def load_manifest(output_dir: str) -> Optional[Dict]:
+    """Load the manifest of the last export run, if there is one"""
+    manifest_file = Path(output_dir) / MANIFEST_FILENAME
+    if not manifest_file.exists():
+        return None
+    try:
+        with open(manifest_file) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+class ExportManifest:
+    """Accumulates per-page results during a run and writes them out at the end
+
+    The same format is written by ExportManifest in notion_utils.js (run.sh).
+    """
+
+    def __init__(self, output_dir: str, exporter: str):
+        self.output_dir = Path(output_dir)
+        self.exporter = exporter
+        self.started_at = datetime.now()
+        self._start = time.monotonic()
+        self.pages: List[Dict] = []
+        self.api: Optional[Dict] = None  # Request/throttle stats reported by notion_export.js
+
+    def folder_for(self, file_path: str) -> str:
+        """Top-level output folder a file lives in ('.' for the output root)"""
+        try:
+            parts = Path(file_path).relative_to(self.output_dir).parts
+        except ValueError:
+            return ROOT_FOLDER
+        return parts[0] if len(parts) > 1 else ROOT_FOLDER
+
+    def record_page(self, page_id: str, title: str, files: List[str],
+                    seconds: float, folder: Optional[str] = None,
+                    error: Optional[str] = None, blocks: Optional[int] = None,
+                    requests: Optional[int] = None) -> None:
+        """Record one exported (or failed) page and the files it produced"""
+        sizes = []
+        for file_path in files:
+            try:
+                sizes.append(os.path.getsize(file_path))
+            except OSError:
+                pass
+        if folder is None:
+            folder = self.folder_for(files[0]) if files else ROOT_FOLDER
+        entry = {
+            'id': page_id,
+            'title': title,
+            'folder': folder,
+            'files': [str(f) for f in files],
+            'bytes': sum(sizes),
+            'seconds': round(seconds, 3),
+        }
+        # Measured cost, used by the dry-run estimator (export_estimate.py)
+        if blocks is not None:
+            entry['blocks'] = blocks
+        if requests is not None:
+            entry['requests'] = requests
+        if error:
+            entry['error'] = error[:500]
+        self.pages.append(entry)
+
+    def summary(self) -> Dict:
+        """Build the manifest document: totals, per-folder breakdown, failures"""
+        folders: Dict[str, Dict] = {}
+        for page in self.pages:
+            stats = folders.setdefault(page['folder'], {'pages': 0, 'failed': 0, 'files': 0, 'bytes': 0, 'seconds': 0.0})
+            if 'error' in page:
+                stats['failed'] += 1
+            else:
+                stats['pages'] += 1
+            stats['files'] += len(page['files'])
+            stats['bytes'] += page['bytes']
+            stats['seconds'] = round(stats['seconds'] + page['seconds'], 3)
+
+        return {
+            'exporter': self.exporter,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'duration_seconds': round(time.monotonic() - self._start, 3),
+            'totals': {
+                'pages': sum(f['pages'] for f in folders.values()),
+                'failed': sum(f['failed'] for f in folders.values()),
+                'files': sum(f['files'] for f in folders.values()),
+                'bytes': sum(f['bytes'] for f in folders.values()),
+            },
+            'folders': dict(sorted(folders.items())),
+            'failures': [
+                {'id': p['id'], 'title': p['title'], 'error': p['error']}
+                for p in self.pages if 'error' in p
+            ],
+            **({'api': self.api} if self.api else {}),
+            'pages': self.pages,
+        }
+
+    def save(self) -> Path:
+        return write_manifest(self.output_dir, self.summary())
+
+def write_manifest(output_dir: str, manifest: Dict) -> Path:
+    """Write a manifest atomically so readers never see a partial file"""
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    manifest_file = Path(output_dir) / MANIFEST_FILENAME
+    tmp_file = manifest_file.with_suffix('.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, manifest_file)
+    return manifest_file
+
+# Request stats that describe a peak rather than add up across processes
+API_PEAKS = ('concurrency', 'peak_concurrency')
+
+def merge_manifests(output_dir: str, shards: List[Tuple[str, Dict]]) -> Dict:
+    """One manifest for runs that exported parts of the same output (shard dir, manifest), in order
+
+    Files move from each shard's directory to output_dir, API stats add up,
+    and the run spans the earliest start to the latest finish.
+    """
+    exporters = list(dict.fromkeys(manifest.get('exporter') for _, manifest in shards))
+    merged = ExportManifest(output_dir, ' + '.join(e for e in exporters if e) or 'shards')
+    api: Dict[str, float] = {}
+    for shard_dir, manifest in shards:
+        for page in manifest.get('pages', []):
+            files = []
+            for file_path in page.get('files', []):
+                try:
+                    files.append(str(Path(output_dir) / Path(file_path).relative_to(shard_dir)))
+                except ValueError:
+                    files.append(file_path)
+            merged.pages.append({**page, 'files': files})
+        for key, value in (manifest.get('api') or {}).items():
+            if isinstance(value, (int, float)):
+                api[key] = max(api.get(key, 0), value) if key in API_PEAKS else round(api.get(key, 0) + value, 3)
+    merged.api = api or None
+
+    summary = merged.summary()
+    started = [m['started_at'] for _, m in shards if m.get('started_at')]
+    finished = [m['finished_at'] for _, m in shards if m.get('finished_at')]
+    if started and finished:
+        summary['started_at'], summary['finished_at'] = min(started), max(finished)
+        try:
+            span = datetime.fromisoformat(max(finished)) - datetime.fromisoformat(min(started))
+            summary['duration_seconds'] = round(span.total_seconds(), 3)
+        except (TypeError, ValueError):
+            summary['duration_seconds'] = max(m.get('duration_seconds', 0) for _, m in shards)
+    pages = summary.pop('pages')
+    summary['shards'] = [
+        {
+            'index': index,
+            'exporter': manifest.get('exporter'),
+            'pages': manifest.get('totals', {}).get('pages', 0),
+            'failed': manifest.get('totals', {}).get('failed', 0),
+            'duration_seconds': manifest.get('duration_seconds'),
+            'requests': (manifest.get('api') or {}).get('requests'),
+        }
+        for index, (_, manifest) in enumerate(shards)
+    ]
+    summary['pages'] = pages
+    return summary
@@ -7,20 +7,40 @@ Orchestrates the Node.js script and handles configuration
 import os
 import sys
 import json
-import subprocess
+import argparse
 from pathlib import Path
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+from search_index import SearchIndex
+from export_manifest import ExportManifest
+from attachments import localize_last_run, print_stats
+from link_rewrite import update_page_index, rewrite_links, print_stats as print_link_stats
+from export_plan import build_plan, load_structure, print_plan
+from export_schedule import (add_arguments, parse_duration, priority_list, resume_plan,
+                             run_scheduled_plan, schedule_plan)
+from export_pipeline import run_pipelined_plan
+from page_graph import PageGraph, PageSelection, add_selection_arguments, page_ids
+from profiling import profiled_main
+
 # Load environment variables from .env file if it exists
 load_dotenv()
 
 class NotionExporter:
     def __init__(self):
         self.notion_token = os.getenv('NOTION_TOKEN')
-        self.notion_page_ids = os.getenv('NOTION_PAGE_IDS', os.getenv('NOTION_PAGE_ID', ''))
         self.output_dir = os.getenv('OUTPUT_DIR', '/app/output')
         self.separate_child_pages = os.getenv('SEPARATE_CHILD_PAGES', 'true').lower() == 'true'
+        self.download_attachments = os.getenv('DOWNLOAD_ATTACHMENTS', 'true').lower() == 'true'
+        self.attachment_workers = int(os.getenv('ATTACHMENT_WORKERS', '8'))
+        # Scheduling (see export_schedule.py): time budget in seconds, resume, database priority
+        self.deadline = None
+        self.resume = False
+        self.priority = []
+        # Scan and export at the same time (see export_pipeline.py)
+        self.pipeline = False
+        # Part of the page graph to export (--only / --subtree / --since, see page_graph.py)
+        self.selection = PageSelection()
         
     def validate_config(self) -> bool:
         """Validate required configuration"""
@@ -29,24 +49,40 @@ class NotionExporter:
             print("   Get it from: https://www.notion.so/my-integrations")
             return False
         
-        if not self.notion_page_ids:
-            print("❌ Error: NOTION_PAGE_IDS environment variable is required")
-            print("   Provide one or more page IDs separated by commas")
+        if self.pipeline:
+            # The page list comes from the scan running alongside the export
+            self.page_ids_list = []
+            print(f"📋 Configuration:")
+            print(f"   - Pages to export: as the scan finds them")
+            print(f"   - Output directory: {self.output_dir}")
+            print(f"   - Separate child pages: {self.separate_child_pages}")
+            print()
+            return True
+        
+        if self.selection and not PageGraph(self.output_dir).exists():
+            print(f"❌ Error: Selecting pages ({self.selection.describe()}) needs a scan")
+            print("   Run get_page_ids.py first")
             return False
         
-        # Parse page IDs (support both comma and space separated)
-        self.page_ids_list = [
-            pid.strip().replace('-', '') 
-            for pid in self.notion_page_ids.replace(' ', ',').split(',') 
-            if pid.strip()
-        ]
+        # The scanned page graph, else NOTION_PAGE_IDS (comma or space separated)
+        try:
+            self.page_ids_list = [pid.replace('-', '') for pid in page_ids(self.output_dir, self.selection)]
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return False
         
+        if not self.page_ids_list and self.selection:
+            print(f"❌ Error: No scanned page matches the selection ({self.selection.describe()})")
+            return False
         if not self.page_ids_list:
-            print("❌ Error: No valid page IDs found")
+            print("❌ Error: No pages to export")
+            print("   Run a scan (get_page_ids.py) or set NOTION_PAGE_IDS to one or more page IDs")
             return False
         
         print(f"📋 Configuration:")
         print(f"   - Pages to export: {len(self.page_ids_list)}")
+        if self.selection:
+            print(f"   - Selection: {self.selection.describe()}")
         for pid in self.page_ids_list[:3]:  # Show first 3
             print(f"     • {pid[:8]}...")
         if len(self.page_ids_list) > 3:
@@ -59,74 +95,92 @@ class NotionExporter:
     
     def run_node_script(self) -> Dict:
         """Execute the Node.js script and return results"""
+        search_index = None
+        manifest = ExportManifest(self.output_dir, 'export_notion.py')
         try:
-            # Export each page individually to ensure all are processed
+            # Pages are indexed for search as they are written
+            search_index = SearchIndex(self.output_dir)
+            
             all_results = {
                 'success': True,
                 'totalPages': len(self.page_ids_list),
                 'pages': []
             }
             
-            print("🚀 Starting Notion export...")
-            print(f"   Exporting {len(self.page_ids_list)} page(s)...")
-            print()
+            # One plan for all pages: child pages are rendered once and reused by their
+            # parents instead of being fetched again for every ancestor
+            if self.pipeline:
+                result = self.run_pipeline(all_results)
+            else:
+                if self.resume:
+                    plan = resume_plan(self.output_dir, 'export_notion.py')
+                    if not plan:
+                        print("✅ Nothing to resume: the last export finished")
+                        return all_results
+                    all_results['totalPages'] = len(plan['order'])
+                else:
+                    pages = load_structure(self.output_dir)
+                    plan = build_plan(self.page_ids_list, pages, self.output_dir,
+                                      separate_child_pages=self.separate_child_pages)
+                    # Recently edited pages (and priority databases) first
+                    schedule_plan(plan, pages, self.priority)
             
-            for idx, page_id in enumerate(self.page_ids_list, 1):
-                clean_page_id = page_id.strip().replace('-', '')
-                print(f"   📄 [{idx}/{len(self.page_ids_list)}] Exporting page {clean_page_id[:8]}...")
-                
-                # Prepare arguments for Node.js script
-                args = [
-                    'node',
-                    'notion_export.js',
-                    self.notion_token,
-                    clean_page_id,  # Export one page at a time
-                    self.output_dir,
-                    str(self.separate_child_pages).lower()
-                ]
-                
-                # Run the Node.js script with extended timeout for large pages
-                result = subprocess.run(
-                    args,
-                    capture_output=True,
-                    text=True,
-                    check=False,
-                    timeout=60  # Extended timeout for large pages
-                )
-                
-                # Parse the result
-                if result.returncode != 0:
-                    error_msg = result.stderr or result.stdout
+                print("🚀 Starting Notion export...")
+                print(f"   Exporting {all_results['totalPages']} page(s)...")
+                if self.deadline:
+                    print(f"   Deadline: {self.deadline:.0f}s")
+                if not self.resume:
+                    print_plan(plan)
+                print()
+            
+                result = run_scheduled_plan(plan, self.notion_token, self.output_dir, 'export_notion.py', self.deadline)
+            manifest.api = result.get('api')
+            if not result.get('pages') and result.get('error'):
+                return {'success': False, 'error': result['error']}
+            
+            for exported in result.get('pages', []):
+                page_id = exported.get('pageId')
+                if exported.get('success'):
+                    all_results['pages'].append(exported)
+                    search_index.index_export_result(exported)
+                    manifest.record_page(
+                        page_id,
+                        exported.get('pageName', page_id),
+                        [f['path'] for f in exported.get('files', [])],
+                        exported.get('seconds', 0),
+                        blocks=exported.get('blocks'),
+                        requests=exported.get('requests')
+                    )
+                else:
+                    error_msg = exported.get('error', 'Unknown error')
                     all_results['pages'].append({
-                        'pageId': clean_page_id,
+                        'pageId': page_id,
                         'error': error_msg[:200]  # Truncate long errors
                     })
-                    print(f"      ❌ Failed: {error_msg[:100]}")
-                else:
-                    try:
-                        page_result = json.loads(result.stdout)
-                        if page_result.get('success') and page_result.get('pages'):
-                            all_results['pages'].extend(page_result['pages'])
-                            print(f"      ✅ Success")
-                        else:
-                            all_results['pages'].append({
-                                'pageId': clean_page_id,
-                                'error': 'No content returned'
-                            })
-                            print(f"      ⚠️  No content")
-                    except json.JSONDecodeError:
-                        all_results['pages'].append({
-                            'pageId': clean_page_id,
-                            'error': 'Invalid JSON response'
-                        })
-                        print(f"      ❌ Invalid response")
+                    manifest.record_page(page_id, page_id, [], exported.get('seconds', 0), error=error_msg)
             
             return all_results
                 
-        except subprocess.TimeoutExpired:
-            return {'success': False, 'error': 'Export timed out - page may be too large'}
         except Exception as e:
             return {'success': False, 'error': str(e)}
+        finally:
+            if search_index:
+                search_index.close()
+            manifest.save()
+    
+    def run_pipeline(self, all_results: Dict) -> Dict:
+        """Scan and export at the same time; returns the notion_export.js result"""
+        print("🚀 Starting Notion scan + export (pipelined)...")
+        if self.deadline:
+            print(f"   Deadline: {self.deadline:.0f}s")
+        print()
+        scan, result = run_pipelined_plan(self.notion_token, self.output_dir, 'export_notion.py',
+                                          self.separate_child_pages, self.deadline)
+        if not scan.get('success'):
+            all_results['success'] = False
+            all_results['error'] = f"Scan failed: {scan.get('error')}"
+        all_results['totalPages'] = len(result.get('pages', []))
+        return result
     
     def display_results(self, result: Dict) -> None:
         """Display the export results"""
@@ -182,15 +236,47 @@ class NotionExporter:
         # Display results
         self.display_results(result)
         
+        # Links between exported pages become relative links (offline, from the page index)
+        if result.get('success'):
+            update_page_index(self.output_dir, result.get('pages', []))
+            print_link_stats(rewrite_links(self.output_dir))
+        
+        # Fetch images/files before their signed URLs expire
+        if result.get('success') and self.download_attachments:
+            stats = localize_last_run(self.output_dir, self.attachment_workers)
+            if stats:
+                print_stats(stats)
+        
         return result.get('success', False)
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description='Export Notion pages to Markdown')
+    add_arguments(parser)
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Scan at the same time and export pages as they are found (see export_pipeline.py)')
+    add_selection_arguments(parser)
+    args = parser.parse_args()
+    try:
+        deadline = parse_duration(args.deadline)
+        selection = PageSelection.from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.pipeline and args.resume:
+        parser.error('--resume exports a stored remainder; it does not scan, so it cannot be pipelined')
+    if args.pipeline and selection:
+        parser.error('--only/--subtree/--since select from a finished scan; they cannot be pipelined')
+    
     exporter = NotionExporter()
+    exporter.deadline = deadline
+    exporter.resume = args.resume
+    exporter.priority = priority_list(args.priority)
+    exporter.pipeline = args.pipeline
+    exporter.selection = selection
     success = exporter.export()
     
     # Exit with appropriate code
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    profiled_main('export_notion', main)
\ No newline at end of file
@@ -6,11 +6,25 @@ Hierarchical Notion to Markdown exporter that preserves structure
 import os
 import sys
 import json
+import time
+import argparse
 import subprocess
 from pathlib import Path
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+from search_index import SearchIndex
+from export_manifest import ExportManifest
+from attachments import localize_last_run, print_stats
+from link_rewrite import update_page_index, rewrite_links, print_stats as print_link_stats
+from export_plan import build_plan, print_plan
+from export_schedule import (add_arguments, parse_duration, priority_list, resume_plan,
+                             run_scheduled_plan, schedule_plan)
+from page_graph import PageGraph, PageSelection, add_selection_arguments
+from export_estimate import format_duration
+from profiling import node_command, profiled_main
+from tracing import span
+
 load_dotenv()
 
 class HierarchicalNotionExporter:
@@ -19,7 +33,17 @@ class HierarchicalNotionExporter:
         self.notion_page_ids = os.getenv('NOTION_PAGE_IDS', os.getenv('NOTION_PAGE_ID', ''))
         self.output_dir = os.getenv('OUTPUT_DIR', './output')
         self.separate_child_pages = os.getenv('SEPARATE_CHILD_PAGES', 'true').lower() == 'true'
+        self.download_attachments = os.getenv('DOWNLOAD_ATTACHMENTS', 'true').lower() == 'true'
+        self.attachment_workers = int(os.getenv('ATTACHMENT_WORKERS', '8'))
         self.structure = {}  # Will hold the hierarchical structure
+        # Scheduling (see export_schedule.py): time budget in seconds, resume, database priority
+        self.deadline = None
+        self.resume = False
+        self.priority = []
+        # Part of the tree to export (--only / --subtree / --since, see page_graph.py)
+        self.selection = PageSelection()
+        # Scan again even when a stored scan of the same root exists
+        self.rescan = False
         
     def validate_config(self) -> bool:
         """Validate required configuration"""
@@ -33,25 +57,43 @@ class HierarchicalNotionExporter:
         
         return True
     
+    def stored_structure(self, root_id: str) -> Dict:
+        """The scanned page graph, if it was scanned from this root (and --rescan wasn't given)"""
+        graph = PageGraph(self.output_dir)
+        meta = graph.meta()
+        if self.rescan or not meta or (meta.get('parentPage') or '').replace('-', '') != root_id:
+            return {}
+        pages = list(graph.pages())
+        age = graph.age()
+        taken = f"{format_duration(age)} ago" if age is not None else "at an unknown time"
+        print(f"🗂️  Using the stored scan taken {taken} ({graph.path}, {len(pages)} pages)")
+        print("   Pages added since then are not exported; pass --rescan to scan again")
+        self.build_hierarchy(pages)
+        return {'success': True, 'totalPages': len(pages), 'pages': pages, **meta}
+    
     def get_page_structure(self) -> Dict:
         """Get the hierarchical structure of pages"""
+        root_id = self.notion_page_ids.split(',')[0].strip().replace('-', '')  # Use first as parent
+        stored = self.stored_structure(root_id)
+        if stored:
+            return stored
         try:
             # First, scan for all pages and their relationships
-            args = [
-                'node',
+            args = node_command(
                 'get_page_ids.js',
                 self.notion_token,
-                self.notion_page_ids.split(',')[0].strip().replace('-', ''),  # Use first as parent
+                root_id,
                 'true'  # Always recursive for structure
-            ]
+            )
             
             print("🔍 Analyzing page structure...")
-            result = subprocess.run(
-                args,
-                capture_output=True,
-                text=True,
-                check=False
-            )
+            with span('get_page_ids.js', 'process'):
+                result = subprocess.run(
+                    args,
+                    capture_output=True,
+                    text=True,
+                    check=False
+                )
             
             if result.returncode != 0:
                 print(f"❌ Failed to get page structure")
@@ -113,23 +155,23 @@ class HierarchicalNotionExporter:
             page_dir.mkdir(parents=True, exist_ok=True)
             
             # Export the page content using Node.js
-            args = [
-                'node',
+            args = node_command(
                 'notion_export.js',
                 self.notion_token,
                 page_id.replace('-', ''),
                 str(page_dir),
                 str(self.separate_child_pages).lower()
-            ]
+            )
             
             print(f"{'  ' * level}📄 Exporting: {page_title}")
             
-            result = subprocess.run(
-                args,
-                capture_output=True,
-                text=True,
-                check=False
-            )
+            with span('notion_export.js', 'process', id=page_id):
+                result = subprocess.run(
+                    args,
+                    capture_output=True,
+                    text=True,
+                    check=False
+                )
             
             export_result = {
                 'id': page_id,
@@ -252,8 +294,17 @@ class HierarchicalNotionExporter:
         # Export pages hierarchically
         print("📥 Exporting ALL pages with structure...\n")
         
-        # Export ALL pages from the scan results
+        # Export ALL pages from the scan results (or the selected part of them)
         all_pages = structure_data.get('pages', [])
+        try:
+            selected = {page['id'].replace('-', '') for page in self.selection.apply(all_pages)}
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return False
+        if self.selection:
+            print(f"🎯 Selection ({self.selection.describe()}): {len(selected)} of {len(all_pages)} page(s)\n")
+        search_index = SearchIndex(self.output_dir)
+        manifest = ExportManifest(self.output_dir, 'export_notion_hierarchical.py')
         export_results = {
             'success': True,
             'pages': []
@@ -268,6 +319,7 @@ class HierarchicalNotionExporter:
             pages_by_parent[parent_id].append(page)
         
         # Create directories based on page titles
+        page_paths = {}
         for page in all_pages:
             page_id = page['id']
             page_title = page.get('title', 'Untitled')
@@ -300,54 +352,83 @@ class HierarchicalNotionExporter:
                     page_path = Path(self.output_dir) / safe_title
             
             # Create directory
-            page_path.mkdir(parents=True, exist_ok=True)
-            
-            # Export the page content
-            print(f"{'  ' * level}📄 Exporting: {page_title}")
-            
-            # Use notion_export.js to export the actual content
-            args = [
-                'node',
-                'notion_export.js',
-                self.notion_token,
-                page_id.replace('-', ''),
-                str(page_path),
-                'true'
-            ]
+            if page_id.replace('-', '') in selected:
+                page_path.mkdir(parents=True, exist_ok=True)
+            page_paths[page_id.replace('-', '')] = page_path
+        
+        # One plan for the whole tree: every page is fetched once, and parents reuse
+        # their children's rendered files instead of fetching the subtrees again
+        if self.resume:
+            plan = resume_plan(self.output_dir, 'export_notion_hierarchical.py')
+            if not plan:
+                print("✅ Nothing to resume: the last export finished")
+                search_index.close()
+                return True
+        else:
+            plan = build_plan([page_id for page_id in page_paths if page_id in selected], all_pages, self.output_dir,
+                              output_dir_for=lambda page_id: str(page_paths[page_id]),
+                              separate_child_pages=True)
+            # Recently edited pages (and priority databases) first
+            schedule_plan(plan, all_pages, self.priority)
+            print_plan(plan)
+        print()
+        result = run_scheduled_plan(plan, self.notion_token, self.output_dir,
+                                    'export_notion_hierarchical.py', self.deadline)
+        manifest.api = result.get('api')
+        if not result.get('pages') and result.get('error'):
+            print(f"❌ Export failed: {result['error']}")
+        
+        pages_by_id = {page['id'].replace('-', ''): page for page in all_pages}
+        for exported in result.get('pages', []):
+            page_id = exported.get('pageId')
+            page = pages_by_id.get(page_id, {})
+            page_title = page.get('title', exported.get('pageName', page_id))
+            page_path = page_paths.get(page_id, Path(self.output_dir))
+            page_seconds = exported.get('seconds', 0)
             
-            try:
-                result = subprocess.run(
-                    args,
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                if result.returncode == 0:
-                    export_results['pages'].append({
-                        'id': page_id,
-                        'title': page_title,
-                        'path': str(page_path),
-                        'success': True
-                    })
-                else:
-                    export_results['pages'].append({
-                        'id': page_id,
-                        'title': page_title,
-                        'path': str(page_path),
-                        'success': False,
-                        'error': result.stderr or result.stdout
-                    })
-            except Exception as e:
+            if exported.get('success'):
+                export_results['pages'].append({
+                    'id': page_id,
+                    'title': page_title,
+                    'path': str(page_path),
+                    'success': True
+                })
+                search_index.index_export_result(exported, page.get('databaseTitle', ''))
+                manifest.record_page(page_id, page_title, [f['path'] for f in exported.get('files', [])], page_seconds,
+                                     blocks=exported.get('blocks'), requests=exported.get('requests'))
+            else:
                 export_results['pages'].append({
                     'id': page_id,
                     'title': page_title,
                     'path': str(page_path),
                     'success': False,
-                    'error': str(e)
+                    'error': exported.get('error', 'Unknown error')
                 })
+                manifest.record_page(page_id, page_title, [], page_seconds,
+                                     folder=manifest.folder_for(str(page_path / 'README.md')),
+                                     error=exported.get('error', 'Unknown error'))
+        
+        search_index.close()
+        manifest.save()
+        
+        # Links between exported pages become relative links (offline, from the page index)
+        update_page_index(self.output_dir, result.get('pages', []))
+        print_link_stats(rewrite_links(self.output_dir))
         
-        if export_results:
+        # Fetch images/files before their signed URLs expire
+        if self.download_attachments:
+            stats = localize_last_run(self.output_dir, self.attachment_workers)
+            if stats:
+                print_stats(stats)
+        
+        if export_results and self.selection:
+            # The tree as a whole didn't change: structure.json and INDEX.md stay as they are
+            print("\n" + "=" * 50)
+            print(f"✅ Exported the selection ({self.selection.describe()})")
+            print(f"📁 Files saved to: {self.output_dir}/")
+            print("=" * 50)
+            return True
+        elif export_results:
             # Save metadata
             self.save_structure_metadata(structure_data)
             
@@ -366,9 +447,26 @@ class HierarchicalNotionExporter:
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description='Export Notion pages to Markdown, keeping the page hierarchy')
+    add_arguments(parser)
+    add_selection_arguments(parser)
+    parser.add_argument('--rescan', action='store_true',
+                        help='Scan the page tree again instead of using the stored scan')
+    args = parser.parse_args()
+    try:
+        deadline = parse_duration(args.deadline)
+        selection = PageSelection.from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+    
     exporter = HierarchicalNotionExporter()
+    exporter.deadline = deadline
+    exporter.resume = args.resume
+    exporter.priority = priority_list(args.priority)
+    exporter.selection = selection
+    exporter.rescan = args.rescan
     success = exporter.export()
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    profiled_main('export_notion_hierarchical', main)
\ No newline at end of file
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Pipelined scan -> export
+The scan and the export overlap instead of running one after the other.
+get_page_ids.js --stream writes each batch of pages as soon as it is scanned
+(a page once its subtree has been walked, or the rows of a database), and an
+exporter reading its stdin exports them while the scan goes on. Batches pass
+through a bounded queue: when the exporter falls behind the queue fills up,
+the scanner's output stops draining and its walk pauses until there is room
+again, so the scan waits for the export instead of running away from it.
+
+    python export_pipeline.py              # Scan + run.sh's export (export_all.js --stream)
+    python export_notion.py --pipeline     # Scan + the plan exporter (notion_export.js)
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import subprocess
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from get_page_ids import NotionPageScanner
+from export_plan import build_plan, clean_id
+from export_schedule import deadline_at, record_remainder
+from profiling import node_command, profiled_main
+from tracing import span
+
+# Scan batches that may wait for the exporter before the scanner is held back
+PIPELINE_QUEUE = int(os.getenv('PIPELINE_QUEUE', '32'))
+# Pipe capacity on either side of the queue (the 64 KB default would hold hundreds of batches)
+PIPE_SIZE = 4096
+
+def shrink_pipe(stream) -> None:
+    """Make a pipe hold PIPE_SIZE bytes, so the queue is what bounds the batches in flight (Linux only)"""
+    if fcntl is None or not hasattr(fcntl, 'F_SETPIPE_SZ'):
+        return
+    try:
+        fcntl.fcntl(stream.fileno(), fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+    except OSError:
+        pass
+
+class ExportPipeline:
+    """The scanner's batches, through a bounded queue, into an exporter's stdin
+
+    lines(batch) turns one scan batch into the lines the exporter reads.
+    """
+
+    def __init__(self, scan_args: List[str], export_args: List[str],
+                 lines: Callable[[List[Dict]], Iterable[str]], header: Optional[str] = None,
+                 capture_export: bool = False, queue_size: int = PIPELINE_QUEUE):
+        self.scan_args = scan_args
+        self.export_args = export_args
+        self.lines = lines
+        self.header = header
+        self.capture_export = capture_export
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.scan: Optional[Dict] = None
+        self.export_output = ''
+        self.export_returncode: Optional[int] = None
+        self.stats = {'batches': 0, 'pages': 0, 'peak': 0, 'queue_size': self.queue.maxsize,
+                      'scan_waited': 0.0, 'export_waited': 0.0}
+
+    def run(self) -> Dict:
+        """Run scanner and exporter to the end; returns the scan result"""
+        scanner = subprocess.Popen(self.scan_args, stdout=subprocess.PIPE, text=True)
+        exporter = subprocess.Popen(self.export_args, stdin=subprocess.PIPE, text=True,
+                                    stdout=subprocess.PIPE if self.capture_export else None)
+        shrink_pipe(scanner.stdout)
+        shrink_pipe(exporter.stdin)
+        reader = threading.Thread(target=self._read_scan, args=(scanner,), name='scan reader', daemon=True)
+        reader.start()
+        output: List[str] = []
+        collector = None
+        if self.capture_export:
+            collector = threading.Thread(target=lambda: output.append(exporter.stdout.read()),
+                                         name='export output', daemon=True)
+            collector.start()
+
+        self._feed(exporter)
+        reader.join()
+        scanner.wait()
+        exporter.wait()
+        if collector:
+            collector.join()
+        self.export_output = ''.join(output)
+        self.export_returncode = exporter.returncode
+        if scanner.returncode != 0 or not self.scan:
+            return {'success': False, 'error': f'get_page_ids.js exited with {scanner.returncode}'}
+        return self.scan
+
+    def _read_scan(self, scanner: subprocess.Popen) -> None:
+        """Scanner stdout -> queue; a full queue stops the reading, which blocks the scanner"""
+        try:
+            for line in scanner.stdout:
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if 'batch' not in message:
+                    self.scan = message  # The final scan result
+                    continue
+                self.stats['batches'] += 1
+                self.stats['pages'] += len(message['batch'])
+                try:
+                    self.queue.put_nowait(message['batch'])
+                except queue.Full:
+                    start = time.monotonic()
+                    with span('export queue full', 'throttle'):
+                        self.queue.put(message['batch'])
+                    self.stats['scan_waited'] += time.monotonic() - start
+                self.stats['peak'] = max(self.stats['peak'], self.queue.qsize())
+        finally:
+            self.queue.put(None)
+
+    def _feed(self, exporter: subprocess.Popen) -> None:
+        """Queue -> exporter stdin until the scan ends (an exporter that died still gets the queue drained)"""
+        alive = True
+        try:
+            if self.header:
+                exporter.stdin.write(self.header + '\n')
+                exporter.stdin.flush()
+        except BrokenPipeError:
+            alive = False
+        while True:
+            start = time.monotonic()
+            batch = self.queue.get()
+            self.stats['export_waited'] += time.monotonic() - start
+            if batch is None:
+                break
+            if not alive:
+                continue
+            try:
+                exporter.stdin.write(''.join(line + '\n' for line in self.lines(batch)))
+                exporter.stdin.flush()
+            except BrokenPipeError:
+                alive = False
+        try:
+            exporter.stdin.close()
+        except BrokenPipeError:
+            pass
+
+def print_stats(stats: Dict) -> None:
+    print(f"\n🔀 Pipeline: {stats['pages']} page(s) in {stats['batches']} batch(es); the scan waited "
+          f"{stats['scan_waited']:.1f}s on a full export queue (peak {stats['peak']}/{stats['queue_size']}), "
+          f"the export {stats['export_waited']:.1f}s on the scan")
+
+def stream_scanner() -> NotionPageScanner:
+    """The scanner as get_page_ids.py configures it, minus AUTO_EXPORT (the pipeline is the export)"""
+    scanner = NotionPageScanner()
+    scanner.auto_export = False
+    return scanner
+
+def run_pipelined_plan(token: str, output_dir: str, exporter: str, separate_child_pages: bool = True,
+                       deadline: Optional[float] = None) -> Tuple[Dict, Dict]:
+    """Scan while notion_export.js runs the plan nodes the scan streams to it
+
+    Returns (scan result, export result). The scan is saved like get_page_ids.py
+    saves it; the plan of the whole scan is only built afterwards, to record what
+    a deadline left over for --resume.
+    """
+    scanner = stream_scanner()
+    header = {'version': 1, 'separate_child_pages': separate_child_pages,
+              'order': [], 'nodes': {}, 'deadline': deadline_at(deadline)}
+
+    def nodes(batch: List[Dict]) -> Iterable[str]:
+        for page in batch:
+            yield json.dumps({'id': clean_id(page['id']), 'title': page.get('title'), 'output_dir': output_dir})
+
+    pipeline = ExportPipeline(
+        scanner.scan_command() + ['--stream'],
+        node_command('notion_export.js', token, '-', output_dir, str(separate_child_pages).lower(), '--plan', '-'),
+        nodes, header=json.dumps(header), capture_export=True)
+    with span('scan + notion_export.js', 'process'):
+        scan = pipeline.run()
+    print_stats(pipeline.stats)
+    try:
+        result = json.loads(pipeline.export_output)
+    except json.JSONDecodeError:
+        result = {'success': False, 'error': f'notion_export.js exited with {pipeline.export_returncode}', 'pages': []}
+
+    scanner.display_results(scan)
+    if scan.get('success'):
+        plan = build_plan(scan.get('pageIds', []), scan.get('pages', []), output_dir,
+                          separate_child_pages=separate_child_pages)
+        record_remainder(plan, result, output_dir, exporter)
+    return scan, result
+
+def main():
+    """Scan and run.sh's custom-formatted export at the same time"""
+    print("=" * 50)
+    print("🔀 Pipelined Scan + Export")
+    print("=" * 50)
+    print()
+
+    scanner = stream_scanner()
+    if not scanner.validate_config():
+        return 1
+    print(f"   - Export queue: {PIPELINE_QUEUE} batch(es)\n")
+
+    pipeline = ExportPipeline(
+        scanner.scan_command() + ['--stream'],
+        node_command('export_all.js', '--stream'),
+        lambda batch: [json.dumps({'batch': batch}, ensure_ascii=False)])
+    with span('scan + export_all.js', 'process'):
+        scan = pipeline.run()
+    print_stats(pipeline.stats)
+    scanner.display_results(scan)
+    return 0 if scan.get('success') and pipeline.export_returncode == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(profiled_main('export_pipeline', main))
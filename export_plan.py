@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Export planner
+Turns the scanned page tree into a DAG of export jobs so every page is fetched
+exactly once: children are rendered before the parents that embed them, and
+notion_export.js reuses a child's rendered file wherever it is needed instead
+of fetching the subtree again for every ancestor
+"""
+
+import os
+import json
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from page_graph import PageGraph
+from profiling import node_command
+from tracing import span
+
+PLAN_FILENAME = '.export_plan.json'
+STRUCTURE_FILENAME = 'structure.json'
+
+def clean_id(page_id: str) -> str:
+    return (page_id or '').replace('-', '')
+
+def load_structure(output_dir: str) -> List[Dict]:
+    """Pages from the last scan (get_page_ids.py), or [] if there is none"""
+    graph = PageGraph(output_dir)
+    if graph.exists():
+        return list(graph.pages())
+    structure_file = Path(output_dir) / STRUCTURE_FILENAME
+    try:
+        with open(structure_file) as f:
+            return json.load(f).get('pages', [])
+    except (OSError, json.JSONDecodeError):
+        return []
+
+def tree_parent(page: Dict) -> Optional[str]:
+    """The page whose blocks contain this one (database rows hang off the database's page)"""
+    if page.get('fromDatabase'):
+        # Rows are exported on their own; a child_database block doesn't pull them in
+        return None
+    return clean_id(page.get('parent')) or None
+
+def build_plan(job_ids: List[str], pages: List[Dict], output_dir: str,
+               output_dir_for: Optional[Callable[[str], str]] = None,
+               separate_child_pages: bool = True) -> Dict:
+    """Build the export DAG for job_ids from the scanned pages
+
+    Each node lists the jobs embedded in it (children) and the jobs it is
+    embedded in (feeds); order is a post-order walk, children first.
+    """
+    info = {clean_id(p['id']): p for p in pages}
+    jobs = list(dict.fromkeys(clean_id(j) for j in job_ids if clean_id(j)))
+    job_set = set(jobs)
+
+    def job_ancestors(page_id: str) -> List[str]:
+        """Jobs above page_id in the tree, nearest first"""
+        found = []
+        seen = {page_id}
+        parent = tree_parent(info[page_id]) if page_id in info else None
+        while parent and parent not in seen:
+            seen.add(parent)
+            if parent in job_set:
+                found.append(parent)
+            parent = tree_parent(info[parent]) if parent in info else None
+        return found
+
+    nodes: Dict[str, Dict] = {}
+    for job in jobs:
+        nodes[job] = {
+            'id': job,
+            'title': info.get(job, {}).get('title'),
+            'output_dir': output_dir_for(job) if output_dir_for else output_dir,
+            'children': [],
+            'feeds': job_ancestors(job),
+        }
+    for job in jobs:
+        if nodes[job]['feeds']:
+            nodes[nodes[job]['feeds'][0]]['children'].append(job)
+
+    order: List[str] = []
+    visited = set()
+
+    def visit(job: str) -> None:
+        if job in visited:
+            return
+        visited.add(job)
+        for child in nodes[job]['children']:
+            visit(child)
+        order.append(job)
+
+    for job in jobs:
+        if not nodes[job]['feeds']:
+            visit(job)
+    for job in jobs:  # Anything left over sits in a cycle of stale data; run it anyway
+        visit(job)
+
+    # Without a plan every job fetched its whole subtree (child pages are rendered into it)
+    descendants: Dict[str, int] = {}
+    for page_id in info:
+        seen = {page_id}
+        parent = tree_parent(info[page_id])
+        while parent and parent not in seen:
+            seen.add(parent)
+            descendants[parent] = descendants.get(parent, 0) + 1
+            parent = tree_parent(info[parent]) if parent in info else None
+
+    return {
+        'version': 1,
+        'separate_child_pages': separate_child_pages,
+        'order': order,
+        'nodes': nodes,
+        'stats': {
+            'pages': len(jobs),
+            'embedded': sum(1 for n in nodes.values() if n['feeds']),
+            'fetches': len(jobs),
+            'fetches_without_plan': sum(1 + descendants.get(j, 0) for j in jobs),
+        },
+    }
+
+def save_plan(plan: Dict, output_dir: str) -> Path:
+    """Write the plan atomically next to the export"""
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    plan_file = Path(output_dir) / PLAN_FILENAME
+    tmp_file = plan_file.with_suffix('.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(plan, f, indent=1)
+    os.replace(tmp_file, plan_file)
+    return plan_file
+
+def print_plan(plan: Dict) -> None:
+    stats = plan['stats']
+    print(f"📐 Export plan: {stats['pages']} page(s), {stats['embedded']} embedded in a parent; "
+          f"{stats['fetches']} page fetches (page-by-page export: {stats['fetches_without_plan']})")
+
+def run_plan(plan: Dict, token: str, output_dir: str) -> Dict:
+    """Run the plan in one notion_export.js process; returns its JSON result
+
+    Progress goes straight to the terminal (stderr); stdout carries the result.
+    """
+    plan_file = save_plan(plan, output_dir)
+    args = node_command(
+        'notion_export.js',
+        token,
+        '-',
+        output_dir,
+        str(plan['separate_child_pages']).lower(),
+        '--plan',
+        str(plan_file),
+    )
+    with span('notion_export.js', 'process', pages=len(plan['order'])):
+        result = subprocess.run(args, stdout=subprocess.PIPE, text=True, check=False)
+    try:
+        return json.loads(result.stdout)
+    except json.JSONDecodeError:
+        return {'success': False, 'error': f'notion_export.js exited with {result.returncode}', 'pages': []}
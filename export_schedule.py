@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Export scheduling
+Orders export jobs so the most valuable pages go first: pages from the
+databases listed in EXPORT_PRIORITY, then everything else, each newest edit
+first. With a deadline (--deadline 5m / EXPORT_DEADLINE) an exporter stops
+starting new pages once the time is up and leaves the rest in
+output/.export_remainder.json; `--resume` exports just that remainder.
+
+    python export_schedule.py            # Show the pending remainder, if any
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from export_plan import run_plan
+
+REMAINDER_FILENAME = '.export_remainder.json'
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+def parse_duration(text: Optional[str]) -> Optional[float]:
+    """'90s', '5m', '1.5h' or plain seconds -> seconds (None/'' -> None)"""
+    if not text:
+        return None
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*', str(text).lower())
+    if not match:
+        raise ValueError(f"Invalid duration: {text!r} (use e.g. 90s, 5m, 1h)")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+
+def priority_list(text: Optional[str]) -> List[str]:
+    """EXPORT_PRIORITY / --priority: database titles or ids, most important first"""
+    return [p.strip() for p in (text or '').split(',') if p.strip()]
+
+def database_rank(page: Dict, priority: List[str]) -> int:
+    """Position of the page's database in the priority list (len(priority) if not listed)"""
+    keys = {(page.get('databaseTitle') or '').lower(), (page.get('dataSourceId') or '').replace('-', '')}
+    for rank, entry in enumerate(priority):
+        if entry.lower() in keys or entry.replace('-', '') in keys:
+            return rank
+    return len(priority)
+
+def schedule(ids: List[str], pages: Dict[str, Dict], priority: List[str]) -> List[str]:
+    """ids by database priority, then most recently edited first (unknown edit times last)"""
+    newest_first = sorted(ids, key=lambda i: pages.get(i, {}).get('lastEdited') or '', reverse=True)
+    return sorted(newest_first, key=lambda i: database_rank(pages.get(i, {}), priority))
+
+def schedule_plan(plan: Dict, pages: List[Dict], priority: List[str]) -> Dict:
+    """Reorder an export plan's nodes by priority and recency
+
+    notion_export.js renders a child page on the spot when its parent gets
+    there first, so any order produces the same files.
+    """
+    info = {(p.get('id') or '').replace('-', ''): p for p in pages}
+    plan['order'] = schedule(plan['order'], info, priority)
+    return plan
+
+def deadline_at(seconds: Optional[float]) -> Optional[float]:
+    """Wall-clock time (epoch ms, as notion_export.js expects) at which to stop starting pages"""
+    return (time.time() + seconds) * 1000 if seconds else None
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--deadline', default=os.getenv('EXPORT_DEADLINE'),
+                        help='Stop starting new pages after this long (e.g. 5m) and save the rest for --resume')
+    parser.add_argument('--resume', action='store_true',
+                        help=f'Export only the pages a previous deadline left in {REMAINDER_FILENAME}')
+    parser.add_argument('--priority', default=os.getenv('EXPORT_PRIORITY'),
+                        help='Databases to export first (comma-separated titles or ids)')
+
+# ---------------------------------------------------------------------------
+# Remainder of a run cut short by its deadline
+# ---------------------------------------------------------------------------
+
+def remainder_path(output_dir: str) -> Path:
+    return Path(output_dir) / REMAINDER_FILENAME
+
+def load_remainder(output_dir: str, exporter: Optional[str] = None) -> Optional[Dict]:
+    """The saved remainder (only if it was left by `exporter`, when given)"""
+    try:
+        with open(remainder_path(output_dir)) as f:
+            remainder = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if exporter and remainder.get('exporter') != exporter:
+        return None
+    return remainder
+
+def save_remainder(output_dir: str, exporter: str, pages: int, **payload) -> Path:
+    """Write the remainder atomically; payload is whatever the exporter needs to resume"""
+    path = remainder_path(output_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    remainder = {
+        'exporter': exporter,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'pages': pages,
+        **payload,
+    }
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(remainder, f, indent=1)
+    os.replace(tmp_path, path)
+    return path
+
+def clear_remainder(output_dir: str) -> None:
+    remainder_path(output_dir).unlink(missing_ok=True)
+
+def remainder_plan(plan: Dict, result: Dict) -> Optional[Dict]:
+    """The part of a plan a deadline left over, or None if it all ran
+
+    Nodes that did run keep their output (`rendered`), so a remaining parent
+    reuses those files instead of fetching the children again.
+    """
+    remaining = result.get('remaining') or []
+    if not remaining:
+        return None
+    done = {p['pageId']: p for p in result.get('pages', []) if p.get('success')}
+    for node_id, node in plan['nodes'].items():
+        if node_id in done:
+            files = done[node_id].get('files', [])
+            node['rendered'] = {'path': files[0]['path'], 'files': files} if files else None
+    plan['order'] = remaining
+    plan.pop('deadline', None)
+    return plan
+
+def resume_plan(output_dir: str, exporter: str) -> Optional[Dict]:
+    """The plan remainder `exporter` left behind, or None"""
+    remainder = load_remainder(output_dir, exporter)
+    return remainder.get('plan') if remainder else None
+
+def run_scheduled_plan(plan: Dict, token: str, output_dir: str, exporter: str,
+                       deadline: Optional[float] = None) -> Dict:
+    """run_plan with an optional deadline (seconds); saves or clears the remainder"""
+    plan['deadline'] = deadline_at(deadline)
+    result = run_plan(plan, token, output_dir)
+    record_remainder(plan, result, output_dir, exporter)
+    return result
+
+def record_remainder(plan: Dict, result: Dict, output_dir: str, exporter: str) -> None:
+    """Save the part of the plan the run's deadline left over, or clear an old remainder"""
+    left = remainder_plan(plan, result)
+    if left:
+        save_remainder(output_dir, exporter, len(left['order']), plan=left)
+        print(f"\n⏱️  Deadline reached: {len(left['order'])} page(s) left for later, saved to "
+              f"{remainder_path(output_dir)}")
+        print(f"   Run {exporter} --resume to finish them")
+    elif result.get('pages') and load_remainder(output_dir, exporter):
+        clear_remainder(output_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the pages a deadline-limited export left over')
+    parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    args = parser.parse_args()
+
+    remainder = load_remainder(args.output)
+    if not remainder:
+        print("✅ Nothing left over: the last export finished")
+        return 0
+    print(f"⏱️  {remainder['pages']} page(s) left by {remainder['exporter']} on {remainder['created_at']}")
+    runner = 'node' if remainder['exporter'].endswith('.js') else 'python'
+    print(f"   Resume with: {runner} {remainder['exporter']} --resume")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
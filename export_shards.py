@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Sharded export
+Splits the scanned page graph into shards (whole databases and top-level
+subtrees, see PageSelection.shard in page_graph.py) and exports each shard
+with export_all.js in its own process, into its own output directory with its
+own manifest. The merge then puts the shards together into one output: files,
+manifest, page locations and index, database snapshots, search feed, property
+cache and remainder, plus an INDEX.md of the page tree. The result does not
+depend on which shard finished first.
+
+Every process is bound by its token's rate limit, which the processes on one
+machine share (API_RATE); give each shard its own integration token with
+NOTION_SHARD_TOKENS to multiply it.
+
+    python export_shards.py run --shards 4        # Local process pool, then merge into output/
+    node export_all.js --shards 4 --shard-index 2 # One shard, e.g. on another machine
+    python export_shards.py merge shard0/ shard1/ shard2/ shard3/
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Dict, List
+from urllib.parse import quote
+
+from export_manifest import load_manifest, merge_manifests, write_manifest
+from export_schedule import REMAINDER_FILENAME
+from link_rewrite import PAGE_INDEX_FILENAME
+from page_graph import (GRAPH_FILENAME, PageGraph, PageSelection, add_selection_arguments,
+                        clean_id, split_list)
+from profiling import node_command, profiled_main
+from search_index import FEED_FILENAME
+from tracing import span
+
+SHARDS_DIRNAME = '.shards'
+INDEX_FILENAME = 'INDEX.md'
+LOCATIONS_FILENAME = '.page_locations.json'
+WATCH_STATE_FILENAME = '.watch_state.json'
+PROPERTY_CACHE_FILENAME = '.property_cache.json'
+SNAPSHOTS_DIRNAME = '_databases'
+SNAPSHOT_INDEX_FILENAME = 'index.json'
+# The exporter whose shards are merged (the only one with --shards)
+EXPORTER = 'export_all.js'
+
+def read_json(path: Path, default=None):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+def write_json(path: Path, data, **options) -> None:
+    """Atomically, like the exporters do"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, ensure_ascii=False, **options)
+    os.replace(tmp_path, path)
+
+# ---------------------------------------------------------------------------
+# Merge
+# ---------------------------------------------------------------------------
+
+def merge_files(output_dir: Path, shard_dirs: List[Path], move: bool) -> Dict:
+    """Exported files of every shard into output_dir (a later shard wins a clash)"""
+    stats = {'files': 0, 'conflicts': []}
+    seen = set()
+    for shard_dir in shard_dirs:
+        for source in sorted(shard_dir.rglob('*')):
+            rel = source.relative_to(shard_dir)
+            # Run state is merged below; the snapshot index too
+            if source.is_dir() or any(part.startswith('.') for part in rel.parts):
+                continue
+            if rel == Path(SNAPSHOTS_DIRNAME) / SNAPSHOT_INDEX_FILENAME:
+                continue
+            if rel in seen:
+                stats['conflicts'].append(rel.as_posix())
+            seen.add(rel)
+            target = output_dir / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if move:
+                os.replace(source, target)
+            else:
+                shutil.copy2(source, target)
+            stats['files'] += 1
+    return stats
+
+def merge_state(output_dir: Path, shard_dirs: List[Path]) -> Dict:
+    """Run state of the shards: what a single export_all.js run would have left behind"""
+    # Page locations: the shards together are one full export
+    locations = {'databases': {}, 'pages': {}}
+    for shard_dir in shard_dirs:
+        shard = read_json(shard_dir / LOCATIONS_FILENAME, {})
+        locations['databases'].update(shard.get('databases', {}))
+        locations['pages'].update(shard.get('pages', {}))
+    if locations['pages']:
+        write_json(output_dir / LOCATIONS_FILENAME, locations, indent=1)
+        # Watch from the newest exported edit, as after a full export
+        newest = max((p.get('lastEdited') or '' for p in locations['pages'].values()), default='')
+        write_json(output_dir / WATCH_STATE_FILENAME, {
+            'cursor': newest or None,
+            'last_poll': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'changed': 0,
+        }, indent=1)
+
+    # Indexes and caches keyed by page or database are merged into what is there
+    page_index = read_json(output_dir / PAGE_INDEX_FILENAME, {})
+    snapshots = read_json(output_dir / SNAPSHOTS_DIRNAME / SNAPSHOT_INDEX_FILENAME, {'databases': {}})
+    property_cache = read_json(output_dir / PROPERTY_CACHE_FILENAME, {'pages': {}})
+    for shard_dir in shard_dirs:
+        page_index.update(read_json(shard_dir / PAGE_INDEX_FILENAME, {}))
+        snapshots['databases'].update(
+            read_json(shard_dir / SNAPSHOTS_DIRNAME / SNAPSHOT_INDEX_FILENAME, {}).get('databases', {}))
+        property_cache['pages'].update(read_json(shard_dir / PROPERTY_CACHE_FILENAME, {}).get('pages', {}))
+    if page_index:
+        write_json(output_dir / PAGE_INDEX_FILENAME, page_index, indent=1, sort_keys=True)
+    if snapshots['databases']:
+        write_json(output_dir / SNAPSHOTS_DIRNAME / SNAPSHOT_INDEX_FILENAME, snapshots, indent=1)
+    if property_cache['pages']:
+        write_json(output_dir / PROPERTY_CACHE_FILENAME, property_cache)
+
+    # Search feed: appended for search_index.py ingest, shard by shard
+    feed_lines = 0
+    with open(output_dir / FEED_FILENAME, 'a', encoding='utf-8') as feed:
+        for shard_dir in shard_dirs:
+            try:
+                with open(shard_dir / FEED_FILENAME, encoding='utf-8') as f:
+                    for line in f:
+                        feed.write(line)
+                        feed_lines += 1
+            except OSError:
+                pass
+
+    # Remainder: every shard's pages left by a deadline, for one --resume
+    jobs, titles, created = [], {}, []
+    for shard_dir in shard_dirs:
+        remainder = read_json(shard_dir / REMAINDER_FILENAME)
+        if remainder and remainder.get('exporter') == EXPORTER:
+            jobs += remainder.get('jobs', [])
+            titles.update(remainder.get('titles', {}))
+            created.append(remainder.get('created_at', ''))
+    previous = read_json(output_dir / REMAINDER_FILENAME)
+    if jobs:
+        write_json(output_dir / REMAINDER_FILENAME, {
+            'exporter': EXPORTER, 'created_at': max(created), 'pages': len(jobs), 'jobs': jobs, 'titles': titles})
+    elif previous and previous.get('exporter') == EXPORTER:
+        (output_dir / REMAINDER_FILENAME).unlink(missing_ok=True)
+
+    return {'pages': len(locations['pages']), 'feed': feed_lines, 'remainder': len(jobs)}
+
+def write_index(output_dir: Path, pages: List[Dict], page_index: Dict) -> Path:
+    """INDEX.md: the scanned page tree in scan order, each exported page linked to its file"""
+    ids = {clean_id(page['id']) for page in pages}
+    children: Dict[str, List] = {}
+    roots: List = []
+    databases: Dict[str, Dict] = {}
+    for page in pages:
+        if page.get('fromDatabase'):
+            key = clean_id(page.get('dataSourceId') or page.get('parent'))
+            if key not in databases:
+                databases[key] = {'title': page.get('databaseTitle') or 'Untitled Database', 'rows': []}
+                holder = clean_id(page.get('databaseParent'))
+                (children.setdefault(holder, []) if holder in ids else roots).append(('database', key))
+            databases[key]['rows'].append(page)
+        else:
+            parent = clean_id(page.get('parent'))
+            (children.setdefault(parent, []) if parent in ids else roots).append(('page', page))
+
+    exported = 0
+    lines = []
+
+    def page_line(page: Dict, depth: int) -> None:
+        nonlocal exported
+        title = (page.get('title') or 'Untitled').replace('[', '\\[').replace(']', '\\]')
+        icon = '📊' if page.get('fromDatabase') else '📄'
+        entry = page_index.get(clean_id(page['id']))
+        if entry:
+            exported += 1
+            lines.append(f"{'  ' * depth}- ✅ {icon} [{title}]({quote(entry['path'])})")
+        else:
+            lines.append(f"{'  ' * depth}- ❌ {icon} {title}")
+
+    def write_node(node, depth: int) -> None:
+        kind, value = node
+        if kind == 'database':
+            database = databases[value]
+            lines.append(f"{'  ' * depth}- 📊 **{database['title']}** ({len(database['rows'])} rows)")
+            for row in database['rows']:
+                page_line(row, depth + 1)
+            return
+        page_line(value, depth)
+        for child in children.get(clean_id(value['id']), []):
+            write_node(child, depth + 1)
+
+    for node in roots:
+        write_node(node, 0)
+
+    index_file = output_dir / INDEX_FILENAME
+    with open(index_file, 'w', encoding='utf-8') as f:
+        f.write("# Notion Export Structure\n\n")
+        f.write(f"This is the structure of your Notion export ({exported} of {len(pages)} pages exported).\n\n")
+        f.write("## Legend\n")
+        f.write("- 📄 Regular Page\n")
+        f.write("- 📊 Database Page\n")
+        f.write("- ✅ Successfully Exported\n")
+        f.write("- ❌ Not Exported\n\n")
+        f.write("## Structure\n\n")
+        f.write('\n'.join(lines) + '\n')
+    return index_file
+
+def merge(output_dir: str, shard_dirs: List[str], move: bool = False) -> Dict:
+    """Merge shard outputs (in the order given) into output_dir"""
+    target = Path(output_dir)
+    shards = [Path(d) for d in shard_dirs]
+    target.mkdir(parents=True, exist_ok=True)
+
+    # The graph the shards were cut from, for the index
+    if not (target / GRAPH_FILENAME).exists():
+        for shard_dir in shards:
+            if (shard_dir / GRAPH_FILENAME).exists():
+                shutil.copy2(shard_dir / GRAPH_FILENAME, target / GRAPH_FILENAME)
+                break
+
+    manifests = [(str(d), m) for d in shards for m in [load_manifest(str(d))] if m]
+    stats = merge_files(target, shards, move)
+    stats.update(merge_state(target, shards))
+    if manifests:
+        manifest = merge_manifests(str(target), manifests)
+        write_manifest(str(target), manifest)
+        stats['failed'] = manifest['totals']['failed']
+    graph = PageGraph(str(target))
+    if graph.exists():
+        stats['index'] = str(write_index(target, list(graph.pages()),
+                                         read_json(target / PAGE_INDEX_FILENAME, {})))
+    return stats
+
+def print_merge(stats: Dict, shards: int) -> None:
+    failed = f", {stats['failed']} failed" if stats.get('failed') else ''
+    print(f"🧩 Merged {shards} shard(s): {stats['pages']} pages, {stats['files']} files{failed}")
+    for rel in stats['conflicts']:
+        print(f"   ⚠️  {rel} came from more than one shard (kept the last)")
+    if stats['remainder']:
+        print(f"   ⏱️  {stats['remainder']} page(s) left by deadlines; finish them with node export_all.js --resume")
+    if stats.get('index'):
+        print(f"   📑 Index: {stats['index']}")
+
+# ---------------------------------------------------------------------------
+# Local process pool
+# ---------------------------------------------------------------------------
+
+def shard_tokens() -> List[str]:
+    """NOTION_SHARD_TOKENS (comma-separated, used round-robin), else NOTION_TOKEN"""
+    return split_list(os.getenv('NOTION_SHARD_TOKENS')) or [t for t in [os.getenv('NOTION_TOKEN')] if t]
+
+def run(output_dir: str, shards: int, selection: PageSelection, keep: bool) -> int:
+    graph = PageGraph(output_dir)
+    if not graph.exists():
+        print(f"❌ No page graph in {output_dir} (run a scan first)")
+        return 1
+    try:
+        selection.apply(graph.pages())
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    tokens = shard_tokens()
+    if not tokens:
+        print("❌ Error: NOTION_TOKEN (or NOTION_SHARD_TOKENS) is required")
+        return 1
+
+    shard_root = Path(output_dir) / SHARDS_DIRNAME
+    shutil.rmtree(shard_root, ignore_errors=True)
+    print(f"🧩 Exporting in {shards} shard(s) with {len(tokens)} token(s)"
+          f"{f' ({selection.describe()})' if selection else ''}...\n")
+
+    processes = []
+    for index in range(shards):
+        shard_dir = shard_root / str(index)
+        shard_dir.mkdir(parents=True)
+        # Each shard reads the graph, and reuses completed relations, from its own directory
+        for name in (GRAPH_FILENAME, PROPERTY_CACHE_FILENAME):
+            if (Path(output_dir) / name).exists():
+                shutil.copy2(Path(output_dir) / name, shard_dir / name)
+        log_path = shard_root / f'shard-{index}.log'
+        env = {**os.environ, 'OUTPUT_DIR': str(shard_dir), 'NOTION_TOKEN': tokens[index % len(tokens)]}
+        command = node_command(EXPORTER, *selection.cli_args(), '--shards', str(shards), '--shard-index', str(index))
+        log = open(log_path, 'w')
+        process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        processes.append((index, process, log, log_path, time.monotonic()))
+
+    failed = 0
+    with span(f'{shards} shards', 'process'):
+        for index, process, log, log_path, started in processes:
+            returncode = process.wait()
+            log.close()
+            manifest = load_manifest(str(shard_root / str(index))) or {}
+            totals = manifest.get('totals', {})
+            seconds = time.monotonic() - started
+            if returncode != 0:
+                failed += 1
+                print(f"❌ Shard {index}: exited with code {returncode} after {seconds:.1f}s (see {log_path})")
+            else:
+                print(f"✅ Shard {index}: {totals.get('pages', 0)} pages ({totals.get('failed', 0)} failed), "
+                      f"{(manifest.get('api') or {}).get('requests', 0)} requests in {seconds:.1f}s")
+    print()
+
+    stats = merge(output_dir, [str(shard_root / str(index)) for index in range(shards)], move=not keep)
+    print_merge(stats, shards)
+    if not keep and not failed:
+        for index in range(shards):
+            shutil.rmtree(shard_root / str(index), ignore_errors=True)
+    return 1 if failed else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the page graph in shards and merge them')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Export all shards in local processes, then merge')
+    run_parser.add_argument('--shards', dest='shard_count', type=int, default=int(os.getenv('EXPORT_SHARDS', '4')),
+                            help='Number of shards / processes (default: EXPORT_SHARDS or 4)')
+    run_parser.add_argument('--keep', action='store_true', help=f'Keep the shard directories in {SHARDS_DIRNAME}/')
+    run_parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    add_selection_arguments(run_parser)
+
+    merge_parser = subparsers.add_parser('merge', help='Merge shard output directories exported elsewhere')
+    merge_parser.add_argument('shard_dirs', nargs='+', help='Shard output directories, in shard order')
+    merge_parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    merge_parser.add_argument('--move', action='store_true', help='Move the files instead of copying them')
+
+    args = parser.parse_args()
+    if args.command == 'merge':
+        print_merge(merge(args.output, args.shard_dirs, args.move), len(args.shard_dirs))
+        return 0
+    try:
+        selection = PageSelection.from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.shard_count < 1:
+        parser.error('--shards must be at least 1')
+    return run(args.output, args.shard_count, selection, args.keep)
+
+if __name__ == '__main__':
+    sys.exit(profiled_main('export_shards', main))
@@ -0,0 +1,521 @@
+/**
+ * Local fake Notion API
+ * Serves a synthetic workspace (nested pages, databases with rows, tables, code
+ * diagrams, callouts, toggles) over the REST endpoints the exporters use, with
+ * optional latency and rate-limit (429) injection. Point a client at it with
+ * NOTION_BASE_URL=http://127.0.0.1:<port> (see createNotionClient).
+ *
+ * Usage:
+ *   node fake_notion.js [--port 4010] [--pages 200] [--depth 3] [--databases 4]
+ *                       [--rows 25] [--blocks 40] [--relations 1] [--latency 0]
+ *                       [--jitter 0] [--rps 0] [--throttle 0] [--seed 1]
+ *
+ * Content is generated from the ids on every request, so the server holds no
+ * block tree and memory stays flat for any workspace size. GET /__stats returns
+ * request counts, POST /__reset clears them. The first stdout line is JSON with
+ * the port and the root page id. Rows relate to --relations pages; past 25 the
+ * page objects cut the relation (and its rollup) off like Notion does, and
+ * pages.properties.retrieve pages in the rest.
+ */
+
+const http = require('http');
+
+const args = process.argv.slice(2);
+const option = (name, fallback) => {
+  const i = args.indexOf(name);
+  return i >= 0 && args[i + 1] !== undefined ? Number(args[i + 1]) : fallback;
+};
+
+const BASE_TIME = Date.parse('2025-01-01T00:00:00.000Z');
+// Id kinds (first hex digit of every id)
+const KIND = { page: 1, block: 2, database: 3, dataSource: 4, nested: 5 };
+// Block layout of a page body, repeated until the page has its blocks
+const LAYOUT = [
+  'heading_2', 'paragraph', 'bulleted_list_item', 'bulleted_list_item', 'numbered_list_item',
+  'code', 'paragraph', 'callout', 'to_do', 'toggle', 'quote', 'table', 'paragraph', 'divider',
+];
+const TABLE_ROWS = 12;
+// References a relation or rollup holds in a page object (the rest: has_more)
+const PROPERTY_REFERENCES = 25;
+const LIST_CHILDREN = 3;
+
+/**
+ * Deterministic 32-bit PRNG (mulberry32)
+ */
+function random(seed) {
+  let a = seed >>> 0;
+  return () => {
+    a = (a + 0x6D2B79F5) >>> 0;
+    let t = a;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+function formatUuid(hex) {
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+function richText(content, annotations = {}) {
+  return [{
+    type: 'text',
+    text: { content, link: null },
+    annotations: { bold: false, italic: false, strikethrough: false, underline: false, code: false, color: 'default', ...annotations },
+    plain_text: content,
+    href: null,
+  }];
+}
+
+const DIAGRAM = [
+  '┌──────────┐     ┌──────────┐',
+  '│  Notion  │ ──> │ Markdown │',
+  '└──────────┘     └──────────┘',
+].join('\n');
+
+/**
+ * Synthetic workspace: page 0 is the root; pages form a tree `depth` levels
+ * deep; each database hangs off a page and holds `rows` row pages
+ *
+ * Every object is computed from its id, so nothing is stored per page.
+ */
+class SyntheticWorkspace {
+  constructor({ pages = 200, depth = 3, databases = 4, rows = 25, blocks = 40, relations = 1 } = {}) {
+    this.pageCount = Math.max(1, pages);
+    this.depth = Math.max(1, depth);
+    this.databaseCount = databases;
+    this.rows = rows;
+    this.blocks = blocks;
+    this.relations = Math.max(1, relations);
+    // Smallest branching factor whose tree of `depth` levels holds every page
+    this.branch = 1;
+    while (this.treeSize(this.branch) < this.pageCount) this.branch++;
+  }
+
+  treeSize(branch) {
+    let total = 1;
+    let level = 1;
+    for (let d = 0; d < this.depth; d++) {
+      level *= branch;
+      total += level;
+    }
+    return total;
+  }
+
+  get totalPages() {
+    return this.pageCount + this.databaseCount * this.rows;
+  }
+
+  id(kind, ...parts) {
+    const widths = kind === KIND.nested ? [15, 8, 8] : kind === KIND.block ? [15, 16] : [31];
+    return formatUuid(kind.toString(16) + parts.map((p, i) => p.toString(16).padStart(widths[i], '0')).join(''));
+  }
+
+  parse(id) {
+    const hex = String(id || '').replace(/-/g, '').toLowerCase();
+    if (!/^[0-9a-f]{32}$/.test(hex)) return null;
+    const kind = parseInt(hex[0], 16);
+    if (kind === KIND.block) return { kind, page: parseInt(hex.slice(1, 16), 16), index: parseInt(hex.slice(16), 16) };
+    if (kind === KIND.nested) {
+      return { kind, page: parseInt(hex.slice(1, 16), 16), index: parseInt(hex.slice(16, 24), 16), child: parseInt(hex.slice(24), 16) };
+    }
+    return { kind, index: parseInt(hex.slice(1), 16) };
+  }
+
+  // ---------- Structure ----------
+
+  isRow(page) {
+    return page >= this.pageCount && page < this.totalPages;
+  }
+
+  rowDatabase(page) {
+    return Math.floor((page - this.pageCount) / this.rows);
+  }
+
+  parentPage(page) {
+    return Math.floor((page - 1) / this.branch);
+  }
+
+  childPages(page) {
+    if (this.isRow(page)) return [];
+    const children = [];
+    const first = page * this.branch + 1;
+    for (let c = first; c < Math.min(first + this.branch, this.pageCount); c++) children.push(c);
+    return children;
+  }
+
+  databaseOwner(db) {
+    return Math.floor((db * this.pageCount) / Math.max(1, this.databaseCount));
+  }
+
+  ownedDatabases(page) {
+    const owned = [];
+    for (let db = 0; db < this.databaseCount; db++) if (this.databaseOwner(db) === page) owned.push(db);
+    return owned;
+  }
+
+  lastEdited(page) {
+    // Spread over ~6 months so search order differs from id order
+    return new Date(BASE_TIME + ((page * 7919) % 259200) * 60000).toISOString();
+  }
+
+  // ---------- Objects ----------
+
+  pageTitle(page) {
+    if (page === 0) return 'Synthetic Workspace';
+    if (this.isRow(page)) return `Entry ${(page - this.pageCount) % this.rows + 1} of Database ${this.rowDatabase(page) + 1}`;
+    return `Page ${page}`;
+  }
+
+  page(page) {
+    if (page < 0 || page >= this.totalPages) return null;
+    const base = {
+      object: 'page',
+      id: this.id(KIND.page, page),
+      created_time: new Date(BASE_TIME).toISOString(),
+      last_edited_time: this.lastEdited(page),
+      in_trash: false,
+      archived: false,
+      url: `https://www.notion.so/${this.id(KIND.page, page).replace(/-/g, '')}`,
+    };
+    if (!this.isRow(page)) {
+      const parentIndex = page === 0 ? null : this.parentPage(page);
+      return {
+        ...base,
+        parent: parentIndex === null ? { type: 'workspace', workspace: true } : { type: 'page_id', page_id: this.id(KIND.page, parentIndex) },
+        properties: { title: { id: 'title', type: 'title', title: richText(this.pageTitle(page)) } },
+      };
+    }
+
+    const db = this.rowDatabase(page);
+    const row = (page - this.pageCount) % this.rows;
+    const related = this.relatedPages(page);
+    const shown = related.slice(0, PROPERTY_REFERENCES);
+    return {
+      ...base,
+      parent: { type: 'data_source_id', data_source_id: this.id(KIND.dataSource, db), database_id: this.id(KIND.database, db) },
+      properties: {
+        Name: { id: 'title', type: 'title', title: richText(this.pageTitle(page)) },
+        Nr: { id: 'nr', type: 'number', number: row + 1 },
+        Status: { id: 'st', type: 'select', select: { name: ['Todo', 'Doing', 'Done'][row % 3], color: 'default' } },
+        Tags: { id: 'tg', type: 'multi_select', multi_select: [{ name: 'synthetic' }, { name: `db${db + 1}` }] },
+        Date: { id: 'dt', type: 'date', date: { start: this.lastEdited(page).slice(0, 10), end: null } },
+        Summary: { id: 'sm', type: 'rich_text', rich_text: richText(`Summary of entry ${row + 1}: generated for benchmarking.`) },
+        Related: { id: 'rl', type: 'relation', relation: shown.map(p => ({ id: this.id(KIND.page, p) })), has_more: related.length > shown.length },
+        'Related titles': {
+          id: 'ru',
+          type: 'rollup',
+          rollup: { type: 'array', function: 'show_original', array: shown.map(p => ({ type: 'title', title: richText(this.pageTitle(p)) })) },
+        },
+      },
+    };
+  }
+
+  // Pages a row relates to: the next row of its database, then pages of the tree
+  relatedPages(page) {
+    const row = (page - this.pageCount) % this.rows;
+    const related = [this.pageCount + this.rowDatabase(page) * this.rows + ((row + 1) % this.rows)];
+    for (let r = 1; r < this.relations; r++) related.push((row + r) % this.pageCount);
+    return related;
+  }
+
+  // Items of a row's relation or rollup, as pages.properties.retrieve pages them
+  propertyItems(page, propertyId) {
+    if (!this.isRow(page)) return null;
+    const related = this.relatedPages(page);
+    if (propertyId === 'rl') {
+      return related.map(p => ({ object: 'property_item', id: 'rl', type: 'relation', relation: { id: this.id(KIND.page, p) } }));
+    }
+    if (propertyId === 'ru') {
+      return related.map(p => ({ object: 'property_item', id: 'ru', type: 'title', title: richText(this.pageTitle(p))[0] }));
+    }
+    return null;
+  }
+
+  database(db) {
+    if (db < 0 || db >= this.databaseCount) return null;
+    const title = `Database ${db + 1}`;
+    return {
+      object: 'database',
+      id: this.id(KIND.database, db),
+      title: richText(title),
+      parent: { type: 'page_id', page_id: this.id(KIND.page, this.databaseOwner(db)) },
+      data_sources: [{ id: this.id(KIND.dataSource, db), name: title }],
+    };
+  }
+
+  dataSource(db) {
+    if (db < 0 || db >= this.databaseCount) return null;
+    return {
+      object: 'data_source',
+      id: this.id(KIND.dataSource, db),
+      title: richText(`Database ${db + 1}`),
+      parent: { type: 'database_id', database_id: this.id(KIND.database, db) },
+      properties: {
+        Name: { id: 'title', type: 'title', title: {} },
+        Nr: { id: 'nr', type: 'number', number: {} },
+        Status: { id: 'st', type: 'select', select: {} },
+        Tags: { id: 'tg', type: 'multi_select', multi_select: {} },
+        Date: { id: 'dt', type: 'date', date: {} },
+        Summary: { id: 'sm', type: 'rich_text', rich_text: {} },
+        Related: { id: 'rl', type: 'relation', relation: {} },
+        'Related titles': { id: 'ru', type: 'rollup', rollup: { relation_property_name: 'Related', rollup_property_name: 'Name', function: 'show_original' } },
+      },
+    };
+  }
+
+  rowPages(db) {
+    const rows = [];
+    for (let r = 0; r < this.rows; r++) rows.push(this.page(this.pageCount + db * this.rows + r));
+    return rows;
+  }
+
+  // ---------- Blocks ----------
+
+  block(page, index, type, hasChildren, body) {
+    return {
+      object: 'block',
+      id: this.id(KIND.block, page, index),
+      type,
+      has_children: hasChildren,
+      in_trash: false,
+      archived: false,
+      [type]: body,
+    };
+  }
+
+  contentBlock(page, index) {
+    const type = LAYOUT[index % LAYOUT.length];
+    const text = `Block ${index} of ${this.pageTitle(page)}: the quick brown fox jumps over the lazy dog.`;
+    switch (type) {
+      case 'heading_2': return this.block(page, index, type, false, { rich_text: richText(`Section ${index / LAYOUT.length + 1}`), is_toggleable: false, color: 'default' });
+      case 'bulleted_list_item':
+      case 'numbered_list_item': return this.block(page, index, type, index % 3 === 0, { rich_text: richText(text), color: 'default' });
+      case 'code': return this.block(page, index, type, false, { rich_text: richText(DIAGRAM), language: 'plain text', caption: [] });
+      case 'callout': return this.block(page, index, type, false, { rich_text: richText(`Note: ${text}`), icon: { type: 'emoji', emoji: '💡' }, color: 'gray_background' });
+      case 'to_do': return this.block(page, index, type, false, { rich_text: richText(text), checked: index % 2 === 0, color: 'default' });
+      case 'toggle': return this.block(page, index, type, true, { rich_text: richText(`Details ${index}`), color: 'default' });
+      case 'quote': return this.block(page, index, type, false, { rich_text: richText(text), color: 'default' });
+      case 'table': return this.block(page, index, type, true, { table_width: 3, has_column_header: true, has_row_header: false });
+      case 'divider': return this.block(page, index, type, false, {});
+      default: return this.block(page, index, type, false, { rich_text: richText(text, { bold: index % 4 === 0 }), color: 'default' });
+    }
+  }
+
+  /**
+   * A page's blocks: its content, then its child pages and databases
+   */
+  pageBlocks(page) {
+    const count = this.isRow(page) ? Math.max(1, Math.floor(this.blocks / 4)) : this.blocks;
+    const children = this.childPages(page);
+    const databases = this.ownedDatabases(page);
+    const total = count + children.length + databases.length;
+    return {
+      total,
+      at: (i) => {
+        if (i < count) return this.contentBlock(page, i);
+        if (i < count + children.length) {
+          const child = children[i - count];
+          return { ...this.block(page, i, 'child_page', true, { title: this.pageTitle(child) }), id: this.id(KIND.page, child) };
+        }
+        const db = databases[i - count - children.length];
+        return { ...this.block(page, i, 'child_database', false, { title: `Database ${db + 1}` }), id: this.id(KIND.database, db) };
+      },
+    };
+  }
+
+  nestedBlocks(page, index) {
+    const parent = this.contentBlock(page, index);
+    const make = (child, type, body) => ({
+      object: 'block', id: this.id(KIND.nested, page, index, child), type, has_children: false, in_trash: false, archived: false, [type]: body,
+    });
+    if (parent.type === 'table') {
+      return Array.from({ length: TABLE_ROWS }, (_, r) => make(r, 'table_row', {
+        cells: [0, 1, 2].map(c => richText(r === 0 ? `Column ${c + 1}` : `r${r}c${c} value ${index}`)),
+      }));
+    }
+    if (!parent.has_children) return [];
+    return Array.from({ length: LIST_CHILDREN }, (_, c) => make(c, parent.type === 'toggle' ? 'paragraph' : parent.type, {
+      rich_text: richText(`Nested ${c + 1} of block ${index}`), color: 'default',
+    }));
+  }
+
+  /**
+   * Children of any block id, as {total, at(i)}; null if the id is unknown
+   */
+  children(id) {
+    const ref = this.parse(id);
+    if (!ref) return null;
+    if (ref.kind === KIND.page && ref.index < this.totalPages) return this.pageBlocks(ref.index);
+    if (ref.kind === KIND.block && ref.page < this.totalPages) {
+      const nested = this.nestedBlocks(ref.page, ref.index);
+      return { total: nested.length, at: (i) => nested[i] };
+    }
+    if (ref.kind === KIND.nested) return { total: 0, at: () => null };
+    return null;
+  }
+
+  /**
+   * Search results for an object filter, sorted by last edit (newest first by default)
+   */
+  search(filter, direction = 'descending') {
+    if (filter === 'data_source') return Array.from({ length: this.databaseCount }, (_, db) => this.dataSource(db));
+    if (filter === 'database') return Array.from({ length: this.databaseCount }, (_, db) => this.database(db));
+    if (!this.searchOrder) {
+      this.searchOrder = Array.from({ length: this.totalPages }, (_, p) => p)
+        .sort((a, b) => this.lastEdited(b).localeCompare(this.lastEdited(a)) || a - b);
+    }
+    const order = direction === 'ascending' ? [...this.searchOrder].reverse() : this.searchOrder;
+    return { total: order.length, at: (i) => this.page(order[i]) };
+  }
+}
+
+function paginate(source, { start_cursor, page_size }) {
+  const list = Array.isArray(source) ? { total: source.length, at: (i) => source[i] } : source;
+  const start = Number(start_cursor || 0);
+  const size = Math.min(Number(page_size || 100), 100);
+  const results = [];
+  for (let i = start; i < Math.min(start + size, list.total); i++) results.push(list.at(i));
+  const next = start + results.length;
+  return { object: 'list', results, has_more: next < list.total, next_cursor: next < list.total ? String(next) : null, type: 'block' };
+}
+
+/**
+ * HTTP front end: routing, latency, 429 injection and request counting
+ */
+function createServer(workspace, { latency = 0, jitter = 0, rps = 0, throttle = 0, seed = 1 } = {}) {
+  const rand = random(seed);
+  const stats = { requests: 0, throttled: 0, notFound: 0, endpoints: {} };
+  let tokens = rps;
+  let refilled = Date.now();
+
+  const send = (res, status, body, headers = {}) => {
+    res.writeHead(status, { 'content-type': 'application/json', ...headers });
+    res.end(JSON.stringify(body));
+  };
+  const notFound = (res, id) => {
+    stats.notFound++;
+    send(res, 404, { object: 'error', status: 404, code: 'object_not_found', message: `Could not find object with ID: ${id}` });
+  };
+
+  // Requests over the --rps budget (burst of one second) or a --throttle coin flip get a 429
+  const rateLimited = () => {
+    if (throttle && rand() < throttle) return true;
+    if (!rps) return false;
+    const now = Date.now();
+    tokens = Math.min(rps, tokens + ((now - refilled) / 1000) * rps);
+    refilled = now;
+    if (tokens < 1) return true;
+    tokens -= 1;
+    return false;
+  };
+
+  const routes = [
+    ['GET', /^\/v1\/pages\/([^/]+)$/, 'pages.retrieve', (m) => {
+      const ref = workspace.parse(m[1]);
+      return ref?.kind === KIND.page ? workspace.page(ref.index) : null;
+    }],
+    ['GET', /^\/v1\/pages\/([^/]+)\/properties\/([^/]+)$/, 'pages.properties.retrieve', (m, query) => {
+      const ref = workspace.parse(m[1]);
+      const propertyId = decodeURIComponent(m[2]);
+      const items = ref?.kind === KIND.page ? workspace.propertyItems(ref.index, propertyId) : null;
+      if (!items) return null;
+      const propertyItem = propertyId === 'ru'
+        ? { id: 'ru', type: 'rollup', rollup: { type: 'array', function: 'show_original', array: [] } }
+        : { id: 'rl', type: 'relation', relation: {} };
+      return { ...paginate(items, query), type: 'property_item', property_item: { ...propertyItem, next_url: null } };
+    }],
+    ['GET', /^\/v1\/blocks\/([^/]+)\/children$/, 'blocks.children.list', (m, query) => {
+      const children = workspace.children(m[1]);
+      return children && paginate(children, query);
+    }],
+    ['GET', /^\/v1\/databases\/([^/]+)$/, 'databases.retrieve', (m) => {
+      const ref = workspace.parse(m[1]);
+      return ref?.kind === KIND.database ? workspace.database(ref.index) : null;
+    }],
+    ['GET', /^\/v1\/data_sources\/([^/]+)$/, 'dataSources.retrieve', (m) => {
+      const ref = workspace.parse(m[1]);
+      return ref?.kind === KIND.dataSource ? workspace.dataSource(ref.index) : null;
+    }],
+    ['POST', /^\/v1\/(?:data_sources|databases)\/([^/]+)\/query$/, 'dataSources.query', (m, query, body) => {
+      const ref = workspace.parse(m[1]);
+      if (ref?.kind !== KIND.dataSource && ref?.kind !== KIND.database) return null;
+      if (ref.index >= workspace.databaseCount) return null;
+      return { ...paginate(workspace.rowPages(ref.index), body), type: 'page_or_data_source' };
+    }],
+    ['POST', /^\/v1\/search$/, 'search', (m, query, body) => {
+      const results = workspace.search(body.filter?.value || 'page', body.sort?.direction);
+      return { ...paginate(results, body), type: 'page_or_data_source' };
+    }],
+  ];
+
+  const server = http.createServer((req, res) => {
+    const url = new URL(req.url, 'http://localhost');
+    if (url.pathname === '/__stats') return send(res, 200, stats);
+    if (url.pathname === '/__reset') {
+      Object.assign(stats, { requests: 0, throttled: 0, notFound: 0, endpoints: {} });
+      return send(res, 200, stats);
+    }
+
+    let raw = '';
+    req.on('data', (chunk) => { raw += chunk; });
+    req.on('end', () => {
+      stats.requests++;
+      const route = routes.find(([method, pattern]) => method === req.method && pattern.test(url.pathname));
+      const wait = latency + (jitter ? rand() * jitter : 0);
+      setTimeout(() => {
+        if (!route) return send(res, 400, { object: 'error', status: 400, code: 'invalid_request_url', message: `Unsupported: ${req.method} ${url.pathname}` });
+        const [, pattern, name, handler] = route;
+        stats.endpoints[name] = (stats.endpoints[name] || 0) + 1;
+        if (rateLimited()) {
+          stats.throttled++;
+          return send(res, 429, { object: 'error', status: 429, code: 'rate_limited', message: 'Rate limited' }, { 'retry-after': '1' });
+        }
+        let body = {};
+        try {
+          body = raw ? JSON.parse(raw) : {};
+        } catch {
+          return send(res, 400, { object: 'error', status: 400, code: 'invalid_json', message: 'Invalid JSON body' });
+        }
+        const match = url.pathname.match(pattern);
+        const result = handler(match, Object.fromEntries(url.searchParams), body);
+        return result ? send(res, 200, result) : notFound(res, match[1]);
+      }, wait);
+    });
+  });
+  return { server, stats };
+}
+
+if (require.main === module) {
+  const workspace = new SyntheticWorkspace({
+    pages: option('--pages', 200),
+    depth: option('--depth', 3),
+    databases: option('--databases', 4),
+    rows: option('--rows', 25),
+    blocks: option('--blocks', 40),
+    relations: option('--relations', 1),
+  });
+  const { server } = createServer(workspace, {
+    latency: option('--latency', 0),
+    jitter: option('--jitter', 0),
+    rps: option('--rps', 0),
+    throttle: option('--throttle', 0),
+    seed: option('--seed', 1),
+  });
+  server.listen(option('--port', 4010), '127.0.0.1', () => {
+    console.log(JSON.stringify({
+      port: server.address().port,
+      rootPageId: workspace.id(KIND.page, 0).replace(/-/g, ''),
+      pages: workspace.totalPages,
+      databases: workspace.databaseCount,
+    }));
+    console.error(`📡 Fake Notion API on http://127.0.0.1:${server.address().port} ` +
+      `(${workspace.totalPages} pages, ${workspace.databaseCount} databases)`);
+  });
+  process.on('SIGTERM', () => server.close(() => process.exit(0)));
+}
+
+module.exports = {
+  SyntheticWorkspace,
+  createServer,
+};
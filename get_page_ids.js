@@ -1,10 +1,15 @@
-const { Client } = require("@notionhq/client");
+const fs = require('fs');
+const { createNotionClient, apiLimiter, relaunchProfiled } = require('./notion_utils');
 
 // Get arguments
 const args = process.argv.slice(2);
 const NOTION_TOKEN = args[0] || process.env.NOTION_TOKEN;
 const PARENT_PAGE_ID = args[1] || process.env.NOTION_PAGE_ID;
 const RECURSIVE = (args[2] || process.env.RECURSIVE || 'true').toLowerCase() === 'true';
+// --previous <structure.json>: delta scan against the stored result of an earlier scan
+const PREVIOUS_SCAN = args.includes('--previous') ? args[args.indexOf('--previous') + 1] : null;
+// --stream: hand pages to a running export while the scan goes on (see export_pipeline.py)
+const STREAM = args.includes('--stream');
 
 if (!NOTION_TOKEN || !PARENT_PAGE_ID) {
   console.error(JSON.stringify({
@@ -14,38 +19,55 @@ if (!NOTION_TOKEN || !PARENT_PAGE_ID) {
 }
 
 // Initialize Notion client with API version 2025-09-03
-const notion = new Client({
-  auth: NOTION_TOKEN,
-  notionVersion: '2025-09-03', // Required for @notionhq/client v5.x
-});
-
-// Rate limiting helper to avoid API throttling
-const delay = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+// Requests go through the shared adaptive limiter, which also counts them
+const notion = createNotionClient(NOTION_TOKEN);
 
 // Store all found page IDs
 const pageIds = new Set();
 const pageInfo = [];
+// Databases whose rows are already known (delta scans track rows through search instead)
+const knownDatabases = new Set();
+
+const cleanId = (id) => String(id || '').replace(/-/g, '');
+
+// --stream: one {"batch": [...]} line per page once its subtree has been walked (so
+// children come before their parents), and one per database with all its new rows.
+// While the export queue is full the pipe doesn't drain, and the walk waits for it.
+const emitted = new Set();
+async function emitPages(entries) {
+  if (!STREAM) return;
+  const batch = entries.filter(entry => !emitted.has(cleanId(entry.id)));
+  if (batch.length === 0) return;
+  for (const entry of batch) emitted.add(cleanId(entry.id));
+  if (!process.stdout.write(JSON.stringify({ batch }) + '\n')) {
+    await new Promise(resolve => process.stdout.once('drain', resolve));
+  }
+}
+
+function titleFromPage(page) {
+  // Try to get title from different property types
+  if (page.properties.title?.title?.[0]?.plain_text) {
+    return page.properties.title.title[0].plain_text;
+  } else if (page.properties.Name?.title?.[0]?.plain_text) {
+    return page.properties.Name.title[0].plain_text;
+  } else if (page.properties.name?.title?.[0]?.plain_text) {
+    return page.properties.name.title[0].plain_text;
+  }
+  // Fallback to first title property found
+  for (const [key, value] of Object.entries(page.properties)) {
+    if (value.type === 'title' && value.title?.[0]?.plain_text) {
+      return value.title[0].plain_text;
+    }
+  }
+  return 'Untitled';
+}
 
-async function getPageTitle(pageId) {
+async function getPageMeta(pageId) {
   try {
     const page = await notion.pages.retrieve({ page_id: pageId });
-    // Try to get title from different property types
-    if (page.properties.title?.title?.[0]?.plain_text) {
-      return page.properties.title.title[0].plain_text;
-    } else if (page.properties.Name?.title?.[0]?.plain_text) {
-      return page.properties.Name.title[0].plain_text;
-    } else if (page.properties.name?.title?.[0]?.plain_text) {
-      return page.properties.name.title[0].plain_text;
-    }
-    // Fallback to first title property found
-    for (const [key, value] of Object.entries(page.properties)) {
-      if (value.type === 'title' && value.title?.[0]?.plain_text) {
-        return value.title[0].plain_text;
-      }
-    }
-    return 'Untitled';
+    return { title: titleFromPage(page), lastEdited: page.last_edited_time };
   } catch (error) {
-    return 'Untitled';
+    return { title: 'Untitled', lastEdited: null };
   }
 }
 
@@ -72,7 +94,7 @@ async function getDataSourcesFromDatabase(databaseId) {
 }
 
 /**
- * Query a data source for pages
+ * Query a data source for pages (null if it could not be queried)
  * API 2025-09-03: Use dataSources.query instead of databases.query
  */
 async function queryDataSource(dataSourceId) {
@@ -114,12 +136,18 @@ async function queryDataSource(dataSourceId) {
       return results;
     } catch (fallbackError) {
       console.error(`Fallback also failed: ${fallbackError.message}`);
-      return [];
+      return null;
     }
   }
 }
 
+/**
+ * Walk a page's blocks for child pages and databases (recursively if enabled)
+ * Returns the ids of the child pages and databases found directly under blockId,
+ * or null if the block could not be listed
+ */
 async function getChildPages(blockId, level = 0) {
+  const seen = { pages: new Set(), databases: new Set() };
   try {
     let cursor = undefined;
     
@@ -134,31 +162,33 @@ async function getChildPages(blockId, level = 0) {
         // Check if block is a child_page
         if (block.type === 'child_page') {
           const pageId = block.id;
+          seen.pages.add(cleanId(pageId));
           if (!pageIds.has(pageId)) {
             pageIds.add(pageId);
-            const title = await getPageTitle(pageId);
-            
-            pageInfo.push({
+            const { title, lastEdited } = await getPageMeta(pageId);
+            const entry = {
               id: pageId,
               title: title,
               level: level,
-              parent: blockId
-            });
+              parent: blockId,
+              lastEdited
+            };
+            pageInfo.push(entry);
             
             console.error(`${'  '.repeat(level)}📄 Found: ${title} (${pageId.substring(0, 8)}...)`);
             
-            // Rate limiting to avoid API throttling
-            await delay(100);
-            
             // Recursively get child pages if enabled
             if (RECURSIVE) {
               await getChildPages(pageId, level + 1);
             }
+            await emitPages([entry]);
           }
         }
         // Check if block is a child_database
         else if (block.type === 'child_database') {
           const dbId = block.id;
+          seen.databases.add(cleanId(dbId));
+          if (knownDatabases.has(cleanId(dbId))) continue;
           console.error(`${'  '.repeat(level)}📊 Found database: ${dbId.substring(0, 8)}...`);
           
           // API 2025-09-03: Get data sources from database first
@@ -168,28 +198,32 @@ async function getChildPages(blockId, level = 0) {
             console.error(`${'  '.repeat(level)}  📁 Data source: ${dataSource.name}`);
             
             // Query each data source for pages
-            const pages = await queryDataSource(dataSource.id);
+            const pages = await queryDataSource(dataSource.id) || [];
+            const rows = [];
             
             for (const page of pages) {
               if (!pageIds.has(page.id)) {
                 pageIds.add(page.id);
-                const title = await getPageTitle(page.id);
+                // Query results are full page objects, so no per-row retrieve is needed
+                const title = titleFromPage(page);
                 
-                pageInfo.push({
+                rows.push({
                   id: page.id,
                   title: title,
                   level: level + 1,
                   parent: dbId,
                   dataSourceId: dataSource.id,
-                  fromDatabase: true
+                  databaseTitle: block.child_database?.title || dataSource.name,
+                  databaseParent: blockId,
+                  fromDatabase: true,
+                  lastEdited: page.last_edited_time
                 });
                 
                 console.error(`${'  '.repeat(level + 1)}📄 DB Page: ${title} (${page.id.substring(0, 8)}...)`);
-                
-                // Rate limiting to avoid API throttling
-                await delay(50);
               }
             }
+            pageInfo.push(...rows);
+            await emitPages(rows);
           }
         }
       }
@@ -197,43 +231,262 @@ async function getChildPages(blockId, level = 0) {
       cursor = response.has_more ? response.next_cursor : undefined;
     } while (cursor);
     
+    return seen;
   } catch (error) {
     console.error(`Error fetching children for ${blockId}: ${error.message}`);
+    return null;
   }
 }
 
+// Newest last_edited_time in the tree: the next delta scan stops there
+function highWaterMark(pages) {
+  return pages.map(p => p.lastEdited).filter(Boolean).sort().pop() || null;
+}
+
+// Depth-first order (parents before children, siblings in their existing order)
+function orderPages(entries, rootId) {
+  const children = new Map();
+  for (const entry of entries.values()) {
+    const parentKey = cleanId(entry.fromDatabase ? entry.databaseParent : entry.parent);
+    if (!children.has(parentKey)) children.set(parentKey, []);
+    children.get(parentKey).push(entry);
+  }
+  const root = entries.get(cleanId(rootId));
+  const ordered = [root];
+  const visit = (id) => {
+    for (const child of children.get(cleanId(id)) || []) {
+      ordered.push(child);
+      visit(child.id);
+    }
+  };
+  visit(root.id);
+  return ordered;
+}
+
+function loadPreviousScan(file) {
+  try {
+    const previous = JSON.parse(fs.readFileSync(file, 'utf8'));
+    if (cleanId(previous.parentPage) !== cleanId(PARENT_PAGE_ID) || !previous.highWaterMark) {
+      return null;
+    }
+    if (!previous.pages?.some(p => cleanId(p.id) === cleanId(PARENT_PAGE_ID))) return null;
+    return previous;
+  } catch (error) {
+    return null;
+  }
+}
+
+/**
+ * Pages edited at or after the high-water mark, newest first
+ * last_edited_time has minute precision, so the mark's own minute is included
+ * and pages whose timestamp didn't move are skipped by the caller.
+ */
+async function searchEditedSince(mark) {
+  const edited = [];
+  let cursor = undefined;
+  do {
+    const response = await notion.search({
+      filter: { property: 'object', value: 'page' },
+      sort: { direction: 'descending', timestamp: 'last_edited_time' },
+      page_size: 100,
+      start_cursor: cursor,
+    });
+    for (const page of response.results) {
+      if (page.last_edited_time < mark) return edited;
+      edited.push(page);
+    }
+    cursor = response.has_more ? response.next_cursor : undefined;
+  } while (cursor);
+  return edited;
+}
+
+/**
+ * Drop stored rows that are no longer in their database
+ * Search never returns trashed or archived pages, so deleted rows only show
+ * up as missing from a query of their data source (one request per 100 rows).
+ * A data source that can't be queried keeps its stored rows.
+ */
+async function pruneDeletedRows(entries, rowsBySource, removeSubtree) {
+  let removed = 0;
+  for (const [sourceKey, sibling] of rowsBySource) {
+    const results = await queryDataSource(sibling.dataSourceId);
+    if (!results) {
+      console.error(`⚠️  Could not query ${sibling.databaseTitle}; keeping its stored rows`);
+      continue;
+    }
+    const live = new Set(results.filter(page => !page.in_trash && !page.archived).map(page => cleanId(page.id)));
+    for (const [key, entry] of [...entries]) {
+      if (!entry.fromDatabase || cleanId(entry.dataSourceId) !== sourceKey || live.has(key)) continue;
+      entries.delete(key);
+      removeSubtree(entry.id);
+      removed++;
+      console.error(`🗑️  Removed: ${entry.title} (no longer in ${entry.databaseTitle})`);
+    }
+  }
+  return removed;
+}
+
+/**
+ * Delta scan: only pages edited since the last scan are looked at
+ * Known pages get their title refreshed and their direct children re-listed
+ * (new child pages are walked, vanished ones dropped with their subtrees);
+ * new rows of known databases are added next to their siblings, and rows
+ * deleted from them are dropped (see pruneDeletedRows).
+ */
+async function deltaScan(previous) {
+  const entries = new Map(previous.pages.map(p => [cleanId(p.id), p]));
+  const rowsBySource = new Map();
+  for (const entry of previous.pages) {
+    pageIds.add(entry.id);
+    if (entry.fromDatabase) {
+      knownDatabases.add(cleanId(entry.parent));
+      rowsBySource.set(cleanId(entry.dataSourceId), entry);
+    }
+  }
+  
+  const removeSubtree = (id) => {
+    for (const [key, entry] of entries) {
+      if (cleanId(entry.parent) === cleanId(id) || cleanId(entry.databaseParent) === cleanId(id)) {
+        if (!entry.fromDatabase || cleanId(entry.databaseParent) === cleanId(id)) {
+          entries.delete(key);
+          removeSubtree(entry.id);
+        }
+      }
+    }
+  };
+  
+  console.error(`🔍 Delta scan: pages edited since ${previous.highWaterMark}...\n`);
+  let changed = await pruneDeletedRows(entries, rowsBySource, removeSubtree);
+  const edited = await searchEditedSince(previous.highWaterMark);
+  const candidates = edited.filter(page => entries.get(cleanId(page.id))?.lastEdited !== page.last_edited_time);
+  
+  // Oldest first, so a new parent is walked before its own new children show up
+  for (const page of candidates.reverse()) {
+    const key = cleanId(page.id);
+    const known = entries.get(key);
+    const parent = page.parent || {};
+    
+    if (known) {
+      known.title = titleFromPage(page);
+      known.lastEdited = page.last_edited_time;
+      changed++;
+      console.error(`✏️  Changed: ${known.title} (${key.substring(0, 8)}...)`);
+      if (known.fromDatabase || !RECURSIVE) continue;
+      
+      const seen = await getChildPages(known.id, (known.level || 0) + 1);
+      if (!seen) continue;
+      for (const entry of [...entries.values()]) {
+        const childPage = !entry.fromDatabase && cleanId(entry.parent) === key;
+        const childRow = entry.fromDatabase && cleanId(entry.databaseParent) === key;
+        if ((childPage && !seen.pages.has(cleanId(entry.id))) ||
+            (childRow && !seen.databases.has(cleanId(entry.parent)))) {
+          entries.delete(cleanId(entry.id));
+          removeSubtree(entry.id);
+          console.error(`🗑️  Removed: ${entry.title}`);
+        }
+      }
+    } else if (parent.data_source_id && rowsBySource.has(cleanId(parent.data_source_id))) {
+      const sibling = rowsBySource.get(cleanId(parent.data_source_id));
+      changed++;
+      pageIds.add(page.id);
+      pageInfo.push({
+        id: page.id,
+        title: titleFromPage(page),
+        level: sibling.level,
+        parent: sibling.parent,
+        dataSourceId: sibling.dataSourceId,
+        databaseTitle: sibling.databaseTitle,
+        databaseParent: sibling.databaseParent,
+        fromDatabase: true,
+        lastEdited: page.last_edited_time
+      });
+      console.error(`📄 New DB page: ${titleFromPage(page)} (${key.substring(0, 8)}...)`);
+    } else if (parent.page_id && entries.has(cleanId(parent.page_id)) && RECURSIVE) {
+      const parentEntry = entries.get(cleanId(parent.page_id));
+      if (!pageIds.has(page.id)) {
+        pageIds.add(page.id);
+        changed++;
+        pageInfo.push({
+          id: page.id,
+          title: titleFromPage(page),
+          level: (parentEntry.level || 0) + 1,
+          parent: parentEntry.id,
+          lastEdited: page.last_edited_time
+        });
+        console.error(`📄 New page: ${titleFromPage(page)} (${key.substring(0, 8)}...)`);
+        await getChildPages(page.id, (parentEntry.level || 0) + 2);
+      }
+    }
+    
+    // Pages found by walks above join the tree straight away
+    for (const entry of pageInfo.splice(0)) {
+      entries.set(cleanId(entry.id), entry);
+    }
+  }
+  
+  const pages = orderPages(entries, PARENT_PAGE_ID);
+  // Out-of-scope edits move the mark too, so they aren't fetched again next time
+  return { pages, changed, newest: edited[0]?.last_edited_time || null };
+}
+
 async function getAllPageIds() {
   try {
-    console.error('🔍 Scanning for all page IDs (API 2025-09-03)...\n');
+    const previous = PREVIOUS_SCAN ? loadPreviousScan(PREVIOUS_SCAN) : null;
+    let pages;
+    let changed = null;
+    let newest = null;
     
-    // Add the parent page itself
-    const parentTitle = await getPageTitle(PARENT_PAGE_ID);
-    pageIds.add(PARENT_PAGE_ID);
-    pageInfo.push({
-      id: PARENT_PAGE_ID,
-      title: parentTitle,
-      level: 0,
-      parent: null
-    });
-    console.error(`📄 Parent: ${parentTitle} (${PARENT_PAGE_ID.substring(0, 8)}...)\n`);
+    if (previous) {
+      ({ pages, changed, newest } = await deltaScan(previous));
+    } else {
+      if (PREVIOUS_SCAN) console.error('ℹ️  No usable previous scan, doing a full scan\n');
+      console.error('🔍 Scanning for all page IDs (API 2025-09-03)...\n');
+      
+      // Add the parent page itself
+      const { title: parentTitle, lastEdited } = await getPageMeta(PARENT_PAGE_ID);
+      pageIds.add(PARENT_PAGE_ID);
+      pageInfo.push({
+        id: PARENT_PAGE_ID,
+        title: parentTitle,
+        level: 0,
+        parent: null,
+        lastEdited
+      });
+      console.error(`📄 Parent: ${parentTitle} (${PARENT_PAGE_ID.substring(0, 8)}...)\n`);
+      
+      // Get all child pages
+      await getChildPages(PARENT_PAGE_ID, 1);
+      pages = pageInfo;
+    }
     
-    // Get all child pages
-    await getChildPages(PARENT_PAGE_ID, 1);
+    // The parent page, and everything a delta scan found (children before parents)
+    await emitPages([...pages].reverse());
     
     // Output results
+    const ids = pages.map(p => p.id);
     const result = {
       success: true,
-      totalPages: pageIds.size,
+      totalPages: ids.length,
       parentPage: PARENT_PAGE_ID,
       recursive: RECURSIVE,
       apiVersion: '2025-09-03',
-      pageIds: Array.from(pageIds),
-      pages: pageInfo
+      scanMode: previous ? 'delta' : 'full',
+      changedPages: changed,
+      highWaterMark: [highWaterMark(pages), newest, previous?.highWaterMark].filter(Boolean).sort().pop() || null,
+      apiRequests: apiLimiter.stats.requests,
+      api: apiLimiter.summary(),
+      pageIds: ids,
+      pages
     };
     
-    console.error(`\n✅ Found ${pageIds.size} total pages (including parent)`);
+    if (previous) {
+      console.error(`\n✅ Delta scan: ${changed} changed page(s), ${ids.length} total pages`);
+    } else {
+      console.error(`\n✅ Found ${ids.length} total pages (including parent)`);
+    }
+    apiLimiter.report();
     console.error('\n📋 Page IDs for export (copy this for NOTION_PAGE_IDS):');
-    console.error(Array.from(pageIds).join(','));
+    console.error(ids.join(','));
     
     // Output JSON to stdout for parsing
     console.log(JSON.stringify(result));
@@ -247,5 +500,6 @@ async function getAllPageIds() {
   }
 }
 
-// Run the scanner
+// Run the scanner (--profile: under the V8 CPU profiler)
+relaunchProfiled(process.env.OUTPUT_DIR || './output');
 getAllPageIds();
@@ -11,6 +11,10 @@ import subprocess
 from pathlib import Path
 from dotenv import load_dotenv
 
+from page_graph import PageGraph
+from profiling import node_command, profiled_main
+from tracing import span
+
 # Load environment variables
 load_dotenv()
 
@@ -20,6 +24,12 @@ class NotionPageScanner:
         self.parent_page_id = os.getenv('NOTION_PAGE_ID')
         self.recursive = os.getenv('RECURSIVE', 'true').lower() == 'true'
         self.auto_export = os.getenv('AUTO_EXPORT', 'false').lower() == 'true'
+        self.output_dir = os.getenv('OUTPUT_DIR', './output')
+        # auto: delta scan when a previous structure.json exists; full: always walk everything
+        self.scan_mode = os.getenv('SCAN_MODE', 'auto').lower()
+        self.structure_file = Path(self.output_dir) / 'structure.json'
+        # Human-readable views of the page graph: 'file' (found_page_ids.txt), 'env' (NOTION_PAGE_IDS in .env)
+        self.id_views = {v.strip() for v in os.getenv('ID_VIEWS', 'file').lower().split(',') if v.strip()}
         
     def validate_config(self) -> bool:
         """Validate required configuration"""
@@ -33,26 +43,33 @@ class NotionPageScanner:
         
         return True
     
+    def scan_command(self) -> list:
+        """Command line of the Node.js scanner (a delta scan when a previous scan is stored)"""
+        args = node_command(
+            'get_page_ids.js',
+            self.notion_token,
+            self.parent_page_id.replace('-', ''),
+            str(self.recursive).lower()
+        )
+        if self.scan_mode != 'full' and self.structure_file.exists():
+            args += ['--previous', str(self.structure_file)]
+        return args
+    
     def scan_pages(self) -> dict:
         """Run the Node.js script to get all page IDs"""
         try:
-            args = [
-                'node',
-                'get_page_ids.js',
-                self.notion_token,
-                self.parent_page_id.replace('-', ''),
-                str(self.recursive).lower()
-            ]
+            args = self.scan_command()
             
             print("🔍 Scanning Notion pages...")
             print("=" * 50)
             
-            result = subprocess.run(
-                args,
-                capture_output=True,
-                text=True,
-                check=False
-            )
+            with span('get_page_ids.js', 'process'):
+                result = subprocess.run(
+                    args,
+                    capture_output=True,
+                    text=True,
+                    check=False
+                )
             
             if result.returncode != 0:
                 error_msg = result.stderr or result.stdout
@@ -71,9 +88,13 @@ class NotionPageScanner:
             return {'success': False, 'error': str(e)}
     
     def update_env_file(self, page_ids: list) -> bool:
-        """Update the .env file with new page IDs"""
+        """Update the .env file with new page IDs (only with the env view; .env is the user's file otherwise)"""
         env_file = Path('.env')
         
+        # A NOTION_PAGE_IDS list there is the hand-made fallback for exports without a scan
+        if 'env' not in self.id_views:
+            return False
+        
         if not env_file.exists():
             print("⚠️  .env file not found, creating new one...")
             with open(env_file, 'w') as f:
@@ -133,7 +154,12 @@ class NotionPageScanner:
         pages = result.get('pages', [])
         total = result.get('totalPages', 0)
         
-        print(f"\n✅ Found {total} pages total\n")
+        print(f"\n✅ Found {total} pages total")
+        if result.get('scanMode') == 'delta':
+            print(f"🔁 Delta scan: {result.get('changedPages', 0)} changed page(s) since {result.get('highWaterMark')}")
+        if result.get('apiRequests') is not None:
+            print(f"📡 API requests: {result['apiRequests']}")
+        print()
         
         # Group pages by level for better display
         by_level = {}
@@ -160,38 +186,55 @@ class NotionPageScanner:
         
         page_ids = result.get('pageIds', [])
         
-        # Automatically update .env file
-        print("\n🔄 Updating .env file...")
-        self.update_env_file(page_ids)
+        # The page graph is what every stage reads its page list from
+        try:
+            graph = PageGraph(self.output_dir)
+            stored = graph.replace(result)
+            print(f"\n🗂️  Page graph saved to: {graph.path} ({stored} pages)")
+        except Exception as e:
+            print(f"\n⚠️  Could not save the page graph: {e}")
         
-        print("\n✂️  Page IDs have been added to your .env file:")
-        print("-" * 50)
-        print(f"NOTION_PAGE_IDS={','.join(page_ids)}")
-        print("-" * 50)
+        self.update_env_file(page_ids)
+        if 'env' in self.id_views:
+            print(f"✂️  {len(page_ids)} page IDs written to NOTION_PAGE_IDS in .env")
         
-        # Try to save backup file (optional - if it fails, that's okay)
-        try:
-            # Try host directory first if mounted
-            host_dir = Path('/app/host')
-            if host_dir.exists():
-                output_file = host_dir / 'found_page_ids.txt'
-            else:
-                output_file = Path('found_page_ids.txt')
+        # Optional human-readable list (if it fails, that's okay)
+        if 'file' in self.id_views:
+            try:
+                # Try host directory first if mounted
+                host_dir = Path('/app/host')
+                if host_dir.exists():
+                    output_file = host_dir / 'found_page_ids.txt'
+                else:
+                    output_file = Path('found_page_ids.txt')
             
-            with open(output_file, 'w') as f:
-                f.write(f"# Found {total} pages from parent: {result.get('parentPage')}\n")
-                f.write(f"# Recursive scan: {result.get('recursive')}\n\n")
-                f.write(f"# For .env file:\n")
-                f.write(f"NOTION_PAGE_IDS={','.join(page_ids)}\n\n")
-                f.write(f"# Individual page IDs:\n")
-                for page in pages:
-                    f.write(f"# {page.get('title', 'Untitled')}\n")
-                    f.write(f"{page.get('id')}\n\n")
+                with open(output_file, 'w') as f:
+                    f.write(f"# Found {total} pages from parent: {result.get('parentPage')}\n")
+                    f.write(f"# Recursive scan: {result.get('recursive')}\n\n")
+                    f.write(f"# For .env file:\n")
+                    f.write(f"NOTION_PAGE_IDS={','.join(page_ids)}\n\n")
+                    f.write(f"# Individual page IDs:\n")
+                    for page in pages:
+                        f.write(f"# {page.get('title', 'Untitled')}\n")
+                        f.write(f"{page.get('id')}\n\n")
             
-            print(f"\n💾 Backup also saved to: {output_file}")
+                print(f"💾 Page list also saved to: {output_file}")
+            except Exception as e:
+                # Only a view of the page graph, so failing here is not critical
+                print(f"\n⚠️  Could not save backup file (non-critical): {e}")
+        
+        # Save the raw scan so organize_output.py can derive its layout from it
+        try:
+            # (also the stored tree the next delta scan merges into)
+            structure_file = self.structure_file
+            structure_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = structure_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(result, f, indent=2)
+            os.replace(tmp_file, structure_file)
+            print(f"📋 Structure saved to: {structure_file}")
         except Exception as e:
-            # If backup fails, it's not critical - we already updated .env
-            print(f"\n⚠️  Could not save backup file (non-critical): {e}")
+            print(f"\n⚠️  Could not save structure file (non-critical): {e}")
         
         if self.auto_export:
             print("\n🚀 AUTO_EXPORT is enabled. Starting export of all pages...")
@@ -203,9 +246,7 @@ class NotionPageScanner:
         print("📥 EXPORTING ALL PAGES")
         print("=" * 50)
         
-        # Update environment variable and run export
-        os.environ['NOTION_PAGE_IDS'] = ','.join(page_ids)
-        
+        # The exporter reads the page list from the page graph saved above
         # Run the main export script
         try:
             subprocess.run(['python', 'export_notion.py'], check=True)
@@ -225,6 +266,7 @@ class NotionPageScanner:
         print(f"📋 Configuration:")
         print(f"   - Parent page: {self.parent_page_id[:8]}...")
         print(f"   - Recursive scan: {self.recursive}")
+        print(f"   - Scan mode: {self.scan_mode}")
         print(f"   - Auto export: {self.auto_export}")
         print()
         
@@ -240,4 +282,4 @@ def main():
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    profiled_main('get_page_ids', main)
\ No newline at end of file
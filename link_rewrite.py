@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Offline link rewriting
+Exporters record where each page was written in output/.page_index.json
+(page id -> file). This pass then turns links between pages -- notion.so
+URLs from page mentions and links, relation values and the old
+`[Page: <id>]` placeholders -- into relative markdown links, without any
+API calls. Each file is read once; links to pages that were not exported
+keep pointing at Notion.
+
+    python link_rewrite.py              # Whole output tree
+    python link_rewrite.py --last-run   # Only the files the last export run wrote
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+from urllib.parse import quote, urlsplit, parse_qs
+from typing import Dict, Iterable, List, Optional
+
+from export_manifest import load_manifest
+from tracing import span, traced_main
+
+PAGE_INDEX_FILENAME = '.page_index.json'
+
+NOTION_PAGE_HOSTS = ('notion.so', 'www.notion.so', 'notion.site')
+# Paths on the Notion hosts that serve files, not pages
+NOTION_FILE_PATHS = ('signed', 'image', 'images', 'file', 'files', 'f')
+
+# [text](url) / [text](url "title"), not images
+PAGE_LINK_RE = re.compile(r'(?<!!)\[((?:[^\]\n\\]|\\.)*)\]\((https?://[^\s)]+)((?:\s+"[^"\n]*")?)\)')
+# Unresolved relation placeholder written by older exports
+PLACEHOLDER_RE = re.compile(r'\[Page: ([0-9a-fA-F-]{32,36})\]')
+PAGE_ID_RE = re.compile(r'([0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$')
+FENCE_RE = re.compile(r'^\s*(```|~~~)')
+
+def clean_id(page_id: str) -> str:
+    return (page_id or '').replace('-', '').lower()
+
+def notion_page_id(url: str) -> Optional[str]:
+    """The page id a notion.so / *.notion.site page URL points at (None for files and other hosts)"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if host not in NOTION_PAGE_HOSTS and not host.endswith('.notion.site'):
+        return None
+    segments = [s for s in parts.path.split('/') if s]
+    if not segments or segments[0].lower() in NOTION_FILE_PATHS:
+        return None
+    # Peeked database rows: notion.so/<db>?p=<page id>
+    peek = parse_qs(parts.query).get('p')
+    if peek and PAGE_ID_RE.search(peek[0].lower()):
+        return clean_id(peek[0])
+    match = PAGE_ID_RE.search(segments[-1].lower())
+    return clean_id(match.group(1)) if match else None
+
+# ---------------------------------------------------------------------------
+# Page index (written by the exporters)
+# ---------------------------------------------------------------------------
+
+def index_path(output_dir: str) -> Path:
+    return Path(output_dir) / PAGE_INDEX_FILENAME
+
+def load_page_index(output_dir: str) -> Dict[str, Dict]:
+    try:
+        with open(index_path(output_dir)) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def update_page_index(output_dir: str, exported: Iterable[Dict]) -> int:
+    """Merge notion_export.js results (pageId, pageName, files) into the index"""
+    index = load_page_index(output_dir)
+    root = Path(output_dir)
+    count = 0
+    for page in exported:
+        if not page.get('success') or not page.get('files'):
+            continue
+        files = page['files']
+        entries = [(page['pageId'], files[0]['path'], page.get('pageName'))]
+        # Child pages written as their own files are pages too
+        entries += [(f['childId'], f['path'], None) for f in files if f.get('type') == 'child' and f.get('childId')]
+        for page_id, file_path, title in entries:
+            rel = Path(os.path.relpath(file_path, root)).as_posix()
+            previous = index.get(clean_id(page_id), {})
+            index[clean_id(page_id)] = {'path': rel, 'title': title or previous.get('title')}
+            count += 1
+    tmp_file = index_path(output_dir).with_suffix('.tmp')
+    root.mkdir(parents=True, exist_ok=True)
+    with open(tmp_file, 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True, ensure_ascii=False)
+    os.replace(tmp_file, index_path(output_dir))
+    return count
+
+# ---------------------------------------------------------------------------
+# Rewriting
+# ---------------------------------------------------------------------------
+
+class LinkRewriter:
+    def __init__(self, output_dir: str):
+        self.output_dir = Path(output_dir)
+        self.index = {page_id: entry for page_id, entry in load_page_index(output_dir).items()
+                      if (self.output_dir / entry['path']).exists()}
+        self.stats = {'files': 0, 'rewritten_files': 0, 'links': 0, 'unresolved': 0}
+
+    def target(self, page_id: str, source: Path) -> Optional[str]:
+        entry = self.index.get(page_id)
+        if not entry:
+            self.stats['unresolved'] += 1
+            return None
+        self.stats['links'] += 1
+        return quote(Path(os.path.relpath(self.output_dir / entry['path'], source.parent)).as_posix())
+
+    def rewrite_line(self, line: str, source: Path) -> str:
+        def page_link(match):
+            label, url, title = match.groups()
+            page_id = notion_page_id(url)
+            rel = self.target(page_id, source) if page_id else None
+            return f"[{label}]({rel}{title})" if rel else match.group(0)
+
+        def placeholder(match):
+            page_id = clean_id(match.group(1))
+            rel = self.target(page_id, source)
+            if not rel:
+                return match.group(0)
+            label = (self.index[page_id].get('title') or page_id[:8]).replace(']', '\\]')
+            return f"[{label}]({rel})"
+
+        if 'notion.' in line:
+            line = PAGE_LINK_RE.sub(page_link, line)
+        if '[Page: ' in line:
+            line = PLACEHOLDER_RE.sub(placeholder, line)
+        return line
+
+    def rewrite_file(self, path: Path) -> bool:
+        text = path.read_text(encoding='utf-8')
+        self.stats['files'] += 1
+        if 'notion.' not in text and '[Page: ' not in text:
+            return False
+        out: List[str] = []
+        in_code = False
+        for line in text.splitlines(keepends=True):
+            if FENCE_RE.match(line):
+                in_code = not in_code
+            out.append(line if in_code else self.rewrite_line(line, path))
+        new_text = ''.join(out)
+        if new_text == text:
+            return False
+        with span(path.name, 'write', path=str(path)):
+            tmp_path = path.with_suffix('.md.tmp')
+            tmp_path.write_text(new_text, encoding='utf-8')
+            os.replace(tmp_path, path)
+        self.stats['rewritten_files'] += 1
+        return True
+
+    def rewrite(self, files: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Rewrite the given markdown files (default: every .md file in the output tree)"""
+        paths = (Path(f) for f in files) if files is not None else self.output_dir.rglob('*.md')
+        for path in paths:
+            if path.suffix == '.md' and path.is_file():
+                self.rewrite_file(path)
+        return self.stats
+
+def rewrite_links(output_dir: str, last_run: bool = False) -> Optional[Dict[str, int]]:
+    """Rewrite page links in the output tree (or only in the files of the last run)"""
+    if not index_path(output_dir).exists():
+        return None
+    files = None
+    if last_run:
+        manifest = load_manifest(output_dir) or {}
+        files = [f for page in manifest.get('pages', []) for f in page.get('files', [])]
+    with span('link_rewrite', 'post') as args:
+        stats = LinkRewriter(output_dir).rewrite(files)
+        args.update(stats)
+    return stats
+
+def print_stats(stats: Dict[str, int]) -> None:
+    print(f"🔗 Links: {stats['links']} page link(s) made relative in {stats['rewritten_files']} file(s) "
+          f"({stats['files']} scanned); {stats['unresolved']} point at pages that were not exported")
+
+def main():
+    parser = argparse.ArgumentParser(description='Rewrite links between exported pages into relative links')
+    parser.add_argument('files', nargs='*', help='Markdown files (default: the whole output tree)')
+    parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    parser.add_argument('--last-run', action='store_true', help='Only the files the last export run wrote')
+    args = parser.parse_args()
+
+    if not index_path(args.output).exists():
+        print(f"ℹ️  No page index ({PAGE_INDEX_FILENAME}) found. Run an export first.")
+        return 0
+    if args.files:
+        stats = LinkRewriter(args.output).rewrite(args.files)
+    else:
+        stats = rewrite_links(args.output, last_run=args.last_run)
+    print_stats(stats)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(traced_main('link_rewrite', main)())
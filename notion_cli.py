@@ -7,12 +7,25 @@ Unified command-line interface for all Notion export operations
 import os
 import sys
 import json
+import time
 import argparse
 import subprocess
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 
+from search_index import SearchIndex, INDEX_FILENAME
+from export_manifest import load_manifest
+from export_estimate import DEFAULT_RATE, DEFAULT_PAGE_TIMEOUT, estimate, print_estimate
+from export_schedule import add_arguments as add_schedule_arguments, parse_duration
+from page_graph import PageSelection, add_selection_arguments
+from profiling import NODE_SUBDIR, print_summary, run_profiled, start_run
+from tracing import traced_main
+
+# Written by export_all.js: page locations from the last full export and the change cursor
+LOCATIONS_FILENAME = '.page_locations.json'
+WATCH_STATE_FILENAME = '.watch_state.json'
+
 # Load environment variables
 load_dotenv()
 
@@ -77,7 +90,7 @@ def run_docker_command(cmd, timeout=300):
     
     try:
         result = subprocess.run(
-            full_cmd.split(),
+            docker_profile_args(full_cmd.split()),
             capture_output=True,
             text=True,
             timeout=timeout,
@@ -89,6 +102,39 @@ def run_docker_command(cmd, timeout=300):
     except Exception as e:
         return False, "", str(e)
 
+def container_path(run_dir):
+    """output/<kind>/<timestamp> as the container sees it (./output is /app/output)"""
+    return f"/app/output/{Path(run_dir).parent.name}/{Path(run_dir).name}"
+
+def docker_profile_args(parts):
+    """Hand an active profile (--profile) or trace (--trace) run to a `docker compose run` container
+
+    Python entry points profile themselves from PROFILE_DIR, and a bare `node`
+    command gets --cpu-prof; every process records its spans into TRACE_DIR.
+    """
+    profile_dir = os.getenv('PROFILE_DIR')
+    trace_dir = os.getenv('TRACE_DIR')
+    if not (profile_dir or trace_dir) or 'run' not in parts:
+        return parts
+    env = ['-e', f'TRACE_DIR={container_path(trace_dir)}'] if trace_dir else []
+    if profile_dir:
+        env += ['-e', f'PROFILE_DIR={container_path(profile_dir)}']
+    if profile_dir and os.getenv('PROFILE_HEAP_PAGES'):
+        env += ['-e', f"PROFILE_HEAP_PAGES={os.environ['PROFILE_HEAP_PAGES']}"]
+    run = parts.index('run') + 1
+    parts = parts[:run] + env + parts[run:]
+    if profile_dir and 'node' in parts:
+        node = parts.index('node') + 1
+        parts = parts[:node] + ['--cpu-prof', f'--cpu-prof-dir={container_path(profile_dir)}/{NODE_SUBDIR}'] + parts[node:]
+    return parts
+
+def format_bytes(size):
+    """Human-readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
 def save_export_metadata(output_dir, stats):
     """Save metadata about the export for tracking"""
     metadata_file = Path(output_dir) / '.export_metadata.json'
@@ -139,7 +185,7 @@ def cmd_scan(args):
     success, out, err = run_docker_command("run --rm notion-export python get_page_ids.py")
     
     if success:
-        print_success("Scan complete! Page IDs have been saved to .env")
+        print_success("Scan complete! Pages have been saved to output/.page_graph.sqlite")
     else:
         print_error(f"Scan failed: {err}")
         return 1
@@ -148,6 +194,11 @@ def cmd_scan(args):
 
 def cmd_export(args):
     """Export Notion pages to Markdown"""
+    dry_run = getattr(args, 'dry_run', False)
+    # A dry run without a fresh scan needs nothing but the files already in output/
+    if dry_run and not args.scan_first:
+        return cmd_plan(args)
+    
     print_header("📥 Exporting Notion to Markdown")
     
     if not check_config():
@@ -155,9 +206,22 @@ def cmd_export(args):
     
     start_time = datetime.now()
     output_dir = args.output or os.getenv('OUTPUT_DIR', './output')
+    # Scan and export at the same time instead of one after the other (see export_pipeline.py)
+    pipeline = getattr(args, 'pipeline', False) and not dry_run
+    if pipeline and getattr(args, 'resume', False):
+        print_error("--resume exports what a deadline left over; it cannot be combined with --pipeline")
+        return 1
+    try:
+        selection = PageSelection.from_args(args) if hasattr(args, 'only') else PageSelection()
+    except ValueError as e:
+        print_error(str(e))
+        return 1
+    if pipeline and selection:
+        print_error("--only/--subtree/--since select from a finished scan; they cannot be combined with --pipeline")
+        return 1
     
-    # Clean output if requested
-    if args.clean:
+    # Clean output if requested (never for a dry run: the estimate reads the last run's manifest)
+    if args.clean and not dry_run:
         print_warning(f"Cleaning output directory: {output_dir}")
         import shutil
         if Path(output_dir).exists():
@@ -170,7 +234,7 @@ def cmd_export(args):
         return 1
     
     # Scan first if requested
-    if args.scan_first:
+    if args.scan_first and not pipeline:
         print_info("Scanning for pages first...")
         success, _, err = run_docker_command("run --rm notion-export python get_page_ids.py")
         if not success:
@@ -179,24 +243,51 @@ def cmd_export(args):
         # Reload env to get new page IDs
         load_dotenv(override=True)
     
-    print_info("Exporting pages...")
-    success, out, err = run_docker_command("run --rm notion-export python export_notion.py", timeout=600)
+    if dry_run:
+        return cmd_plan(args)
+    
+    # Scheduling reaches the container through docker-compose.yml's environment
+    try:
+        deadline = parse_duration(getattr(args, 'deadline', None))
+    except ValueError as e:
+        print_error(str(e))
+        return 1
+    if deadline:
+        os.environ['EXPORT_DEADLINE'] = f"{deadline:.0f}"
+    if getattr(args, 'priority', None):
+        os.environ['EXPORT_PRIORITY'] = args.priority
+    # So does the selection (see page_graph.py)
+    if selection:
+        for name, value in (('EXPORT_ONLY', args.only), ('EXPORT_SUBTREE', args.subtree), ('EXPORT_SINCE', args.since)):
+            if value:
+                os.environ[name] = value
+        print_info(f"Selection: {selection.describe()}")
+    resume = ' --resume' if getattr(args, 'resume', False) else ''
+    mode = ' --pipeline' if pipeline else ''
+    
+    print_info("Scanning and exporting pages..." if pipeline else "Exporting pages...")
+    success, out, err = run_docker_command(f"run --rm notion-export python export_notion.py{mode}{resume}",
+                                           timeout=max(600, (deadline or 0) + 300))
+    if pipeline:
+        load_dotenv(override=True)
     
     duration = (datetime.now() - start_time).total_seconds()
     
     if success:
-        # Count exported files
-        md_files = list(Path(output_dir).rglob('*.md')) if Path(output_dir).exists() else []
+        # The exporter records what it actually wrote in the run manifest
+        totals = (load_manifest(output_dir) or {}).get('totals', {})
         stats = {
-            'pages': len(md_files),
-            'errors': 0,
+            'pages': totals.get('pages', 0),
+            'errors': totals.get('failed', 0),
             'duration': duration
         }
         
         # Save metadata
         metadata_file = save_export_metadata(output_dir, stats)
         
-        print_success(f"Export complete! {len(md_files)} files in {duration:.1f}s")
+        print_success(f"Export complete! {stats['pages']} pages, {totals.get('files', 0)} files in {duration:.1f}s")
+        if stats['errors']:
+            print_warning(f"{stats['errors']} page(s) failed - see 'python notion_cli.py status'")
         print_info(f"Output: {output_dir}/")
         print_info(f"Metadata: {metadata_file}")
     else:
@@ -215,6 +306,36 @@ def cmd_full(args):
     
     return cmd_export(args)
 
+def cmd_plan(args):
+    """Estimate requests, time and disk for a full export without running it"""
+    print_header("📐 Export Plan (dry run)")
+    output_dir = args.output or os.getenv('OUTPUT_DIR', './output')
+    result = estimate(output_dir,
+                      rate=getattr(args, 'rate', DEFAULT_RATE),
+                      page_timeout=getattr(args, 'page_timeout', DEFAULT_PAGE_TIMEOUT))
+    print_estimate(result, getattr(args, 'top', 10))
+    return 0 if result else 1
+
+def cmd_bench(args):
+    """Benchmark the scan and exporters against a local fake Notion API (no token needed)"""
+    print_header("⏱️  Offline Benchmark")
+    
+    print_info("Building Docker image...")
+    success, _, err = run_docker_command("build")
+    if not success:
+        print_error(f"Docker build failed: {err}")
+        return 1
+    
+    options = (f"--pages {args.pages} --depth {args.depth} --databases {args.databases} --rows {args.rows} "
+               f"--blocks {args.blocks} --latency {args.latency} --rps {args.rps} --stages {args.stages}")
+    print_info(f"Running benchmark ({args.stages})...")
+    success, out, err = run_docker_command(f"run --rm notion-export python bench.py {options}", timeout=3600)
+    print(out)
+    if not success:
+        print_error(f"Benchmark failed: {err.strip().splitlines()[-1] if err.strip() else 'see output above'}")
+        return 1
+    return 0
+
 def cmd_status(args):
     """Show export status and history"""
     print_header("📊 Export Status")
@@ -226,13 +347,38 @@ def cmd_status(args):
         print_warning("Output directory does not exist. Run an export first.")
         return 0
     
-    # Count files
-    md_files = list(Path(output_dir).rglob('*.md'))
-    folders = [d for d in Path(output_dir).iterdir() if d.is_dir()]
-    
     print(f"\n{Colors.CYAN}📁 Output Directory:{Colors.ENDC} {output_dir}")
-    print(f"{Colors.CYAN}📄 Markdown Files:{Colors.ENDC} {len(md_files)}")
-    print(f"{Colors.CYAN}📂 Folders:{Colors.ENDC} {len(folders)}")
+    
+    # Everything below comes from the last run's manifest, not a walk of the tree
+    manifest = load_manifest(output_dir)
+    if manifest:
+        totals = manifest.get('totals', {})
+        print(f"{Colors.CYAN}🧾 Last Run:{Colors.ENDC} {manifest.get('exporter')} at {manifest.get('finished_at')} "
+              f"({manifest.get('duration_seconds', 0):.1f}s)")
+        print(f"{Colors.CYAN}📄 Pages:{Colors.ENDC} {totals.get('pages', 0)} exported, {totals.get('failed', 0)} failed")
+        print(f"{Colors.CYAN}🗂️  Files:{Colors.ENDC} {totals.get('files', 0)} ({format_bytes(totals.get('bytes', 0))})")
+        api = manifest.get('api')
+        if api:
+            print(f"{Colors.CYAN}📡 API:{Colors.ENDC} {api.get('requests', 0)} requests, "
+                  f"{api.get('throttled', 0)} rate-limited, throttled for {api.get('throttle_seconds', 0):.1f}s")
+        
+        folders = manifest.get('folders', {})
+        if folders:
+            print(f"\n{Colors.CYAN}📂 By Folder:{Colors.ENDC}")
+            for name, folder in folders.items():
+                failed = f", {Colors.RED}{folder['failed']} failed{Colors.ENDC}" if folder.get('failed') else ""
+                print(f"   • {name}: {folder['pages']} pages, {folder['files']} files, "
+                      f"{format_bytes(folder['bytes'])}, {folder['seconds']:.1f}s{failed}")
+        
+        failures = manifest.get('failures', [])
+        if failures:
+            print(f"\n{Colors.RED}❌ Failed Pages:{Colors.ENDC}")
+            for failure in failures[:10]:
+                print(f"   • {failure['title']} ({failure['id'][:8]}...): {failure['error'].splitlines()[0][:100] if failure['error'] else ''}")
+            if len(failures) > 10:
+                print(f"   • ... and {len(failures) - 10} more")
+    else:
+        print_info("No run manifest found. Run an export to generate one.")
     
     if metadata_file.exists():
         with open(metadata_file) as f:
@@ -262,20 +408,114 @@ def cmd_clean(args):
     
     import shutil
     
-    # Count before cleaning
-    md_files = list(Path(output_dir).rglob('*.md'))
+    # Size of the last export, from its manifest (no tree walk)
+    totals = (load_manifest(output_dir) or {}).get('totals')
+    what = f"{totals['files']} exported files ({format_bytes(totals['bytes'])})" if totals else "all files"
     
     if not args.yes:
-        response = input(f"Delete {len(md_files)} files in {output_dir}? [y/N]: ")
+        response = input(f"Delete {what} in {output_dir}? [y/N]: ")
         if response.lower() != 'y':
             print_info("Cancelled.")
             return 0
     
     shutil.rmtree(output_dir)
-    print_success(f"Cleaned {len(md_files)} files from {output_dir}")
+    print_success(f"Cleaned {what} from {output_dir}")
     
     return 0
 
+def cmd_search(args):
+    """Search exported notes using the full-text index"""
+    output_dir = args.output or os.getenv('OUTPUT_DIR', './output')
+    
+    if not (Path(output_dir) / INDEX_FILENAME).exists():
+        print_warning("No search index found. Run an export first.")
+        return 1
+    
+    start_time = time.perf_counter()
+    with SearchIndex(output_dir) as index:
+        hits = index.search(args.query, database=args.db, limit=args.limit)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    
+    if not hits:
+        print_info(f"No matches for \"{args.query}\" ({elapsed_ms:.1f} ms)")
+        return 0
+    
+    for rank, hit in enumerate(hits, 1):
+        print(f"{Colors.BOLD}{rank:>2}. {hit['title']}{Colors.ENDC}  {Colors.CYAN}{hit['database'] or ''}{Colors.ENDC}")
+        print(f"    📄 {Path(output_dir) / hit['path']}")
+        if hit['snippet']:
+            print(f"    {' '.join(hit['snippet'].split())}")
+    
+    print(f"\n{Colors.GREEN}{len(hits)} result(s) in {elapsed_ms:.1f} ms{Colors.ENDC}")
+    return 0
+
+def load_watch_state(output_dir):
+    """Cursor and result of the last change scan, if any"""
+    state_file = Path(output_dir) / WATCH_STATE_FILENAME
+    try:
+        with open(state_file) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def cmd_watch(args):
+    """Poll Notion for edited pages and re-export only those"""
+    print_header("👀 Watching Notion for Changes")
+    
+    if not check_config():
+        return 1
+    
+    output_dir = args.output or os.getenv('OUTPUT_DIR', './output')
+    if not (Path(output_dir) / LOCATIONS_FILENAME).exists():
+        print_error("No previous full export found")
+        print_info("Run ./run.sh once; watch mode then keeps that export up to date")
+        return 1
+    
+    print_info("Building Docker image...")
+    success, _, err = run_docker_command("build")
+    if not success:
+        print_error(f"Docker build failed: {err}")
+        return 1
+    
+    state = load_watch_state(output_dir)
+    print_info(f"Watching for edits since {state.get('cursor') or 'the last export'} "
+               f"(every {args.interval}s, backing off to {args.max_interval}s when idle)")
+    
+    interval = args.interval
+    try:
+        while True:
+            success, out, err = run_docker_command("run --rm notion-export node export_all.js --changes", timeout=1800)
+            state = load_watch_state(output_dir)
+            stamp = datetime.now().strftime('%H:%M:%S')
+            
+            if not success:
+                last_line = (err or out or 'unknown error').strip().splitlines()[-1]
+                print_error(f"[{stamp}] Change scan failed: {last_line}")
+                interval = min(interval * 2, args.max_interval)
+            elif state.get('changed') or state.get('failed'):
+                print_success(f"[{stamp}] {state.get('changed', 0)} page(s) updated"
+                              + (f", {state['failed']} failed" if state.get('failed') else ""))
+                # Same post-export stages as run.sh, limited to what this cycle wrote
+                run_docker_command("run --rm notion-export python link_rewrite.py --last-run")
+                if os.getenv('DOWNLOAD_ATTACHMENTS', 'true').lower() == 'true':
+                    run_docker_command("run --rm notion-export python attachments.py", timeout=600)
+                if os.getenv('CORPUS_EXPORT', 'false').lower() == 'true':
+                    run_docker_command("run --rm notion-export python corpus_export.py")
+                run_docker_command("run --rm notion-export python search_index.py ingest")
+                interval = args.interval
+            else:
+                # Idle workspace: poll less often until something changes
+                interval = min(interval * 2, args.max_interval)
+                print(f"   [{stamp}] No changes")
+            
+            if args.once:
+                return 0 if success else 1
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print()
+        print_info("Stopped watching (the cursor is saved, so the next watch resumes from it)")
+        return 0
+
 def main():
     parser = argparse.ArgumentParser(
         description='Notion Export CLI - Export Notion pages to Markdown',
@@ -286,10 +526,26 @@ Examples:
   python notion_cli.py export            # Export pages to markdown
   python notion_cli.py full              # Scan + Export in one command
   python notion_cli.py full --clean      # Clean first, then scan + export
+  python notion_cli.py full --pipeline   # Export pages while the scan is still running
+  python notion_cli.py plan              # Estimate requests/time/disk before exporting
+  python notion_cli.py export --deadline 5m   # Newest edits first, stop after 5 minutes
+  python notion_cli.py export --resume   # Export what the deadline left over
+  python notion_cli.py export --only "4. Literature Review" --since 7d   # Just part of the scan
   python notion_cli.py status            # Show export status
   python notion_cli.py clean             # Clean output directory
+  python notion_cli.py search "bm25"     # Full-text search over exported notes
+  python notion_cli.py watch             # Keep the export in sync with Notion
+  python notion_cli.py bench             # Offline benchmark against a fake Notion API
+  python notion_cli.py --profile export  # Export and report the hot spots
+  python notion_cli.py --trace full      # Timeline of scan + export (chrome://tracing)
         """
     )
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile the run (cProfile + node --cpu-prof) into output/.profiles/')
+    parser.add_argument('--heap-snapshots', type=int, default=int(os.getenv('PROFILE_HEAP_SNAPSHOTS', '0')),
+                        metavar='N', help='With --profile: heap snapshot after the N largest pages of the last run')
+    parser.add_argument('--trace', action='store_true',
+                        help='Record a Chrome trace timeline of the run into output/.traces/')
     
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
     
@@ -301,11 +557,30 @@ Examples:
     export_parser.add_argument('--output', '-o', help='Output directory')
     export_parser.add_argument('--clean', '-c', action='store_true', help='Clean output before export')
     export_parser.add_argument('--scan-first', '-s', action='store_true', help='Scan for pages before export')
+    export_parser.add_argument('--dry-run', action='store_true', help='Estimate the export instead of running it')
+    export_parser.add_argument('--pipeline', '-p', action='store_true',
+                               help='Scan and export at the same time, pages in scan order (implies --scan-first)')
+    add_schedule_arguments(export_parser)
+    add_selection_arguments(export_parser)
     
     # Full command (scan + export)
     full_parser = subparsers.add_parser('full', help='Full workflow: scan + export')
     full_parser.add_argument('--output', '-o', help='Output directory')
     full_parser.add_argument('--clean', '-c', action='store_true', help='Clean output before export')
+    full_parser.add_argument('--dry-run', action='store_true', help='Scan, then estimate the export instead of running it')
+    full_parser.add_argument('--pipeline', '-p', action='store_true',
+                             help='Export pages while the scan is still finding them, in scan order')
+    add_schedule_arguments(full_parser)
+    add_selection_arguments(full_parser)
+    
+    # Plan command (dry-run cost estimate)
+    plan_parser = subparsers.add_parser('plan', help='Estimate API requests, time and disk for a full export')
+    plan_parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                             help=f'Sustained API requests per second (default: {DEFAULT_RATE:g})')
+    plan_parser.add_argument('--page-timeout', type=float, default=DEFAULT_PAGE_TIMEOUT,
+                             help=f'Flag pages slower than this many seconds (default: {DEFAULT_PAGE_TIMEOUT})')
+    plan_parser.add_argument('--top', type=int, default=10, help='How many of the slowest pages to list')
+    plan_parser.add_argument('--output', '-o', help='Output directory')
     
     # Status command
     status_parser = subparsers.add_parser('status', help='Show export status')
@@ -316,6 +591,33 @@ Examples:
     clean_parser.add_argument('--output', '-o', help='Output directory')
     clean_parser.add_argument('--yes', '-y', action='store_true', help='Skip confirmation')
     
+    # Search command
+    search_parser = subparsers.add_parser('search', help='Full-text search over exported notes')
+    search_parser.add_argument('query', help='Words or "quoted phrases" to search for (word* for prefix)')
+    search_parser.add_argument('--db', help='Only search pages from this database (name prefix)')
+    search_parser.add_argument('--limit', '-n', type=int, default=20, help='Maximum number of results')
+    search_parser.add_argument('--output', '-o', help='Output directory')
+    
+    # Watch command
+    watch_parser = subparsers.add_parser('watch', help='Re-export pages as they are edited')
+    watch_parser.add_argument('--interval', '-i', type=int, default=int(os.getenv('WATCH_INTERVAL', '60')),
+                              help='Seconds between checks (default: 60)')
+    watch_parser.add_argument('--max-interval', type=int, default=int(os.getenv('WATCH_MAX_INTERVAL', '900')),
+                              help='Longest wait when the workspace is idle (default: 900)')
+    watch_parser.add_argument('--once', action='store_true', help='Check once and exit (for cron)')
+    watch_parser.add_argument('--output', '-o', help='Output directory')
+    
+    # Bench command (offline, fake Notion API)
+    bench_parser = subparsers.add_parser('bench', help='Benchmark scan and exporters against a local fake Notion API')
+    bench_parser.add_argument('--pages', type=int, default=200, help='Regular pages in the synthetic workspace')
+    bench_parser.add_argument('--depth', type=int, default=3, help='Depth of the page tree')
+    bench_parser.add_argument('--databases', type=int, default=4, help='Databases')
+    bench_parser.add_argument('--rows', type=int, default=25, help='Rows per database')
+    bench_parser.add_argument('--blocks', type=int, default=40, help='Top-level blocks per page')
+    bench_parser.add_argument('--latency', type=int, default=0, help='Added latency per request in ms')
+    bench_parser.add_argument('--rps', type=float, default=0, help='Answer 429 above this many requests/s')
+    bench_parser.add_argument('--stages', default='scan,export,hierarchical,all', help='Stages to run')
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -326,11 +628,27 @@ Examples:
         'scan': cmd_scan,
         'export': cmd_export,
         'full': cmd_full,
+        'plan': cmd_plan,
         'status': cmd_status,
         'clean': cmd_clean,
+        'search': cmd_search,
+        'watch': cmd_watch,
+        'bench': cmd_bench,
     }
     
-    return commands[args.command](args)
+    # Docker runs always write to ./output, so profile and trace runs live there too
+    output_dir = str(Path(__file__).parent / 'output')
+    
+    def run():
+        if not args.profile:
+            return commands[args.command](args)
+        profile_dir = start_run(output_dir, args.heap_snapshots)
+        try:
+            return run_profiled('notion_cli', commands[args.command], args)
+        finally:
+            print_summary(profile_dir)
+    
+    return traced_main(f'notion_cli {args.command}', run, output_dir)()
 
 if __name__ == '__main__':
     sys.exit(main())
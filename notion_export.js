@@ -1,7 +1,8 @@
-const { Client } = require("@notionhq/client");
 const { NotionToMarkdown } = require("notion-to-md");
 const fs = require('fs').promises;
 const path = require('path');
+const { PageStreamer, tableRowHtml } = require('./notion_stream');
+const { createNotionClient, apiLimiter, relaunchProfiled, snapshotHeap, tracer, jsonLines } = require('./notion_utils');
 
 const args = process.argv.slice(2);
 const NOTION_TOKEN = args[0];
@@ -15,11 +16,18 @@ const DEBUG_TABLES =
   EXTRA_ARGS.includes('--debug-tables') ||
   EXTRA_ARGS.includes('--debug') ||
   EXTRA_ARGS.includes('true');
+// Stream blocks straight to disk (bounded memory); STREAM_EXPORT=false keeps the
+// old path that renders the whole page in memory first
+const STREAM_EXPORT = process.env.STREAM_EXPORT !== 'false' && !EXTRA_ARGS.includes('--buffered');
+// --plan <file>: run an export plan (export_plan.py) in this process, fetching each page once
+// (the plan lists the pages, so the page ids argument is just '-'); `--plan -` reads the
+// plan and then its nodes from stdin while the scan is still finding them (export_pipeline.py)
+const PLAN_FILE = EXTRA_ARGS.includes('--plan') ? EXTRA_ARGS[EXTRA_ARGS.indexOf('--plan') + 1] : null;
 
-const notion = new Client({
-  auth: NOTION_TOKEN,
-  notionVersion: '2025-09-03', 
-});
+// --profile: run again under the V8 CPU profiler (see profiling.py)
+relaunchProfiled(OUTPUT_DIR);
+
+const notion = createNotionClient(NOTION_TOKEN);
 
 const n2m = new NotionToMarkdown({ 
   notionClient: notion,
@@ -180,28 +188,15 @@ ${latexInner}
     const thead = hasColHeader ? norm[0] : null;
     const tbody = hasColHeader ? norm.slice(1) : norm;
   
-    let html = '\n<table>\n';
+    // Collect parts and join once; repeated += copies the growing string
+    const parts = ['\n<table>\n'];
     if (thead) {
-      html += '  <thead>\n    <tr>\n';
-      thead.forEach((c, j) => {
-        html += `      <th>${c}</th>\n`;
-      });
-      html += '    </tr>\n  </thead>\n';
+      parts.push('  <thead>\n', tableRowHtml(thead, { header: true }), '  </thead>\n');
     }
-    html += '  <tbody>\n';
-    tbody.forEach((r) => {
-      html += '    <tr>\n';
-      r.forEach((c, j) => {
-        if (hasRowHeader && j === 0) {
-          html += `      <th scope="row">${c}</th>\n`;
-        } else {
-          html += `      <td>${c}</td>\n`;
-        }
-      });
-      html += '    </tr>\n';
-    });
-    html += '  </tbody>\n</table>\n';
-    return html;
+    parts.push('  <tbody>\n');
+    tbody.forEach((r) => parts.push(tableRowHtml(r, { rowHeader: hasRowHeader })));
+    parts.push('  </tbody>\n</table>\n');
+    return parts.join('');
   });
   
   // Prevent row blocks from being rendered separately (avoid duplicates)
@@ -301,7 +296,117 @@ function sanitizeFilename(name) {
   return name.replace(/[^a-z0-9]/gi, '_').toLowerCase();
 }
 
+const streamer = new PageStreamer({
+  notion,
+  n2m,
+  renderCell: renderCellToHtml,
+  transform: processContent,
+  childPages: SEPARATE_CHILD_PAGES ? 'files' : 'inline',
+});
+
+async function streamSinglePage(pageId, { title = null, outputDir = OUTPUT_DIR } = {}) {
+  const pageName = title || await getPageTitle(pageId);
+  const sanitizedName = sanitizeFilename(pageName);
+  const outPath = path.join(outputDir, `${sanitizedName}.md`);
+  const childDir = SEPARATE_CHILD_PAGES ? path.join(outputDir, sanitizedName) : null;
+  
+  await fs.mkdir(outputDir, { recursive: true });
+  const files = await streamer.streamPage(pageId, outPath, { childDir });
+  console.error(`Exported: ${pageName}`);
+  return { success: true, pageId, pageName, directory: outputDir, files };
+}
+
+/**
+ * Run an export plan: every node is fetched and rendered once, and parents
+ * reuse their children's rendered output instead of fetching the subtree again
+ *
+ * Nodes run in plan order (export_schedule.py puts recent edits first). A
+ * parent reaching a child page that is a plan node but hasn't run yet renders
+ * it on the spot, so any order works. Nodes that already carry `rendered`
+ * output (a resumed remainder) are reused as is. Once plan.deadline (epoch
+ * ms) passes no new node starts; the ids left over are returned as remaining.
+ *
+ * With planFile '-' the plan (without nodes) is the first line on stdin and
+ * each following line is one more node, run as it arrives. The scan sends
+ * children before their parents, so parents still reuse their output.
+ */
+async function exportPlan(planFile) {
+  const lines = planFile === '-' ? jsonLines(process.stdin) : null;
+  const plan = lines ? (await lines.next()).value : JSON.parse(await fs.readFile(planFile, 'utf8'));
+  const rendered = new Map();
+  for (const [id, node] of Object.entries(plan.nodes)) {
+    if (!node.rendered) continue;
+    try {
+      await fs.access(node.rendered.path);
+      rendered.set(id, node.rendered);
+    } catch (e) {
+      // The earlier run's file is gone; render the node again if it's needed
+    }
+  }
+  const running = new Set();
+  const results = [];
+  // Cost of nested renders per level, so each page reports its own time, requests and blocks
+  const nested = [];
+  const usage = () => ({ ms: Date.now(), requests: apiLimiter.stats.requests, blocks: streamer.blocks });
+  
+  async function renderNode(id) {
+    if (rendered.has(id)) return rendered.get(id);
+    const node = plan.nodes[id];
+    if (!node || running.has(id)) return null;
+    running.add(id);
+    const start = usage();
+    nested.push({ ms: 0, requests: 0, blocks: 0 });
+    const span = tracer.begin(node.title || id, 'page', { id });
+    let output = null;
+    try {
+      const res = await streamSinglePage(id, { title: node.title, outputDir: node.output_dir });
+      output = { path: res.files[0].path, files: res.files };
+      results.push(res);
+    } catch (e) {
+      const msg = e && (e.stack || e.message) ? (e.stack || e.message) : String(e);
+      console.error(`Failed to export page ${id}: ${msg}`);
+      results.push({ success: false, pageId: id, error: msg });
+    }
+    const end = usage();
+    const inner = nested.pop();
+    const result = results[results.length - 1];
+    span.end({ success: result.success });
+    result.seconds = (end.ms - start.ms - inner.ms) / 1000;
+    result.requests = end.requests - start.requests - inner.requests;
+    result.blocks = end.blocks - start.blocks - inner.blocks;
+    if (nested.length) {
+      for (const key of ['ms', 'requests', 'blocks']) nested[nested.length - 1][key] += end[key] - start[key];
+    }
+    running.delete(id);
+    rendered.set(id, output);
+    snapshotHeap(id);
+    return output;
+  }
+  
+  streamer.renderedPage = (block) => renderNode(block.id.replace(/-/g, ''));
+  const remaining = [];
+  const runNode = async (id) => {
+    if (plan.deadline && Date.now() >= plan.deadline) {
+      if (!rendered.has(id)) remaining.push(id);
+      return;
+    }
+    await renderNode(id);
+  };
+  for (const id of plan.order) await runNode(id);
+  if (lines) {
+    for await (const node of lines) {
+      plan.nodes[node.id] = node;
+      plan.order.push(node.id);
+      await runNode(node.id);
+    }
+  }
+  if (remaining.length) console.error(`⏱️  Deadline reached, ${remaining.length} page(s) left for --resume`);
+  return { results, remaining };
+}
+
 async function exportSinglePage(pageId) {
+  if (STREAM_EXPORT) return streamSinglePage(pageId);
+  
   const pageName = await getPageTitle(pageId);
   const sanitizedName = sanitizeFilename(pageName);
   const files = [];
@@ -340,15 +445,16 @@ async function exportSinglePage(pageId) {
 (async () => {
   try {
     await fs.mkdir(OUTPUT_DIR, { recursive: true });
-    const pages = [];
-    let hadError = false;
+    const { results: pages, remaining } = PLAN_FILE ? await exportPlan(PLAN_FILE) : { results: [], remaining: [] };
+    let hadError = pages.some(p => !p.success);
 
-    for (const id of NOTION_PAGE_IDS) {
+    for (const id of PLAN_FILE ? [] : NOTION_PAGE_IDS) {
       const cleanId = id.trim().replace(/-/g, '');
       if (!cleanId) continue;
       try {
-        const res = await exportSinglePage(cleanId);
+        const res = await tracer.span(cleanId, 'page', () => exportSinglePage(cleanId), { id: cleanId });
         pages.push(res);
+        snapshotHeap(cleanId);
       } catch (e) {
         hadError = true;
         const msg = e && (e.stack || e.message) ? (e.stack || e.message) : String(e);
@@ -362,7 +468,10 @@ async function exportSinglePage(pageId) {
       success: !hadError,
       totalPages: pages.length,
       pages,
+      remaining,
+      api: apiLimiter.summary(),
     }));
+    apiLimiter.report();
 
     if (hadError) process.exitCode = 1;
   } catch (err) {
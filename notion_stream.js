@@ -0,0 +1,397 @@
+/**
+ * Streaming page writer
+ * Renders a page's blocks in document order and writes them straight to the
+ * output file, so memory stays bounded by one batch of children per nesting
+ * level instead of the whole block tree plus the full markdown string
+ */
+
+const fs = require('fs');
+const path = require('path');
+const readline = require('readline');
+const { tracer } = require('./notion_utils');
+
+// Blocks n2m separates with a single newline instead of a blank line
+const TIGHT_TYPES = new Set(['bulleted_list_item', 'numbered_list_item', 'to_do', 'quote']);
+// Containers whose children render at the container's own nesting level
+const FLAT_CONTAINERS = new Set(['synced_block', 'column_list', 'column']);
+// Blocks whose children are not part of this page's block tree
+const NO_PREFETCH = new Set(['child_page', 'child_database']);
+// Concurrent child-list prefetches per page (BLOCK_PREFETCH=0 fetches one level at a time)
+const PREFETCH_CONCURRENCY = Math.max(0, parseInt(process.env.BLOCK_PREFETCH ?? '8', 10) || 0);
+// Prefetched blocks held before prefetching pauses, so memory stays bounded on huge pages
+const PREFETCH_MAX_BLOCKS = 5000;
+// Blocks per blocks.children.list request (the API's maximum)
+const BATCH_SIZE = 100;
+
+/**
+ * Indent every line by `level` tabs (same as notion-to-md's addTabSpace)
+ */
+function indent(text, level) {
+  if (!level) return text;
+  const tabs = '\t'.repeat(level);
+  return tabs + text.split(/(?<=\n)/).join(tabs);
+}
+
+/**
+ * Page through a block's children one API batch (up to 100 blocks) at a time
+ */
+async function* iterateBatches(notion, blockId) {
+  let cursor = undefined;
+  do {
+    const resp = await notion.blocks.children.list({
+      block_id: blockId,
+      page_size: BATCH_SIZE,
+      start_cursor: cursor,
+    });
+    yield resp.results;
+    cursor = resp.has_more ? resp.next_cursor : undefined;
+  } while (cursor);
+}
+
+/**
+ * Page through a block's children one block at a time
+ */
+async function* iterateChildren(notion, blockId) {
+  for await (const batch of iterateBatches(notion, blockId)) yield* batch;
+}
+
+/**
+ * Fetches a page's block tree ahead of the renderer
+ *
+ * Every batch the renderer receives schedules the child lists of its blocks
+ * with has_children, and each prefetched list schedules its own children in
+ * turn, so a page costs about tree depth x RTT instead of one round-trip per
+ * nested block. At most `concurrency` lists are in flight (the shared rate
+ * limiter still caps actual requests), and prefetching pauses while
+ * `maxBlocks` blocks wait to be rendered or may still arrive: a list not yet
+ * fetched counts as one full batch until its blocks are in. Lists skipped
+ * then are fetched on demand as before.
+ */
+class BlockPrefetcher {
+  constructor(notion, { concurrency = PREFETCH_CONCURRENCY, maxBlocks = PREFETCH_MAX_BLOCKS } = {}) {
+    this.notion = notion;
+    this.concurrency = concurrency;
+    this.maxBlocks = maxBlocks;
+    this.jobs = new Map();  // blockId -> Promise<block[]>
+    this.cached = 0;
+    this.pending = 0;  // Scheduled lists still fetching (or waiting to)
+    this.active = 0;
+    this.waiting = [];
+  }
+
+  /**
+   * Children of blockId, from the prefetched list if there is one
+   */
+  async* children(blockId) {
+    const job = this.jobs.get(blockId);
+    if (job) {
+      this.jobs.delete(blockId);
+      const blocks = await job;
+      if (blocks) {
+        this.cached -= blocks.length;
+        yield* blocks;
+        return;
+      }
+      // The prefetch failed; fetch again on demand (and surface the error this time)
+    }
+    for await (const batch of iterateBatches(this.notion, blockId)) {
+      this.schedule(batch);
+      yield* batch;
+    }
+  }
+
+  schedule(blocks) {
+    if (!this.concurrency) return;
+    for (const block of blocks) {
+      if (!block.has_children || NO_PREFETCH.has(block.type) || this.jobs.has(block.id)) continue;
+      if (this.cached + this.pending * BATCH_SIZE >= this.maxBlocks) return;
+      this.pending++;
+      this.jobs.set(block.id, this.fetch(block.id));
+    }
+  }
+
+  async fetch(blockId) {
+    if (this.active >= this.concurrency) await new Promise(resolve => this.waiting.push(resolve));
+    this.active++;
+    const blocks = [];
+    try {
+      for await (const batch of iterateBatches(this.notion, blockId)) {
+        blocks.push(...batch);
+        this.cached += batch.length;
+      }
+      this.pending--;
+      this.schedule(blocks);
+      return blocks;
+    } catch (e) {
+      this.pending--;
+      this.cached -= blocks.length;
+      return null;
+    } finally {
+      this.active--;
+      const next = this.waiting.shift();
+      if (next) next();
+    }
+  }
+}
+
+/**
+ * Copy a file (copy-on-write clone where the filesystem supports it)
+ */
+async function copyOutput(src, dest) {
+  if (path.resolve(src) === path.resolve(dest)) return;
+  await fs.promises.copyFile(src, dest, fs.constants.COPYFILE_FICLONE);
+}
+
+/**
+ * One table row as HTML (shared by the streamed and buffered table renderers)
+ */
+function tableRowHtml(cells, { header = false, rowHeader = false } = {}) {
+  const out = ['    <tr>\n'];
+  cells.forEach((c, j) => {
+    if (header) out.push(`      <th>${c}</th>\n`);
+    else if (rowHeader && j === 0) out.push(`      <th scope="row">${c}</th>\n`);
+    else out.push(`      <td>${c}</td>\n`);
+  });
+  out.push('    </tr>\n');
+  return out.join('');
+}
+
+/**
+ * Write-stream wrapper that applies the markdown post-processing per chunk
+ *
+ * Blank-line runs are collapsed across chunk boundaries (at most one empty
+ * line), and writes wait for 'drain' so a slow disk applies back-pressure.
+ */
+class MarkdownFileWriter {
+  constructor(filePath, transform = (s) => s) {
+    this.filePath = filePath;
+    this.transform = transform;
+    this.stream = fs.createWriteStream(filePath, { encoding: 'utf8' });
+    this.trailingNewlines = 2;  // Swallow leading blank lines at the top of the file
+    this.bytes = 0;
+    this.error = null;
+    this.stream.on('error', (err) => { this.error = err; });
+    this.span = tracer.begin(path.basename(filePath), 'write', { path: filePath });
+  }
+
+  async write(chunk, { raw = false } = {}) {
+    if (this.error) throw this.error;
+    let text = raw ? String(chunk) : this.transform(String(chunk));
+    if (!text) return;
+
+    const leading = text.length - text.replace(/^\n+/, '').length;
+    const excess = Math.min(leading, this.trailingNewlines + leading - 2);
+    if (excess > 0) text = text.slice(excess);
+    if (!text) return;
+
+    const body = text.replace(/\n+$/, '');
+    this.trailingNewlines = body
+      ? text.length - body.length
+      : this.trailingNewlines + text.length;
+
+    this.bytes += Buffer.byteLength(text, 'utf8');
+    if (!this.stream.write(text)) {
+      await new Promise((resolve, reject) => {
+        const onError = (err) => reject(err);
+        this.stream.once('error', onError);
+        this.stream.once('drain', () => {
+          this.stream.removeListener('error', onError);
+          resolve();
+        });
+      });
+    }
+  }
+
+  async close() {
+    try {
+      await new Promise((resolve, reject) => {
+        this.stream.end((err) => (err || this.error ? reject(err || this.error) : resolve()));
+      });
+    } finally {
+      this.span.end({ bytes: this.bytes });
+    }
+    return this.filePath;
+  }
+}
+
+/**
+ * Streams Notion pages to markdown files block by block
+ *
+ * Blocks are rendered with n2m.blockToMarkdown, so custom transformers apply
+ * as usual, but without their children: those are streamed after the block,
+ * and tables row batch by row batch. childPages decides
+ * what happens to child_page blocks: 'files' writes each to its own file in
+ * childDir, 'inline' renders them in place under a heading, 'skip' drops
+ * them (for exporters that export every page separately anyway).
+ *
+ * renderedPage(block) may return an already exported page ({path, files});
+ * its output is then reused (copied, or spliced in for 'inline') instead of
+ * fetching the child's subtree again (see the export plan in notion_export.js).
+ *
+ * Nested children are prefetched concurrently, one BlockPrefetcher per page
+ * (ctx.prefetcher); `prefetch` sets how many child lists may be in flight per
+ * page, 0 turns it off.
+ */
+class PageStreamer {
+  constructor({ notion, n2m, renderCell, transform, childPages = 'files', renderedPage = null,
+                prefetch = PREFETCH_CONCURRENCY }) {
+    this.notion = notion;
+    this.prefetch = prefetch;
+    this.n2m = n2m;
+    this.renderCell = renderCell;
+    this.transform = transform || ((s) => s);
+    this.childPages = childPages;
+    this.renderedPage = renderedPage;
+    this.blocks = 0;
+  }
+
+  /**
+   * Stream a page into filePath; returns the files written ([{type, path, childId?}])
+   */
+  async streamPage(pageId, filePath, { header = '', childDir = null } = {}) {
+    const writer = new MarkdownFileWriter(filePath, this.transform);
+    const files = [{ type: 'single', path: filePath }];
+    try {
+      if (header) await writer.write(header);
+      await this.streamChildren(pageId, writer, 0, { files, childDir });
+    } finally {
+      await writer.close();
+    }
+    if (files.length > 1) files[0].type = 'parent';
+    return files;
+  }
+
+  async streamChildren(blockId, writer, level, ctx) {
+    if (!ctx.prefetcher) ctx.prefetcher = new BlockPrefetcher(this.notion, { concurrency: this.prefetch });
+    for await (const block of ctx.prefetcher.children(blockId)) {
+      await this.streamBlock(block, writer, level, ctx);
+    }
+  }
+
+  async streamBlock(block, writer, level, ctx) {
+    this.blocks++;
+
+    if (block.type === 'table') {
+      await this.streamTable(block, writer, ctx);
+      return;
+    }
+
+    if (block.type === 'child_page') {
+      await this.streamChildPage(block, writer, level, ctx);
+      return;
+    }
+
+    const hasChildren = block.has_children && block.type !== 'child_database';
+
+    if (block.type === 'toggle' && hasChildren) {
+      // The summary is the toggle's own text, as notion-to-md renders it
+      const summary = (block.toggle?.rich_text || []).map(t => t.plain_text).join('');
+      await writer.write(`<details>\n<summary>${summary}</summary>\n\n`);
+      await this.streamChildren(block.id, writer, 0, ctx);
+      await writer.write('\n</details>\n\n');
+      return;
+    }
+
+    // notion-to-md fetches and renders the children of callouts, columns and
+    // column lists itself, all in memory; they are streamed below instead, so
+    // it only gets to see the block's own content
+    const md = await this.n2m.blockToMarkdown(hasChildren ? { ...block, has_children: false } : block);
+
+    if (md) {
+      const text = indent(md, level);
+      await writer.write(TIGHT_TYPES.has(block.type) ? `${text}\n` : `\n${text}\n\n`);
+    }
+    if (hasChildren) {
+      const childLevel = FLAT_CONTAINERS.has(block.type) ? level : level + 1;
+      await this.streamChildren(block.id, writer, childLevel, ctx);
+    }
+  }
+
+  async streamChildPage(block, writer, level, ctx) {
+    const title = block.child_page?.title || 'Untitled';
+    if (this.childPages === 'skip') return;
+    const rendered = this.renderedPage ? await this.renderedPage(block) : null;
+    if (this.childPages === 'inline' || !ctx.childDir) {
+      await writer.write(`\n${indent(`## ${title}`, level)}\n\n`);
+      if (rendered) await this.spliceFile(rendered.path, writer, level);
+      else await this.streamChildren(block.id, writer, level, ctx);
+      return;
+    }
+
+    await fs.promises.mkdir(ctx.childDir, { recursive: true });
+    const safeTitle = title.replace(/[^a-z0-9]/gi, '_').toLowerCase();
+    const childPath = path.join(ctx.childDir, `${safeTitle}.md`);
+    if (rendered) {
+      // The child and everything it wrote land in this page's childDir, as if streamed here
+      await copyOutput(rendered.path, childPath);
+      ctx.files.push({ type: 'child', childId: block.id, path: childPath });
+      for (const file of rendered.files.filter(f => f.type === 'child')) {
+        const copyPath = path.join(ctx.childDir, path.basename(file.path));
+        await copyOutput(file.path, copyPath);
+        ctx.files.push({ ...file, path: copyPath });
+      }
+      return;
+    }
+    const childWriter = new MarkdownFileWriter(childPath, this.transform);
+    try {
+      await this.streamChildren(block.id, childWriter, 0, ctx);
+    } finally {
+      await childWriter.close();
+    }
+    ctx.files.push({ type: 'child', childId: block.id, path: childPath });
+  }
+
+  /**
+   * Write an already rendered file into this page line by line (it was
+   * transformed when it was written, so it goes in raw)
+   */
+  async spliceFile(filePath, writer, level) {
+    const lines = readline.createInterface({ input: fs.createReadStream(filePath, 'utf8'), crlfDelay: Infinity });
+    const tabs = '\t'.repeat(level);
+    for await (const line of lines) {
+      await writer.write(`${line ? tabs : ''}${line}\n`, { raw: true });
+    }
+  }
+
+  /**
+   * Emit a table as HTML while its rows are still being paged in
+   */
+  async streamTable(block, writer, ctx) {
+    const width = block.table?.table_width || 0;
+    const hasColHeader = !!block.table?.has_column_header;
+    const hasRowHeader = !!block.table?.has_row_header;
+    let rowIndex = 0;
+
+    for await (const row of ctx.prefetcher.children(block.id)) {
+      if (row.type !== 'table_row') continue;
+      this.blocks++;
+      const cells = (row.table_row?.cells || []).map((cell) => this.renderCell(cell));
+      while (cells.length < width) cells.push('');
+
+      const isHeader = hasColHeader && rowIndex === 0;
+      if (rowIndex === 0) {
+        await writer.write(isHeader ? '\n\n<table>\n  <thead>\n' : '\n\n<table>\n  <tbody>\n', { raw: true });
+      } else if (hasColHeader && rowIndex === 1) {
+        await writer.write('  <tbody>\n', { raw: true });
+      }
+      await writer.write(tableRowHtml(cells, { header: isHeader, rowHeader: hasRowHeader }), { raw: true });
+      if (isHeader) await writer.write('  </thead>\n', { raw: true });
+      rowIndex++;
+    }
+
+    if (rowIndex === 0) return;
+    if (hasColHeader && rowIndex === 1) await writer.write('  <tbody>\n', { raw: true });
+    await writer.write('  </tbody>\n</table>\n\n', { raw: true });
+  }
+}
+
+module.exports = {
+  indent,
+  iterateBatches,
+  iterateChildren,
+  copyOutput,
+  tableRowHtml,
+  MarkdownFileWriter,
+  BlockPrefetcher,
+  PageStreamer,
+};
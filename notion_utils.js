@@ -4,6 +4,12 @@
  */
 
 const { Client, APIErrorCode, isNotionClientError } = require("@notionhq/client");
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+const v8 = require('v8');
+const readline = require('readline');
+const { spawn, spawnSync } = require('child_process');
 
 // Configuration for Notion API 2025-09-03
 // See: https://developers.notion.com/reference/versioning
@@ -13,8 +19,25 @@ const CONFIG = {
   INITIAL_DELAY_MS: 1000,
   MAX_DELAY_MS: 30000,
   RATE_LIMIT_DELAY_MS: 100,
+  // Adaptive request limiter (see AdaptiveRateLimiter)
+  INITIAL_CONCURRENCY: parseInt(process.env.API_CONCURRENCY || '2', 10),
+  MAX_CONCURRENCY: parseInt(process.env.API_MAX_CONCURRENCY || '6', 10),
+  RATE_LIMIT_RETRIES: 8,
+  // Requests/s shared by every process using the same token (see SharedTokenBucket); 0 = off
+  API_RATE: parseFloat(process.env.API_RATE || '3'),
+  API_BURST: parseInt(process.env.API_BURST || '6', 10),
+  // Next to the scripts: the host's checkout, which Docker mounts at /app/host (see docker-compose.yml)
+  API_RATE_DIR: process.env.API_RATE_DIR || path.join(__dirname, '.rate_limit'),
+  ATTEMPT_TIMEOUT_MS: 60000,
+  // Covers queueing and Retry-After waits inside the limiter, not just one attempt
+  CLIENT_TIMEOUT_MS: 600000,
 };
 
+// Statuses the limiter retries itself (after Retry-After or backoff)
+const RETRY_STATUSES = new Set([429, 502, 503, 504]);
+// A bucket lock older than this was left by a process that died holding it
+const LOCK_STALE_MS = 1000;
+
 /**
  * Sleep for specified milliseconds
  */
@@ -30,6 +53,406 @@ function getBackoffDelay(attempt, initialDelay = CONFIG.INITIAL_DELAY_MS) {
   return Math.min(delay + jitter, CONFIG.MAX_DELAY_MS);
 }
 
+/**
+ * Milliseconds the server asked us to wait (Retry-After as seconds or HTTP date)
+ * Accepts a fetch Headers object or a plain header object; null when absent
+ */
+function retryAfterMs(headers) {
+  const value = typeof headers?.get === 'function' ? headers.get('retry-after') : headers?.['retry-after'];
+  if (value === null || value === undefined || value === '') return null;
+  const seconds = Number(value);
+  if (Number.isFinite(seconds)) return Math.max(0, seconds * 1000);
+  const date = Date.parse(value);
+  return Number.isNaN(date) ? null : Math.max(0, date - Date.now());
+}
+
+/**
+ * Chrome trace events (see tracing.py), recorded while TRACE_DIR is set
+ *
+ * Each process appends complete ('X') events to <TRACE_DIR>/<script>.<pid>.trace.jsonl;
+ * tracing.py merges the files of a run into one trace.json. Timestamps are
+ * wall-clock microseconds, so Python and Node events line up. Overlapping
+ * spans of one category get a row ("lane") each, so concurrency shows.
+ */
+const TRACE_CATEGORIES = ['process', 'page', 'request', 'throttle', 'write', 'post'];
+const NO_SPAN = { end() {} };
+
+class Tracer {
+  constructor() {
+    this.file = null;
+    this.events = [];
+    this.lanes = new Map();   // category -> lanes in use
+    this.named = new Set();   // tids with a thread_name event
+  }
+  
+  get enabled() {
+    return this.file !== null;
+  }
+  
+  start(traceDir, name = path.basename(process.argv[1] || 'node')) {
+    fs.mkdirSync(traceDir, { recursive: true });
+    this.file = path.join(traceDir, `${name}.${process.pid}.trace.jsonl`);
+    this.events.push({ name: 'process_name', ph: 'M', pid: process.pid, tid: 0, args: { name: `${name} (${process.pid})` } });
+    process.on('exit', () => this.flush());
+  }
+  
+  now() {
+    return Math.round((performance.timeOrigin + performance.now()) * 1000);
+  }
+  
+  // Start a span; the returned handle's end(args) records it
+  begin(name, cat, args = {}) {
+    if (!this.enabled) return NO_SPAN;
+    if (!this.lanes.has(cat)) this.lanes.set(cat, new Set());
+    const busy = this.lanes.get(cat);
+    let lane = 0;
+    while (busy.has(lane)) lane++;
+    busy.add(lane);
+    const tid = (TRACE_CATEGORIES.indexOf(cat) + 1) * 100 + lane;
+    if (!this.named.has(tid)) {
+      this.named.add(tid);
+      this.events.push({ name: 'thread_name', ph: 'M', pid: process.pid, tid, args: { name: `${cat} ${lane + 1}` } });
+    }
+    const ts = this.now();
+    return {
+      end: (extra = {}) => {
+        busy.delete(lane);
+        this.events.push({ name, cat, ph: 'X', ts, dur: this.now() - ts, pid: process.pid, tid, args: { ...args, ...extra } });
+        if (this.events.length >= 1000) this.flush();
+      }
+    };
+  }
+  
+  async span(name, cat, fn, args = {}) {
+    const span = this.begin(name, cat, args);
+    try {
+      return await fn();
+    } finally {
+      span.end();
+    }
+  }
+  
+  flush() {
+    if (!this.file || this.events.length === 0) return;
+    fs.appendFileSync(this.file, this.events.map(e => JSON.stringify(e) + '\n').join(''));
+    this.events = [];
+  }
+}
+
+// One tracer per process; child processes of a trace run inherit TRACE_DIR
+const tracer = new Tracer();
+if (process.env.TRACE_DIR) tracer.start(process.env.TRACE_DIR);
+
+// "GET blocks/<id>/children" -> name "GET blocks/children", args { id }
+function requestSpanName(url, method = 'GET') {
+  const segments = new URL(String(url)).pathname.split('/').filter(s => s && s !== 'v1');
+  const id = segments.find(s => /^[0-9a-f-]{32,36}$/i.test(s));
+  return { name: `${method} ${segments.filter(s => s !== id).join('/')}`, args: id ? { id: id.replace(/-/g, '') } : {} };
+}
+
+/**
+ * Token bucket shared by every process using the same integration token
+ *
+ * Notion's limit (about 3 requests/s on average, with short bursts) holds per
+ * integration, not per process. run.sh, notion_cli.py and the hierarchical
+ * exporter running side by side, or the Node subprocesses of one run, take
+ * their permits from one small state file in API_RATE_DIR, named by a hash of
+ * the token. A lock file created with O_EXCL guards each update; a lock left
+ * by a process that died is moved aside and only deleted if it is still the
+ * one that was found stale (see breakStaleLock). The state is
+ * the time the next permit is free: a permit is reserved even when the bucket
+ * is empty, so callers line up in arrival order and together send API_RATE
+ * requests/s after an API_BURST burst. A 429 in any process moves that time
+ * past its Retry-After, which pauses all of them.
+ */
+class SharedTokenBucket {
+  constructor(key, { rate = CONFIG.API_RATE, burst = CONFIG.API_BURST, dir = CONFIG.API_RATE_DIR } = {}) {
+    this.interval = 1000 / rate;
+    this.tolerance = (Math.max(1, burst) - 1) * this.interval;
+    this.file = path.join(dir, `${key}.json`);
+    this.lockFile = `${this.file}.lock`;
+    fs.mkdirSync(dir, { recursive: true });
+  }
+  
+  // Remove a lock that has been held too long, unless it changed hands meanwhile
+  breakStaleLock() {
+    let stale;
+    try {
+      stale = fs.statSync(this.lockFile);
+    } catch {
+      return;  // Released in the meantime
+    }
+    if (Date.now() - stale.mtimeMs <= LOCK_STALE_MS) return;
+    // Renaming is atomic, so only one process takes the lock away; it then
+    // checks that it took the stale lock and not one created since
+    const aside = `${this.lockFile}.${process.pid}.${Math.random().toString(36).slice(2)}`;
+    try {
+      fs.renameSync(this.lockFile, aside);
+    } catch {
+      return;  // Someone else broke or released it first
+    }
+    const taken = fs.statSync(aside);
+    if (taken.ino !== stale.ino || taken.mtimeMs !== stale.mtimeMs) {
+      // A fresh lock: give it back (fails only if yet another lock exists, which then stands)
+      try {
+        fs.linkSync(aside, this.lockFile);
+      } catch {
+        // Ignored, see above
+      }
+    }
+    fs.rmSync(aside, { force: true });
+  }
+  
+  // fn(next permit time) -> [new next permit time, result], under the lock
+  async update(fn) {
+    let lock;
+    for (;;) {
+      try {
+        const fd = fs.openSync(this.lockFile, 'wx');
+        lock = fs.fstatSync(fd).ino;
+        fs.closeSync(fd);
+        break;
+      } catch (error) {
+        if (error.code !== 'EEXIST') throw error;
+        this.breakStaleLock();
+        await delay(1 + Math.random() * 4);
+      }
+    }
+    try {
+      let next = 0;
+      try {
+        next = JSON.parse(fs.readFileSync(this.file, 'utf8')).next || 0;
+      } catch {
+        // No bucket yet (or a torn write): start full
+      }
+      const [updated, result] = fn(next, Date.now());
+      fs.writeFileSync(this.file, JSON.stringify({ next: updated }));
+      return result;
+    } finally {
+      // Only our own lock: if we were too slow, it may have been broken and taken by another process
+      try {
+        if (fs.statSync(this.lockFile).ino === lock) fs.rmSync(this.lockFile, { force: true });
+      } catch {
+        // Already gone
+      }
+    }
+  }
+  
+  // Reserve one permit; resolves to the milliseconds to wait before using it
+  take() {
+    return this.update((next, now) => {
+      const due = Math.max(next, now);
+      return [due + this.interval, Math.max(0, due - this.tolerance - now)];
+    });
+  }
+  
+  // No permits for anyone until `ms` from now, then the steady rate (no burst)
+  pause(ms) {
+    return this.update((next, now) => [Math.max(next, now + ms + this.tolerance), null]);
+  }
+}
+
+/**
+ * Adaptive request limiter shared by every Notion client in the process
+ *
+ * Plugged into the SDK as its fetch, so every call (including notion-to-md's)
+ * goes through it. 429 and 5xx-unavailable responses are retried after the
+ * server's Retry-After, or exponential backoff when there is none, and a 429
+ * pauses all callers until then. Requests in flight adapt AIMD-style: +1 per
+ * window of clean responses once callers fill it, halved on a 429 (the window
+ * has to be filled again after each cut), so concurrent callers settle
+ * just under the real limit. Time spent paused is reported as throttle time.
+ * Each request also takes a permit from the SharedTokenBucket of its token, so
+ * processes running at the same time stay under the limit together.
+ */
+class AdaptiveRateLimiter {
+  constructor({
+    initialConcurrency = CONFIG.INITIAL_CONCURRENCY,
+    maxConcurrency = CONFIG.MAX_CONCURRENCY,
+    maxRetries = CONFIG.RATE_LIMIT_RETRIES,
+    rate = CONFIG.API_RATE,
+    fetchImpl = (...args) => fetch(...args),
+  } = {}) {
+    this.limit = Math.max(1, Math.min(initialConcurrency, maxConcurrency));
+    this.maxConcurrency = Math.max(1, maxConcurrency);
+    this.maxRetries = maxRetries;
+    this.rate = rate;
+    this.buckets = new Map();
+    this.fetchImpl = fetchImpl;
+    this.active = 0;
+    this.waiting = [];
+    this.pausedUntil = 0;
+    this.lastCutAt = 0;
+    // Most requests in flight since the last 429 cut: the window actually filled at this limit
+    this.busiest = 0;
+    this.stats = { requests: 0, throttled: 0, unavailable: 0, retries: 0, throttleMs: 0, permitMs: 0, peakConcurrency: 0 };
+    this.fetch = this.fetch.bind(this);
+  }
+  
+  async acquire() {
+    for (;;) {
+      const pause = this.pausedUntil - Date.now();
+      if (pause > 0) {
+        await delay(pause);
+        continue;
+      }
+      if (this.active < Math.floor(this.limit)) break;
+      await new Promise(resolve => this.waiting.push(resolve));
+    }
+    this.active++;
+    this.busiest = Math.max(this.busiest, this.active);
+    this.stats.peakConcurrency = Math.max(this.stats.peakConcurrency, this.active);
+  }
+  
+  release() {
+    this.active--;
+    this.wake();
+  }
+  
+  wake() {
+    let free = Math.floor(this.limit) - this.active;
+    while (free-- > 0 && this.waiting.length) this.waiting.shift()();
+  }
+  
+  pause(ms) {
+    const now = Date.now();
+    const until = now + ms;
+    if (until <= this.pausedUntil) return;
+    this.stats.throttleMs += until - Math.max(now, this.pausedUntil);
+    this.pausedUntil = until;
+  }
+  
+  // The shared bucket of the token a request carries (null with API_RATE=0 or no token)
+  bucketFor(headers = {}) {
+    if (!(this.rate > 0)) return null;
+    const auth = typeof headers.get === 'function' ? headers.get('authorization') : headers.authorization || headers.Authorization;
+    if (!auth) return null;
+    const key = crypto.createHash('sha256').update(auth).digest('hex').slice(0, 16);
+    if (!this.buckets.has(key)) {
+      let bucket = null;
+      try {
+        bucket = new SharedTokenBucket(key, { rate: this.rate });
+      } catch (error) {
+        console.error(`⚠️  No shared rate limit (${error.message}): limiting this process only`);
+      }
+      this.buckets.set(key, bucket);
+    }
+    return this.buckets.get(key);
+  }
+  
+  // Wait for this request's permit from the shared bucket
+  async permit(bucket) {
+    let wait = 0;
+    try {
+      wait = await bucket.take();
+    } catch (error) {
+      console.error(`⚠️  Shared rate limit unavailable (${error.message}): limiting this process only`);
+      for (const [key, value] of this.buckets) if (value === bucket) this.buckets.set(key, null);
+      return;
+    }
+    if (wait <= 0) return;
+    this.stats.permitMs += wait;
+    const span = tracer.enabled ? tracer.begin('shared rate limit', 'throttle') : NO_SPAN;
+    await delay(wait);
+    span.end();
+  }
+  
+  async fetch(url, init = {}) {
+    const traced = tracer.enabled ? requestSpanName(url, init.method) : null;
+    for (let attempt = 0; ; attempt++) {
+      // Stalls behind a 429 pause or a full concurrency window show up in a trace
+      const stalled = traced && (this.pausedUntil > Date.now() || this.active >= Math.floor(this.limit));
+      const stall = stalled
+        ? tracer.begin(this.pausedUntil > Date.now() ? 'rate-limit pause' : 'concurrency limit', 'throttle')
+        : NO_SPAN;
+      await this.acquire();
+      stall.end();
+      const bucket = this.bucketFor(init.headers);
+      if (bucket) await this.permit(bucket);
+      const started = Date.now();
+      const request = traced ? tracer.begin(traced.name, 'request', { ...traced.args, attempt }) : NO_SPAN;
+      let response;
+      try {
+        this.stats.requests++;
+        response = await this.fetchImpl(url, {
+          ...init,
+          signal: init.signal || AbortSignal.timeout(CONFIG.ATTEMPT_TIMEOUT_MS),
+        });
+      } finally {
+        this.release();
+        request.end({ status: response ? response.status : 'error' });
+      }
+      
+      if (!RETRY_STATUSES.has(response.status)) {
+        // Additive increase: one more slot per `limit` clean responses, but only
+        // once callers have filled the current limit since the last cut
+        if (this.limit < this.maxConcurrency && this.busiest >= Math.floor(this.limit)) {
+          this.limit = Math.min(this.maxConcurrency, this.limit + 1 / Math.floor(this.limit));
+          this.wake();
+        }
+        return response;
+      }
+      
+      if (response.status === 429) {
+        this.stats.throttled++;
+        // Multiplicative decrease, once per burst: requests sent before the last
+        // cut were part of the burst that caused it
+        if (started >= this.lastCutAt) {
+          this.limit = Math.max(1, this.limit / 2);
+          this.lastCutAt = Date.now();
+          // The burst's own requests don't count towards climbing back
+          this.busiest = 0;
+        }
+      } else {
+        this.stats.unavailable++;
+      }
+      if (attempt >= this.maxRetries) return response;
+      
+      const wait = retryAfterMs(response.headers) ?? getBackoffDelay(attempt);
+      await response.arrayBuffer().catch(() => {});  // Free the connection
+      this.stats.retries++;
+      if (response.status !== 429) {
+        // Server trouble is per request: back off this one, don't stall the rest
+        await delay(wait);
+        continue;
+      }
+      if (this.pausedUntil < Date.now() + wait) {
+        console.error(`⏳ Rate limited: waiting ${(wait / 1000).toFixed(1)}s before retry ${attempt + 1}/${this.maxRetries}...`);
+      }
+      this.pause(wait);
+      if (bucket) await bucket.pause(wait).catch(() => {});
+    }
+  }
+  
+  summary() {
+    return {
+      requests: this.stats.requests,
+      throttled: this.stats.throttled,
+      unavailable: this.stats.unavailable,
+      retries: this.stats.retries,
+      throttle_seconds: Math.round(this.stats.throttleMs) / 1000,
+      permit_wait_seconds: Math.round(this.stats.permitMs) / 1000,
+      concurrency: Math.floor(this.limit),
+      peak_concurrency: this.stats.peakConcurrency,
+    };
+  }
+  
+  /**
+   * One-line report on stderr (stdout is reserved for JSON in some scripts)
+   */
+  report() {
+    const s = this.summary();
+    console.error(
+      `📡 API: ${s.requests} request(s), ${s.throttled} rate-limited, ${s.unavailable} unavailable; ` +
+      `throttled for ${s.throttle_seconds.toFixed(1)}s; concurrency ${s.concurrency} (peak ${s.peak_concurrency})` +
+      (s.permit_wait_seconds ? `; requests waited ${s.permit_wait_seconds.toFixed(1)}s in total for shared permits` : '')
+    );
+  }
+}
+
+// One limiter per process, so every client shares the same budget
+const apiLimiter = new AdaptiveRateLimiter();
+
 /**
  * Retry wrapper for Notion API calls
  * Handles rate limiting and transient errors
@@ -50,7 +473,7 @@ async function withRetry(fn, options = {}) {
       if (isNotionClientError(error)) {
         // Rate limited - wait and retry
         if (error.code === APIErrorCode.RateLimited) {
-          const waitTime = getBackoffDelay(attempt);
+          const waitTime = retryAfterMs(error.headers) ?? getBackoffDelay(attempt);
           console.error(`⏳ Rate limited on ${context}. Waiting ${Math.round(waitTime/1000)}s before retry ${attempt + 1}/${maxRetries}...`);
           await delay(waitTime);
           continue;
@@ -86,15 +509,153 @@ async function withRetry(fn, options = {}) {
 
 /**
  * Create a Notion client with proper configuration
+ * All requests go through the shared adaptive limiter unless another is given;
+ * NOTION_BASE_URL points it at another server (e.g. fake_notion.js for benchmarks)
  */
-function createNotionClient(auth) {
+function createNotionClient(auth, { limiter = apiLimiter, baseUrl = process.env.NOTION_BASE_URL } = {}) {
   return new Client({
     auth: auth,
     notionVersion: CONFIG.API_VERSION,
-    timeoutMs: 60000,
+    timeoutMs: CONFIG.CLIENT_TIMEOUT_MS,
+    fetch: limiter.fetch,
+    ...(baseUrl ? { baseUrl } : {}),
+  });
+}
+
+// Profiling (see profiling.py): set by a profiled parent process or by --profile
+const PROFILE_DIR = process.env.PROFILE_DIR || null;
+const HEAP_PAGES = new Set((process.env.PROFILE_HEAP_PAGES || '').split(',')
+  .map(id => id.trim().replace(/-/g, '')).filter(Boolean));
+
+/**
+ * `--profile`: re-run this script under the V8 CPU profiler and exit with its status
+ *
+ * The profile goes into PROFILE_DIR (or a new <outputDir>/.profiles/<timestamp>/);
+ * `python profiling.py` summarizes the hot spots. Without --profile this is a no-op.
+ */
+function relaunchProfiled(outputDir) {
+  if (!process.argv.includes('--profile')) return;
+  const stamp = new Date().toISOString().replace(/[-:]/g, '').replace('T', '-').slice(0, 15);
+  const profileDir = PROFILE_DIR || path.join(outputDir, '.profiles', stamp);
+  const nodeDir = path.join(profileDir, 'node');
+  fs.mkdirSync(nodeDir, { recursive: true });
+  const child = spawnSync(process.execPath, [
+    '--cpu-prof',
+    `--cpu-prof-dir=${nodeDir}`,
+    ...process.execArgv,
+    ...process.argv.slice(1).filter(arg => arg !== '--profile'),
+  ], { stdio: 'inherit', env: { ...process.env, PROFILE_DIR: profileDir } });
+  console.error(`📁 Profiles saved to: ${profileDir}/ (python profiling.py ${profileDir} for the hot spots)`);
+  process.exit(child.status ?? 1);
+}
+
+/**
+ * Write a heap snapshot after one of the pages listed in PROFILE_HEAP_PAGES
+ * (the largest pages of the last run); it shows what stays retained once the
+ * page is done. Returns the snapshot path, or null if the page isn't listed.
+ */
+function snapshotHeap(pageId) {
+  const id = String(pageId).replace(/-/g, '');
+  if (!PROFILE_DIR || !HEAP_PAGES.has(id)) return null;
+  const heapDir = path.join(PROFILE_DIR, 'heap');
+  fs.mkdirSync(heapDir, { recursive: true });
+  const file = v8.writeHeapSnapshot(path.join(heapDir, `${id}.${process.pid}.heapsnapshot`));
+  console.error(`🔬 Heap snapshot after ${id.slice(0, 8)}...: ${file}`);
+  return file;
+}
+
+/**
+ * `--trace`: record this script's spans into a new <outputDir>/.traces/<timestamp>/
+ * (unless a parent process already started a trace run) and merge them into
+ * trace.json on exit. Without --trace this is a no-op.
+ */
+function startTracing(outputDir) {
+  if (!process.argv.includes('--trace') || tracer.enabled) return;
+  const stamp = new Date().toISOString().replace(/[-:]/g, '').replace('T', '-').slice(0, 15);
+  const traceDir = path.join(outputDir, '.traces', stamp);
+  process.env.TRACE_DIR = traceDir;
+  tracer.start(traceDir);
+  process.on('exit', () => {
+    tracer.flush();
+    const events = fs.readdirSync(traceDir)
+      .filter(name => name.endsWith('.trace.jsonl'))
+      .flatMap(name => fs.readFileSync(path.join(traceDir, name), 'utf8').split('\n').filter(Boolean).map(line => JSON.parse(line)));
+    fs.writeFileSync(path.join(traceDir, 'trace.json'), JSON.stringify({ traceEvents: events, displayTimeUnit: 'ms' }));
+    console.error(`🧭 Trace saved to: ${path.join(traceDir, 'trace.json')} (open in chrome://tracing or ui.perfetto.dev)`);
   });
 }
 
+/**
+ * '90s', '5m', '1.5h' or plain seconds -> seconds (null when unset), like
+ * export_schedule.py's parse_duration
+ */
+function parseDuration(text) {
+  if (!text) return null;
+  const match = String(text).trim().toLowerCase().match(/^(\d+(?:\.\d+)?)\s*([smh]?)$/);
+  if (!match) throw new Error(`Invalid duration: ${text} (use e.g. 90s, 5m, 1h)`);
+  return parseFloat(match[1]) * { '': 1, s: 1, m: 60, h: 3600 }[match[2]];
+}
+
+/**
+ * Page ids to export: the scanned page graph (page_graph.py owns the SQLite
+ * file and streams one id per line), else NOTION_PAGE_IDS when nothing has
+ * been scanned into outputDir yet.
+ */
+async function loadPageIds(outputDir) {
+  const envIds = () => (process.env.NOTION_PAGE_IDS || process.env.NOTION_PAGE_ID || '')
+    .split(/[,\s]+/).map(id => id.trim()).filter(Boolean);
+  if (!fs.existsSync(path.join(outputDir, '.page_graph.sqlite'))) return envIds();
+  const lines = await readPageGraph(outputDir, 'ids');
+  if (lines) return lines;
+  console.error('⚠️  Could not read the page graph, falling back to NOTION_PAGE_IDS');
+  return envIds();
+}
+
+// Scan entries of the page graph (structure.json shape); `selection` is page_graph.py's
+// --only / --subtree / --since arguments
+async function loadGraphPages(outputDir, selection = []) {
+  const lines = await readPageGraph(outputDir, 'pages', selection);
+  if (!lines) throw new Error(`Could not read the page graph in ${outputDir} (run a scan first)`);
+  return lines.map(line => JSON.parse(line));
+}
+
+// Output lines of `python page_graph.py <command>`, or null without a readable graph
+async function readPageGraph(outputDir, command, args = []) {
+  if (!fs.existsSync(path.join(outputDir, '.page_graph.sqlite'))) return null;
+  const child = spawn(process.env.PYTHON || 'python', ['page_graph.py', command, '--output', outputDir, ...args],
+    { cwd: __dirname, stdio: ['ignore', 'pipe', 'inherit'] });
+  const exited = new Promise(resolve => {
+    child.on('error', () => resolve(1));
+    child.on('close', code => resolve(code));
+  });
+  const lines = [];
+  for await (const line of readline.createInterface({ input: child.stdout, crlfDelay: Infinity })) {
+    if (line.trim()) lines.push(line.trim());
+  }
+  return await exited === 0 ? lines : null;
+}
+
+/**
+ * One JSON object per line of a stream (e.g. scan batches on stdin from
+ * export_pipeline.py). Chunks are only read as fast as the caller consumes the
+ * objects, so a slow consumer holds the writer back instead of buffering
+ * everything it sends.
+ */
+async function* jsonLines(stream) {
+  stream.setEncoding('utf8');
+  let buffered = '';
+  for await (const chunk of stream) {
+    buffered += chunk;
+    let newline;
+    while ((newline = buffered.indexOf('\n')) !== -1) {
+      const line = buffered.slice(0, newline).trim();
+      buffered = buffered.slice(newline + 1);
+      if (line) yield JSON.parse(line);
+    }
+  }
+  if (buffered.trim()) yield JSON.parse(buffered);
+}
+
 /**
  * Sanitize a string for use as filename
  */
@@ -188,15 +749,107 @@ class ProgressTracker {
   }
 }
 
+/**
+ * Per-run export manifest (same format as export_manifest.py)
+ * Records pages, files, bytes, failures and timings per output folder
+ */
+class ExportManifest {
+  constructor(outputDir, exporter) {
+    this.outputDir = outputDir;
+    this.exporter = exporter;
+    this.startedAt = new Date();
+    this.pages = [];
+    this.api = null;  // Request/throttle stats (AdaptiveRateLimiter.summary())
+  }
+  
+  folderFor(filePath) {
+    const parts = path.relative(this.outputDir, filePath).split(path.sep);
+    return parts.length > 1 && parts[0] !== '..' ? parts[0] : '.';
+  }
+  
+  recordPage(pageId, title, files, seconds, { folder = null, error = null, blocks = null, requests = null } = {}) {
+    let bytes = 0;
+    for (const file of files) {
+      try {
+        bytes += fs.statSync(file).size;
+      } catch {
+        // File vanished or was never written; count it as zero bytes
+      }
+    }
+    const entry = {
+      id: pageId,
+      title,
+      folder: folder || (files.length ? this.folderFor(files[0]) : '.'),
+      files,
+      bytes,
+      seconds: Math.round(seconds * 1000) / 1000,
+    };
+    // Measured cost, used by the dry-run estimator (export_estimate.py)
+    if (blocks !== null) entry.blocks = blocks;
+    if (requests !== null) entry.requests = requests;
+    if (error) entry.error = String(error).substring(0, 500);
+    this.pages.push(entry);
+  }
+  
+  summary() {
+    const folders = {};
+    for (const page of this.pages) {
+      const stats = folders[page.folder] || (folders[page.folder] = { pages: 0, failed: 0, files: 0, bytes: 0, seconds: 0 });
+      if (page.error) stats.failed++;
+      else stats.pages++;
+      stats.files += page.files.length;
+      stats.bytes += page.bytes;
+      stats.seconds = Math.round((stats.seconds + page.seconds) * 1000) / 1000;
+    }
+    const sortedFolders = {};
+    for (const name of Object.keys(folders).sort()) sortedFolders[name] = folders[name];
+    const sum = (key) => Object.values(folders).reduce((acc, f) => acc + f[key], 0);
+    
+    return {
+      exporter: this.exporter,
+      started_at: this.startedAt.toISOString(),
+      finished_at: new Date().toISOString(),
+      duration_seconds: (Date.now() - this.startedAt.getTime()) / 1000,
+      totals: { pages: sum('pages'), failed: sum('failed'), files: sum('files'), bytes: sum('bytes') },
+      folders: sortedFolders,
+      failures: this.pages.filter(p => p.error).map(p => ({ id: p.id, title: p.title, error: p.error })),
+      ...(this.api ? { api: this.api } : {}),
+      pages: this.pages,
+    };
+  }
+  
+  save() {
+    fs.mkdirSync(this.outputDir, { recursive: true });
+    const manifestFile = path.join(this.outputDir, '.export_manifest.json');
+    const tmpFile = manifestFile.replace(/\.json$/, '.tmp');
+    fs.writeFileSync(tmpFile, JSON.stringify(this.summary(), null, 2), 'utf8');
+    fs.renameSync(tmpFile, manifestFile);
+    return manifestFile;
+  }
+}
+
 module.exports = {
   CONFIG,
   delay,
   getBackoffDelay,
+  retryAfterMs,
+  SharedTokenBucket,
+  AdaptiveRateLimiter,
+  apiLimiter,
   withRetry,
   createNotionClient,
+  relaunchProfiled,
+  snapshotHeap,
+  tracer,
+  startTracing,
+  parseDuration,
+  loadPageIds,
+  loadGraphPages,
+  jsonLines,
   sanitizeFilename,
   formatDate,
   getPageTitle,
   ProgressTracker,
+  ExportManifest,
 };
 
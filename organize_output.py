@@ -1,170 +1,278 @@
 #!/usr/bin/env python3
 """
 Organize the exported files into proper structure based on Notion hierarchy
+
+The layout is derived from the scan's structure data (structure.json written by
+get_page_ids.py / export_notion_hierarchical.py) rather than a hard-coded list.
+Pages are matched to their files by id through the exporters' page index
+(.page_index.json); a title only stands in when no other page shares it.
+Files are placed by hardlink (default), rename or symlink so reorganising costs
+no extra disk space; pass --mode copy to get an independent copy instead. An
+existing destination is never replaced: a second file for the same name gets
+a numbered one ("Template (2).md").
 """
 
 import os
+import re
+import sys
+import json
 import shutil
+import filecmp
+import argparse
 from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from link_rewrite import clean_id, load_page_index
+
+PLACEMENT_MODES = ('hardlink', 'rename', 'symlink', 'copy')
+
+def index_key(name: str) -> str:
+    """Normalise a file/dir name or page title to a lookup key
+
+    Exporters prefix files with a number ("03. Title.md") and strip characters
+    outside [a-zA-Z0-9 .-], so both sides are reduced to the same form.
+    """
+    key = name[:-3] if name.endswith('.md') else name
+    key = re.sub(r'^\d+(\.\d+)*\.\s+', '', key)
+    key = re.sub(r'[^a-zA-Z0-9 .-]', '', key)
+    return re.sub(r'\s+', ' ', key).strip().lower()
+
+def safe_name(title: str) -> str:
+    """Make a page title safe to use as a directory name (mirrors notion_utils.sanitizeFilename)"""
+    safe = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '', title)
+    return re.sub(r'\s+', ' ', safe).strip()[:100] or 'Untitled'
+
+def load_structure(structure_file: Path) -> List[Dict]:
+    """Load the scanned page list from structure.json"""
+    with open(structure_file) as f:
+        data = json.load(f)
+    return data.get('pages', [])
+
+def build_layout(pages: List[Dict]) -> Dict[str, Path]:
+    """Map each page's id to its relative destination directory
+
+    A page lives under its parent page's directory; database rows live in a
+    folder named after their database, inside the page that holds it. The
+    root page (level 0) is the top of the tree and gets no folder of its own.
+    """
+    by_id = {clean_id(page['id']): page for page in pages}
+    dirs: Dict[str, Path] = {}
+
+    def page_dir(page_id: str, seen=()) -> Path:
+        page = by_id.get(page_id)
+        if page is None or page.get('level', 0) == 0 or page_id in seen:
+            return Path()
+        if page_id in dirs:
+            return dirs[page_id]
+        if page.get('fromDatabase') and page.get('databaseTitle'):
+            container = page_dir(clean_id(page.get('databaseParent')), seen + (page_id,))
+            parent = container / safe_name(page['databaseTitle'])
+        else:
+            parent = page_dir(clean_id(page.get('parent')), seen + (page_id,))
+        dirs[page_id] = parent / safe_name(page.get('title', 'Untitled'))
+        return dirs[page_id]
+
+    return {page_id: page_dir(page_id).parent for page_id, page in by_id.items() if page.get('level', 0) != 0}
+
+def build_index(source_dir: Path) -> Dict[str, List[Path]]:
+    """Walk the export once and map index keys to the paths that carry them"""
+    index: Dict[str, List[Path]] = {}
+    for root, dirnames, filenames in os.walk(source_dir):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for name in dirnames + filenames:
+            index.setdefault(index_key(name), []).append(Path(root) / name)
+    return index
+
+def page_paths(source_dir: Path, pages: List[Dict], index: Dict[str, List[Path]]) -> Dict[str, List[Path]]:
+    """Map each page's id to the exported paths that are that page
+
+    The page index and paths recorded in the structure data identify a page's
+    file by id. Otherwise a title stands in, but only for a title no other
+    scanned page has; pages sharing a title are left where they are.
+    """
+    paths: Dict[str, List[Path]] = {}
+    for page_id, entry in load_page_index(str(source_dir)).items():
+        path = source_dir / entry.get('path', '')
+        if entry.get('path') and path.exists():
+            paths.setdefault(clean_id(page_id), []).append(path)
+    for page in pages:
+        path = Path(page['path']) if page.get('path') else None
+        if path and not path.is_absolute():
+            path = source_dir / path
+        if path and path.exists() and path not in paths.get(clean_id(page['id']), []):
+            paths.setdefault(clean_id(page['id']), []).append(path)
+
+    known = {path for page_files in paths.values() for path in page_files}
+    titles: Dict[str, List[str]] = {}
+    for page in pages:
+        titles.setdefault(index_key(page.get('title', '')), []).append(clean_id(page['id']))
+    shared = 0
+    for key, page_ids in titles.items():
+        missing = [page_id for page_id in page_ids if page_id not in paths]
+        candidates = [path for path in index.get(key, []) if path not in known]
+        if not key or not missing or not candidates:
+            continue
+        if len(page_ids) == 1:
+            paths[page_ids[0]] = candidates
+        else:
+            shared += len(missing)
+    if shared:
+        print(f"⚠️  {shared} page(s) share a title with another page and aren't in the page index; "
+              "they keep their place in the export")
+    return paths
 
-# Define the proper structure based on your Notion
-STRUCTURE = {
-    "Databases": {
-        "1. Activity Log (80+ Required)": [
-            "Abruptly Cancelled",
-            "Convert UKB PDFs to MD and JSON", 
-            "Convert UKB PDF to MD",
-            "Convert UKB PDF to MD error 2",
-            "Download More PDFs",
-            "Download PDFs",
-            "Extract DOI Numbers",
-            "Final PDF Collection",
-            "Project Notebook Discussion",
-            "normalisation",
-            "Run convert_pdfspy",
-            "Template"
-        ],
-        "2. Supervisor Meetings (10+ Required)": [
-            "Introduction and Research Proposal Discussion",
-            "RAG Discussion",
-            "Refocus Research Question",
-            "Hypothsis Validation Options"
-        ],
-        "3. Experiments & Validation (8+ Required)": [
-            "Benchmark Embedding Models for Phenotype Similarity",
-            "test"
-        ],
-        "4. Literature Review (30+ Papers)": [
-            "Contextual Word Embedding for Biomedical Knowledge Extraction",
-            "Retrieval-Augmented Generation for Knowledge-Intensive NLP Tasks",
-            "Survey of Vector Database Management Systems",
-            "UK Biobank An Open Access Resource",
-            "The Monarch Initiative Integrative Data Platform"
-        ],
-        "5. Issues & Debugging (15+ Required)": [
-            "Error",
-            "Metadata Correction",
-            "Metadata Correction Continued",
-            "Threadripper  AMD Trouble",
-            "Threadripper RAM Trouble Continued",
-            "UKB Source Metadata Infected"
-        ],
-        "6. Weekly Summaries (12+ Required)": [
-            "Week 1 - Project Setup"
-        ],
-        "7. Code Implementations (10+ Required)": [
-            "FAISS",
-            "LangChain", 
-            "LlamaIndex",
-            "Milvus",
-            "PyTorch",
-            "Transformers",
-            "Weaviate",
-            "RAG Pipeline Core"
-        ],
-        "8. System Architecture & Infrastructure": [
-            "Docker Extension",
-            "Python Runtime",
-            "RooCode Extension",
-            "Ubuntu Desktop",
-            "VS Code",
-            "Workstation 1 - Development",
-            "Workstation 2 - Testing",
-            "GPU - Workstation 1"
-        ],
-        "9. Prompts & Templates": [
-            "Synonym Generation Prompt for UK Biobank Fields",
-            "Synonym Generator Evaluation"
-        ]
-    },
-    "Research Pages": {
-        ".": [  # Direct children
-            "Project Overview",
-            "Research Methods", 
-            "Pipeline Architecture"
-        ],
-        "Journals": [
-            "Understanding MD Feature Extraction Journals",
-            "Field-Weighted XML Retrieval Based on BM25"
-        ]
-    },
-    "Progress Tracking": {
-        ".": []  # Add any progress tracking pages here
-    }
-}
-
-def organize_files():
+def free_dest(dest: Path, claimed: Set[Path]) -> Path:
+    """dest, or the first of 'Name (2)', 'Name (3)'... that is not taken"""
+    stem, suffix = (dest.stem, dest.suffix) if dest.suffix == '.md' else (dest.name, '')
+    candidate, number = dest, 1
+    while candidate in claimed or os.path.lexists(candidate):
+        number += 1
+        candidate = dest.with_name(f"{stem} ({number}){suffix}")
+    return candidate
+
+def already_placed_at(src: Path, dest: Path, mode: str) -> bool:
+    """Whether dest already is src (from an earlier run with the same mode)"""
+    if mode == 'symlink':
+        return dest.is_symlink() and dest.resolve() == src.resolve()
+    if not dest.is_file() or dest.is_symlink() or not src.is_file():
+        return False
+    if mode == 'copy':
+        return filecmp.cmp(src, dest, shallow=False)
+    return os.path.samefile(src, dest)
+
+def place(src: Path, dest: Path, mode: str, claimed: Set[Path]) -> Optional[Path]:
+    """Place a file or directory at dest using the chosen mode
+
+    Returns where it went -- dest, or a numbered name next to it when dest is
+    taken -- or None when an earlier run already put it there. Directories are
+    merged into an existing directory file by file under the same rule,
+    except with rename and symlink, which move or link them as a whole.
+    """
+    if already_placed_at(src, dest, mode):
+        claimed.add(dest)
+        return None
+    if src.is_dir() and mode in ('hardlink', 'copy') and (dest.is_dir() and not dest.is_symlink()):
+        for child in sorted(src.iterdir()):
+            place(child, dest / child.name, mode, claimed)
+        claimed.add(dest)
+        return dest
+    dest = free_dest(dest, claimed)
+    claimed.add(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if mode == 'rename':
+        os.rename(src, dest)
+    elif mode == 'symlink':
+        os.symlink(src.resolve(), dest, target_is_directory=src.is_dir())
+    elif mode == 'hardlink':
+        if src.is_dir():
+            dest.mkdir()
+            for child in sorted(src.iterdir()):
+                place(child, dest / child.name, mode, claimed)
+        else:
+            os.link(src, dest)
+    elif src.is_dir():
+        shutil.copytree(src, dest)
+    else:
+        shutil.copy2(src, dest)
+    return dest
+
+def organize_files(source_dir: Path = Path("output"),
+                   organized_dir: Path = Path("output_organized"),
+                   structure_file: Optional[Path] = None,
+                   mode: str = 'hardlink') -> bool:
     """Reorganize the output directory into proper structure"""
-    output_dir = Path("output")
-    
-    if not output_dir.exists():
+    if not source_dir.exists():
         print("❌ Output directory not found!")
-        return
-    
-    # Create new organized structure
-    organized_dir = Path("output_organized")
+        return False
+
+    structure_file = structure_file or source_dir / 'structure.json'
+    if not structure_file.exists():
+        print(f"❌ Structure data not found: {structure_file}")
+        print("   Run get_page_ids.py (or the hierarchical exporter) first")
+        return False
+
+    pages = load_structure(structure_file)
+    layout = build_layout(pages)
+    paths = page_paths(source_dir, pages, build_index(source_dir))
+
     organized_dir.mkdir(exist_ok=True)
-    
-    print("📁 Creating organized structure...")
-    
-    # Process each main section
-    for main_section, databases in STRUCTURE.items():
-        main_path = organized_dir / main_section
-        main_path.mkdir(exist_ok=True)
-        print(f"\n📂 {main_section}/")
-        
-        for db_name, pages in databases.items():
-            if db_name == ".":
-                # Direct children of the section
-                db_path = main_path
-            else:
-                db_path = main_path / db_name
-                db_path.mkdir(exist_ok=True)
-                print(f"  📁 {db_name}/")
-            
-            # Move matching pages
-            for page_name in pages:
-                # Try to find the page directory
-                for item in output_dir.iterdir():
-                    if item.is_dir() and item.name == page_name:
-                        # Copy the entire directory
-                        dest = db_path / page_name
-                        if item.exists():
-                            shutil.copytree(item, dest, dirs_exist_ok=True)
-                            print(f"    ✅ Moved: {page_name}")
-                        break
-    
-    # Copy any remaining files that weren't categorized
-    print("\n📋 Copying uncategorized files...")
-    for item in output_dir.iterdir():
-        if item.name not in ["output_organized"]:
-            dest = organized_dir / item.name
-            if not dest.exists():
-                if item.is_dir():
-                    shutil.copytree(item, dest, dirs_exist_ok=True)
-                else:
-                    shutil.copy2(item, dest)
-                print(f"  📄 {item.name}")
-    
-    print("\n✅ Organization complete! Check output_organized/ directory")
+    print(f"📁 Creating organized structure ({mode})...")
+
+    placed: set = set()
+    claimed: Set[Path] = set()
+    # Where each source folder's pages ended up, so leftovers can follow them
+    folder_dest: Dict[Path, Path] = {}
+
+    def already_placed(path: Path) -> bool:
+        return any(parent in placed for parent in path.parents)
+
+    def report(dest: Optional[Path], wanted: Path) -> None:
+        if dest is None:
+            print(f"    ✔️  {wanted.relative_to(organized_dir)} (already there)")
+        elif dest != wanted:
+            print(f"    ⚠️  {dest.relative_to(organized_dir)} ({wanted.name} was taken)")
+        else:
+            print(f"    ✅ {dest.relative_to(organized_dir)}")
+
+    # Place every path that belongs to a scanned page, shallowest first so
+    # a page directory carries its own contents along with it
+    matches = sorted(
+        ((path, layout[page_id]) for page_id, page_files in paths.items() if page_id in layout
+         for path in page_files),
+        key=lambda item: (len(item[0].parts), str(item[0]))
+    )
+    for path, rel_dir in matches:
+        if already_placed(path) or path in placed:
+            continue
+        dest = organized_dir / rel_dir / path.name
+        placed_at = place(path, dest, mode, claimed)
+        placed.add(path)
+        if path.parent != source_dir:
+            folder_dest.setdefault(path.parent, (placed_at or dest).parent)
+        report(placed_at, dest)
+
+    # Carry over anything the scan doesn't know about (overviews, INDEX.md...)
+    print("\n📋 Placing uncategorized files...")
+    for item in sorted(source_dir.iterdir()):
+        if item in placed or item.name.startswith('.') or not item.exists():
+            continue
+        if item.is_dir() and any(p.parent == item or item in p.parents for p in placed):
+            # Partially placed folder: only place what's left inside it
+            for leftover in sorted(item.rglob('*')):
+                if leftover.is_file() and leftover not in placed and not already_placed(leftover):
+                    target_dir = folder_dest.get(leftover.parent,
+                                                 organized_dir / leftover.parent.relative_to(source_dir))
+                    place(leftover, target_dir / leftover.name, mode, claimed)
+                    print(f"  📄 {leftover.relative_to(source_dir)}")
+            continue
+        place(item, organized_dir / item.name, mode, claimed)
+        print(f"  📄 {item.name}")
+
+    print(f"\n✅ Organization complete! Check {organized_dir}/ directory")
     print("\n📊 Structure created:")
-    print("output_organized/")
-    print("├── Databases/")
-    print("│   ├── 1. Activity Log (80+ Required)/")
-    print("│   ├── 2. Supervisor Meetings (10+ Required)/")
-    print("│   ├── 3. Experiments & Validation (8+ Required)/")
-    print("│   ├── 4. Literature Review (30+ Papers)/")
-    print("│   ├── 5. Issues & Debugging (15+ Required)/")
-    print("│   ├── 6. Weekly Summaries (12+ Required)/")
-    print("│   ├── 7. Code Implementations (10+ Required)/")
-    print("│   ├── 8. System Architecture & Infrastructure/")
-    print("│   └── 9. Prompts & Templates/")
-    print("├── Research Pages/")
-    print("│   ├── Project Overview/")
-    print("│   ├── Research Methods/")
-    print("│   ├── Pipeline Architecture/")
-    print("│   └── Journals/")
-    print("└── Progress Tracking/")
+    print(f"{organized_dir}/")
+    top_level = sorted(d.name for d in organized_dir.iterdir() if d.is_dir())
+    for i, name in enumerate(top_level):
+        branch = "└──" if i == len(top_level) - 1 else "├──"
+        print(f"{branch} {name}/")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Organize exported Notion pages into their Notion hierarchy')
+    parser.add_argument('--source', default='output', help='Exported output directory')
+    parser.add_argument('--dest', default='output_organized', help='Organized output directory')
+    parser.add_argument('--structure', help='Scan structure JSON (default: <source>/structure.json)')
+    parser.add_argument('--mode', choices=PLACEMENT_MODES, default='hardlink',
+                        help='How to place files (default: hardlink; copy uses extra disk space)')
+    args = parser.parse_args()
+
+    success = organize_files(
+        Path(args.source),
+        Path(args.dest),
+        Path(args.structure) if args.structure else None,
+        args.mode
+    )
+    sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
-    organize_files()
\ No newline at end of file
+    main()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Page graph store
+The scan's pages (ids, parents, titles, levels, database membership, edit
+times) in one SQLite file, output/.page_graph.sqlite. Every stage reads its page
+list from here instead of a comma-joined NOTION_PAGE_IDS, which runs into
+environment and argv size limits on large workspaces; found_page_ids.txt and
+the .env line are optional views of it (ID_VIEWS).
+
+Node scripts stream from it through this module's CLI:
+
+    python page_graph.py ids       # One page id per line, in scan order
+    python page_graph.py pages     # One JSON page per line (structure.json shape)
+    python page_graph.py stats     # Counts and scan metadata
+
+A selection narrows ids/pages to part of the graph (see PageSelection):
+
+    python page_graph.py ids --only "4. Literature Review" --since 7d
+    python page_graph.py ids --shards 4 --shard-index 0   # One shard of it (export_shards.py)
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+GRAPH_FILENAME = '.page_graph.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    parent TEXT,
+    title TEXT,
+    level INTEGER,
+    last_edited TEXT,
+    from_database INTEGER NOT NULL DEFAULT 0,
+    data_source_id TEXT,
+    database_title TEXT,
+    database_parent TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_position ON pages(position);
+CREATE INDEX IF NOT EXISTS pages_parent ON pages(parent);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns <-> keys of a scan entry (get_page_ids.js / structure.json)
+FIELDS = {
+    'parent': 'parent',
+    'title': 'title',
+    'level': 'level',
+    'last_edited': 'lastEdited',
+    'data_source_id': 'dataSourceId',
+    'database_title': 'databaseTitle',
+    'database_parent': 'databaseParent',
+}
+# Scan result keys kept as metadata
+META_KEYS = ('parentPage', 'recursive', 'scanMode', 'highWaterMark')
+
+def graph_path(output_dir: str) -> Path:
+    return Path(output_dir) / GRAPH_FILENAME
+
+class PageGraph:
+    """The scanned page graph of one output directory"""
+
+    def __init__(self, output_dir: str):
+        self.path = graph_path(output_dir)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def connect(self) -> sqlite3.Connection:
+        """Read-only connection (the graph is only ever replaced as a whole)"""
+        return sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+
+    def replace(self, scan: Dict) -> int:
+        """Store a scan result (replacing the previous one) in one transaction"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.unlink(missing_ok=True)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.executescript(SCHEMA)
+            rows = (
+                (page['id'], position, *(page.get(key) for key in FIELDS.values()), int(bool(page.get('fromDatabase'))))
+                for position, page in enumerate(scan.get('pages', []))
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO pages (id, position, {', '.join(FIELDS)}, from_database) "
+                f"VALUES (?, ?, {', '.join('?' for _ in FIELDS)}, ?)",
+                rows,
+            )
+            meta = {key: scan.get(key) for key in META_KEYS}
+            meta['scannedAt'] = datetime.now(timezone.utc).isoformat()
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             [(key, json.dumps(value)) for key, value in meta.items()])
+            conn.commit()
+            count = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        finally:
+            conn.close()
+        # Readers never see a half-written graph
+        os.replace(tmp_path, self.path)
+        return count
+
+    def pages(self) -> Iterator[Dict]:
+        """Pages in scan order (parents before their children), as scan entries"""
+        if not self.exists():
+            return
+        conn = self.connect()
+        try:
+            cursor = conn.execute(
+                f"SELECT id, {', '.join(FIELDS)}, from_database FROM pages ORDER BY position")
+            for row in cursor:
+                page = {'id': row[0]}
+                for key, value in zip(FIELDS.values(), row[1:-1]):
+                    if value is not None or key in ('parent', 'lastEdited'):
+                        page[key] = value
+                if row[-1]:
+                    page['fromDatabase'] = True
+                yield page
+        finally:
+            conn.close()
+
+    def ids(self) -> Iterator[str]:
+        if not self.exists():
+            return
+        conn = self.connect()
+        try:
+            for (page_id,) in conn.execute("SELECT id FROM pages ORDER BY position"):
+                yield page_id
+        finally:
+            conn.close()
+
+    def meta(self) -> Dict:
+        if not self.exists():
+            return {}
+        conn = self.connect()
+        try:
+            return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+        finally:
+            conn.close()
+
+    def age(self) -> Optional[float]:
+        """Seconds since the stored scan was taken (None if unknown)"""
+        try:
+            scanned = datetime.fromisoformat(self.meta().get('scannedAt') or '')
+        except ValueError:
+            return None
+        return (datetime.now(timezone.utc) - scanned).total_seconds()
+
+    def stats(self) -> Dict:
+        if not self.exists():
+            return {'pages': 0}
+        conn = self.connect()
+        try:
+            pages, rows, databases = conn.execute(
+                "SELECT COUNT(*), SUM(from_database), COUNT(DISTINCT data_source_id) FROM pages").fetchone()
+        finally:
+            conn.close()
+        return {'pages': pages, 'database_rows': rows or 0, 'data_sources': databases, **self.meta()}
+
+# ---------------------------------------------------------------------------
+# Selective exports
+# ---------------------------------------------------------------------------
+
+AGE_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def clean_id(page_id: Optional[str]) -> str:
+    return (page_id or '').replace('-', '').lower()
+
+def split_list(text: Optional[str]) -> List[str]:
+    """'a, b' -> ['a', 'b'] (EXPORT_ONLY / --only and friends)"""
+    return [item.strip() for item in (text or '').split(',') if item.strip()]
+
+def parse_since(text: Optional[str]) -> Optional[datetime]:
+    """'2025-01-31', an ISO timestamp, or an age like '7d' / '12h' -> UTC datetime"""
+    if not text:
+        return None
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([mhdw])\s*', text.lower())
+    if match:
+        return datetime.now(timezone.utc) - timedelta(seconds=float(match.group(1)) * AGE_UNITS[match.group(2)])
+    try:
+        since = datetime.fromisoformat(text.strip())
+    except ValueError:
+        raise ValueError(f"Invalid --since: {text!r} (use e.g. 2025-01-31, 2025-01-31T09:00 or 7d)")
+    return since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+
+class PageSelection:
+    """Part of the page graph to export instead of all of it
+
+    only: pages and databases by title or id (a database selects its rows).
+    A title that no page has exactly selects the titles it begins, like
+    `search --db`. subtree: the same, plus everything below them (child
+    pages, databases inside pages and their rows). since: pages edited at or
+    after a date. A title or id that selects nothing is an error (ValueError).
+    Entries of one filter add up; the filters given narrow each other down.
+    shards/shard_index: then keep one of `shards` parts of what is left (see shard).
+    """
+
+    def __init__(self, only: Iterable[str] = (), subtree: Iterable[str] = (), since: Optional[str] = None,
+                 shards: int = 1, shard_index: int = 0):
+        self.only = list(only)
+        self.subtree = list(subtree)
+        self.since_text = since or None
+        self.since = parse_since(since)
+        if shards < 1 or not 0 <= shard_index < shards:
+            raise ValueError(f"Invalid shard {shard_index} of {shards} (--shard-index counts from 0)")
+        self.shards = shards
+        self.shard_index = shard_index
+
+    def __bool__(self) -> bool:
+        return bool(self.only or self.subtree or self.since or self.shards > 1)
+
+    @staticmethod
+    def names(page: Dict) -> Tuple[set, set]:
+        """Clean ids and lower-cased titles of the page itself and, for a row, of its database"""
+        ids = {clean_id(page['id'])}
+        titles = {(page.get('title') or '').lower()}
+        if page.get('fromDatabase'):
+            ids |= {clean_id(page.get('parent')), clean_id(page.get('dataSourceId'))}
+            titles.add((page.get('databaseTitle') or '').lower())
+        return ids, titles - {''}
+
+    @classmethod
+    def matches(cls, page: Dict, keys: set) -> bool:
+        """The page itself, or its database, is named by one of keys (see resolve)"""
+        ids, titles = cls.names(page)
+        return bool((ids | titles) & keys)
+
+    @classmethod
+    def resolve(cls, selectors: List[str], pages: List[Dict]) -> Tuple[set, List[str]]:
+        """The exact ids and titles selectors name, and the selectors that name nothing
+
+        A selector is an id or a title (any case). A title no page has exactly
+        stands for every title it begins ("4. Literature Review" for
+        "4. Literature Review (30+ Papers)").
+        """
+        all_ids, all_titles = set(), set()
+        for page in pages:
+            ids, titles = cls.names(page)
+            all_ids |= ids
+            all_titles |= titles
+        keys, unmatched = set(), []
+        for selector in selectors:
+            key = selector.strip().lower()
+            if clean_id(key) in all_ids or key in all_titles:
+                keys |= {clean_id(key), key}
+                continue
+            prefixed = {title for title in all_titles if title.startswith(key)}
+            if prefixed:
+                keys |= prefixed
+            else:
+                unmatched.append(selector)
+        return keys, unmatched
+
+    def edited_since(self, page: Dict) -> bool:
+        try:
+            edited = datetime.fromisoformat(page.get('lastEdited') or '')
+        except ValueError:
+            return False
+        return (edited if edited.tzinfo else edited.replace(tzinfo=timezone.utc)) >= self.since
+
+    def apply(self, pages: Iterable[Dict]) -> Iterator[Dict]:
+        """The selected pages, in the order given (scan order: parents before children)"""
+        if self.shards == 1:
+            return self.matching(pages)
+        pages = list(pages)
+        return iter(self.shard(pages, list(self.matching(pages))))
+
+    def matching(self, pages: Iterable[Dict]) -> Iterator[Dict]:
+        """Pages that pass --only / --subtree / --since (raises ValueError for a selector naming nothing)"""
+        if not (self.only or self.subtree):
+            return self.filter(pages, set(), set())
+        pages = list(pages)
+        only, unmatched_only = self.resolve(self.only, pages)
+        roots, unmatched_subtree = self.resolve(self.subtree, pages)
+        unmatched = ([f"--only {s!r}" for s in unmatched_only] +
+                     [f"--subtree {s!r}" for s in unmatched_subtree])
+        if unmatched:
+            raise ValueError(f"Nothing in the scan matches {', '.join(unmatched)}")
+        return self.filter(pages, only, roots)
+
+    def filter(self, pages: Iterable[Dict], only: set, roots: set) -> Iterator[Dict]:
+        inside = set()  # Clean ids of selected subtree pages and of databases inside them
+        for page in pages:
+            page_id = clean_id(page['id'])
+            if self.subtree:
+                above = {clean_id(page.get('parent')), clean_id(page.get('databaseParent'))}
+                if self.matches(page, roots) or above & inside:
+                    inside.add(page_id)
+                    if page.get('fromDatabase'):
+                        inside.add(clean_id(page.get('parent')))
+                else:
+                    continue
+            if self.only and not self.matches(page, only):
+                continue
+            if self.since and not self.edited_since(page):
+                continue
+            yield page
+
+    def shard(self, pages: List[Dict], selected: List[Dict]) -> List[Dict]:
+        """This shard's part of `selected` (all of `pages` places them in the tree)
+
+        A database's rows and a top-level page's subtree always stay together, so
+        every shard numbers its database rows as a full export would. The units
+        go, largest first, to the shard with the fewest pages so far; the split
+        depends only on the graph, so every shard computes the same one.
+        """
+        by_id = {clean_id(page['id']): page for page in pages}
+        units: Dict[str, int] = {}
+        keys = []
+        for page in selected:
+            key = shard_unit(page, by_id)
+            keys.append(key)
+            units[key] = units.get(key, 0) + 1
+        loads = [0] * self.shards
+        mine = set()
+        for key in sorted(units, key=lambda k: (-units[k], k)):
+            target = loads.index(min(loads))
+            loads[target] += units[key]
+            if target == self.shard_index:
+                mine.add(key)
+        return [page for page, key in zip(selected, keys) if key in mine]
+
+    def cli_args(self) -> List[str]:
+        """The same selection as page_graph.py / export_all.js arguments"""
+        args = []
+        if self.only:
+            args += ['--only', ','.join(self.only)]
+        if self.subtree:
+            args += ['--subtree', ','.join(self.subtree)]
+        if self.since_text:
+            args += ['--since', self.since_text]
+        return args
+
+    def describe(self) -> str:
+        parts = []
+        if self.only:
+            parts.append(f"only {', '.join(self.only)}")
+        if self.subtree:
+            parts.append(f"subtree of {', '.join(self.subtree)}")
+        if self.since:
+            parts.append(f"edited since {self.since.isoformat(timespec='minutes')}")
+        if self.shards > 1:
+            parts.append(f"shard {self.shard_index} (of {self.shards})")
+        return '; '.join(parts) or 'everything'
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> 'PageSelection':
+        shards = getattr(args, 'shards', None) or 1
+        shard_index = getattr(args, 'shard_index', None)
+        if shards > 1 and shard_index is None:
+            raise ValueError('--shards needs --shard-index (which shard to export, from 0)')
+        return cls(split_list(args.only), split_list(args.subtree), args.since, shards, shard_index or 0)
+
+def shard_unit(page: Dict, by_id: Dict[str, Dict]) -> str:
+    """What a page is sharded with: its data source's rows, or the subtree of its top-level page"""
+    if page.get('fromDatabase'):
+        return 'database:' + clean_id(page.get('dataSourceId') or page.get('parent'))
+    while (page.get('level') or 0) > 1 and clean_id(page.get('parent')) in by_id:
+        page = by_id[clean_id(page.get('parent'))]
+    return 'page:' + clean_id(page['id'])
+
+def add_selection_arguments(parser: argparse.ArgumentParser, env: bool = True) -> None:
+    """--only / --subtree / --since (defaults from EXPORT_ONLY, EXPORT_SUBTREE, EXPORT_SINCE)"""
+    default = (lambda name: os.getenv(name)) if env else (lambda name: None)
+    parser.add_argument('--only', default=default('EXPORT_ONLY'),
+                        help='Export just these pages or databases (comma-separated titles or ids)')
+    parser.add_argument('--subtree', default=default('EXPORT_SUBTREE'),
+                        help='Export just these pages or databases and everything below them (titles or ids)')
+    parser.add_argument('--since', default=default('EXPORT_SINCE'),
+                        help='Export just pages edited since a date or time (2025-01-31, 7d, 12h)')
+
+def add_shard_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--shards', type=int, help='Split the pages into this many shards (see export_shards.py)')
+    parser.add_argument('--shard-index', type=int, help='The shard to keep, from 0 to --shards - 1')
+
+def page_ids(output_dir: str, selection: Optional[PageSelection] = None) -> List[str]:
+    """Pages to export: the stored scan, else NOTION_PAGE_IDS (no scan yet, or a hand-made list)"""
+    graph = PageGraph(output_dir)
+    if selection:
+        return [page['id'] for page in selection.apply(graph.pages())]
+    if graph.exists():
+        return list(graph.ids())
+    raw = os.getenv('NOTION_PAGE_IDS', os.getenv('NOTION_PAGE_ID', ''))
+    return [pid.strip() for pid in raw.replace(' ', ',').split(',') if pid.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description='Read the scanned page graph')
+    parser.add_argument('command', choices=['ids', 'pages', 'stats'], help='What to print')
+    parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    add_selection_arguments(parser, env=False)
+    add_shard_arguments(parser)
+    args = parser.parse_args()
+    try:
+        selection = PageSelection.from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    graph = PageGraph(args.output)
+    if not graph.exists():
+        print(f"❌ No page graph in {args.output} (run a scan first)", file=sys.stderr)
+        return 1
+    if args.command == 'stats':
+        print(json.dumps(graph.stats(), indent=2))
+        return 0
+    try:
+        selected = selection.apply(graph.pages())
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    if args.command == 'ids':
+        for page_id in (p['id'] for p in selected) if selection else graph.ids():
+            sys.stdout.write(page_id + '\n')
+    else:
+        for page in selected:
+            sys.stdout.write(json.dumps(page, ensure_ascii=False) + '\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
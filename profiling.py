@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Profiling hooks for the Python and Node stages
+With --profile (or PROFILE_DIR set by a parent process) Python entry points run
+under cProfile and Node workers start with --cpu-prof; everything lands in one
+per-run directory, output/.profiles/<timestamp>/, next to a summary of the top
+hot spots. Heap snapshots can be taken after the largest pages.
+
+    python profiling.py                 # Summarize the latest profile run
+    python profiling.py <profile dir>   # Summarize a specific one
+"""
+
+import os
+import sys
+import json
+import pstats
+import cProfile
+import argparse
+from pathlib import Path
+from datetime import datetime
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from export_manifest import load_manifest
+from tracing import traced_main
+
+PROFILES_DIRNAME = '.profiles'
+SUMMARY_FILENAME = 'summary.txt'
+NODE_SUBDIR = 'node'
+
+def new_profile_dir(output_dir: str) -> Path:
+    """Create output/.profiles/<timestamp>/ for one profiled run"""
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    profile_dir = Path(output_dir) / PROFILES_DIRNAME / stamp
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    return profile_dir
+
+def latest_profile_dir(output_dir: str) -> Optional[Path]:
+    root = Path(output_dir) / PROFILES_DIRNAME
+    runs = sorted(p for p in root.iterdir() if p.is_dir()) if root.exists() else []
+    return runs[-1] if runs else None
+
+def largest_pages(output_dir: str, count: int) -> List[str]:
+    """Ids of the biggest pages of the last run (by blocks, then bytes), for heap snapshots"""
+    manifest = load_manifest(output_dir) or {}
+    pages = [p for p in manifest.get('pages', []) if 'error' not in p]
+    pages.sort(key=lambda p: (p.get('blocks', 0), p.get('bytes', 0)), reverse=True)
+    return [p['id'].replace('-', '') for p in pages[:count]]
+
+def node_command(script: str, *args: str) -> List[str]:
+    """`node script args...`, with the V8 CPU profiler on when a profile run is active"""
+    profile_dir = os.getenv('PROFILE_DIR')
+    if not profile_dir:
+        return ['node', script, *args]
+    node_dir = Path(profile_dir) / NODE_SUBDIR
+    node_dir.mkdir(parents=True, exist_ok=True)
+    return ['node', '--cpu-prof', f'--cpu-prof-dir={node_dir}', script, *args]
+
+def start_run(output_dir: str, heap_snapshots: int = 0) -> Path:
+    """Start a profile run; child processes join it through PROFILE_DIR
+
+    heap_snapshots: snapshot the heap after this many of the last run's largest pages.
+    """
+    profile_dir = new_profile_dir(output_dir)
+    os.environ['PROFILE_DIR'] = str(profile_dir)
+    if heap_snapshots:
+        os.environ['PROFILE_HEAP_PAGES'] = ','.join(largest_pages(output_dir, heap_snapshots))
+    return profile_dir
+
+def run_profiled(name: str, func: Callable, *args):
+    """Call func under cProfile if a profile run is active, saving <name>.<pid>.prof into it"""
+    profile_dir = os.getenv('PROFILE_DIR')
+    if not profile_dir:
+        return func(*args)
+    Path(profile_dir).mkdir(parents=True, exist_ok=True)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        profiler.dump_stats(str(Path(profile_dir) / f'{name}.{os.getpid()}.prof'))
+
+def profiled_main(name: str, main: Callable[[], object], output_dir: Optional[str] = None):
+    """Entry point wrapper: run main() under cProfile with --profile or inside a profile run
+
+    A --profile run started here is summarized here once main() returns.
+    The entry point is traced as well (--trace / TRACE_DIR, see tracing.py).
+    """
+    main = traced_main(name, main, output_dir)
+    requested = '--profile' in sys.argv
+    if requested:
+        sys.argv.remove('--profile')
+    if not requested or os.getenv('PROFILE_DIR'):
+        return run_profiled(name, main)
+
+    profile_dir = start_run(output_dir or os.getenv('OUTPUT_DIR', './output'),
+                            int(os.getenv('PROFILE_HEAP_SNAPSHOTS', '0')))
+    try:
+        return run_profiled(name, main)
+    finally:
+        print_summary(profile_dir)
+
+def python_hot_spots(prof_files: List[Path], top: int) -> List[str]:
+    stats = pstats.Stats(*[str(p) for p in prof_files])
+    rows = []
+    for (filename, line, func), (_, calls, own, cumulative, _) in stats.stats.items():
+        if filename.startswith('<') or 'cProfile' in filename:
+            continue
+        rows.append((own, cumulative, calls, f"{Path(filename).name}:{line} {func}"))
+    rows.sort(reverse=True)
+    return [f"{own:8.2f}s own {cumulative:8.2f}s cum {calls:>8} calls  {where}"
+            for own, cumulative, calls, where in rows[:top]]
+
+def node_hot_spots(cpu_profiles: List[Path], top: int) -> List[str]:
+    """Self time per function across .cpuprofile files (sample counts x interval)"""
+    self_time: Dict[str, float] = defaultdict(float)
+    for cpu_profile in cpu_profiles:
+        with open(cpu_profile) as f:
+            profile = json.load(f)
+        samples = profile.get('samples') or []
+        if not samples:
+            continue
+        interval = (profile['endTime'] - profile['startTime']) / len(samples) / 1e6
+        for node in profile['nodes']:
+            frame = node['callFrame']
+            name = frame.get('functionName') or '(anonymous)'
+            # Heap snapshots are our own doing, not a hot spot of the export
+            if name in ('(root)', '(program)', '(idle)', 'writeHeapSnapshot'):
+                continue
+            where = Path(frame.get('url') or '').name or 'native'
+            self_time[f"{where}:{frame.get('lineNumber', -1) + 1} {name}"] += node.get('hitCount', 0) * interval
+    rows = sorted(self_time.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [f"{seconds:8.2f}s self  {where}" for where, seconds in rows]
+
+def summarize(profile_dir: Path, top: int = 15) -> str:
+    """Write summary.txt for a profile run and return its text"""
+    prof_files = sorted(profile_dir.glob('*.prof'))
+    cpu_profiles = sorted(profile_dir.rglob('*.cpuprofile'))
+    heap_snapshots = sorted(profile_dir.rglob('*.heapsnapshot'))
+
+    lines = [f"Profile run: {profile_dir}", ""]
+    if prof_files:
+        lines += [f"Python hot spots ({len(prof_files)} process(es), by own time):"]
+        lines += ["  " + line for line in python_hot_spots(prof_files, top)] + [""]
+    if cpu_profiles:
+        lines += [f"Node hot spots ({len(cpu_profiles)} process(es), by self time):"]
+        lines += ["  " + line for line in node_hot_spots(cpu_profiles, top)] + [""]
+    if heap_snapshots:
+        lines += ["Heap snapshots (open in Chrome DevTools > Memory):"]
+        lines += [f"  {p.relative_to(profile_dir)}" for p in heap_snapshots] + [""]
+    if len(lines) == 2:
+        lines += ["No profiles recorded", ""]
+
+    text = '\n'.join(lines)
+    (profile_dir / SUMMARY_FILENAME).write_text(text, encoding='utf-8')
+    return text
+
+def print_summary(profile_dir: Path) -> None:
+    print("\n🔬 " + summarize(profile_dir).rstrip())
+    print(f"\n📁 Profiles saved to: {profile_dir}/")
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the hot spots of a profiled run')
+    parser.add_argument('profile_dir', nargs='?', help='Profile run directory (default: the latest one)')
+    parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    parser.add_argument('--top', type=int, default=15, help='Hot spots to list per runtime')
+    args = parser.parse_args()
+
+    profile_dir = Path(args.profile_dir) if args.profile_dir else latest_profile_dir(args.output)
+    if not profile_dir or not profile_dir.exists():
+        print("ℹ️  No profile runs found. Run with --profile first.")
+        return 1
+    print(summarize(profile_dir, args.top).rstrip())
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+/**
+ * Complete relation and rollup values
+ * Page objects (pages.retrieve, dataSources.query, search) carry at most 25
+ * references per relation and flag the rest with has_more; rollups over such a
+ * relation are cut off the same way. Only those properties are paged in with
+ * pages.properties.retrieve, concurrently, and kept in
+ * output/.property_cache.json under the page's last_edited_time, so a page
+ * costs these requests again only after it was edited.
+ */
+
+const fs = require('fs').promises;
+const path = require('path');
+
+const CACHE_FILENAME = '.property_cache.json';
+// Property item types whose value is a list in a page object but one element per item
+const LIST_ITEM_TYPES = new Set(['title', 'rich_text', 'people', 'relation']);
+
+// [name, property] of the properties a page object holds only part of
+function truncatedProperties(page) {
+  const entries = Object.entries(page.properties || {});
+  const cutRelation = entries.some(([, p]) => p.type === 'relation' && p.has_more);
+  if (!cutRelation) return [];
+  // Rollups are computed over the first 25 references of their relation
+  return entries.filter(([, p]) => (p.type === 'relation' && p.has_more) || p.type === 'rollup');
+}
+
+// One property item (from a paginated property) in the shape of a page object value
+function propertyValue(item) {
+  const value = item[item.type];
+  return { type: item.type, [item.type]: LIST_ITEM_TYPES.has(item.type) && !Array.isArray(value) ? [value] : value };
+}
+
+class PropertyValues {
+  constructor(notion, outputDir) {
+    this.notion = notion;
+    this.file = path.join(outputDir, CACHE_FILENAME);
+    this.cache = null;
+    this.loading = null;
+    this.dirty = false;
+    this.stats = { properties: 0, cached: 0, requests: 0, failed: 0 };
+  }
+
+  // Read once, however many pages ask for it at the same time
+  load() {
+    if (!this.loading) {
+      this.loading = fs.readFile(this.file, 'utf8')
+        .then(text => JSON.parse(text))
+        .catch(() => ({ pages: {} }))
+        .then(cache => (this.cache = cache));
+    }
+    return this.loading;
+  }
+
+  // Replace a page object's truncated properties with their complete values (in place)
+  async complete(page) {
+    const truncated = truncatedProperties(page);
+    if (truncated.length === 0) return page;
+    const cache = await this.load();
+    const pageId = page.id.replace(/-/g, '');
+    let entry = cache.pages[pageId];
+    if (!entry || entry.last_edited_time !== page.last_edited_time) {
+      entry = { last_edited_time: page.last_edited_time, properties: {} };
+      cache.pages[pageId] = entry;
+    }
+
+    await Promise.all(truncated.map(async ([name, property]) => {
+      this.stats.properties++;
+      let value = entry.properties[property.id];
+      if (value) {
+        this.stats.cached++;
+      } else {
+        try {
+          value = await this.retrieve(pageId, property);
+        } catch {
+          // Keep the first 25 references
+          this.stats.failed++;
+          return;
+        }
+        entry.properties[property.id] = value;
+        this.dirty = true;
+      }
+      page.properties[name] = value;
+    }));
+    return page;
+  }
+
+  // Several pages at once; the API limiter bounds the requests in flight
+  async completeAll(pages) {
+    await Promise.all([...pages].map(page => this.complete(page)));
+  }
+
+  // Every page of one property's items, folded back into a page object value
+  async retrieve(pageId, property) {
+    const results = [];
+    let propertyItem = null;
+    let cursor = undefined;
+    do {
+      this.stats.requests++;
+      const response = await this.notion.pages.properties.retrieve({
+        page_id: pageId,
+        property_id: property.id,
+        start_cursor: cursor,
+        page_size: 100
+      });
+      if (response.object !== 'list') return { ...propertyValue(response), id: property.id };
+      results.push(...response.results);
+      propertyItem = response.property_item;
+      cursor = response.has_more ? response.next_cursor : undefined;
+    } while (cursor);
+
+    if (property.type === 'relation') {
+      return { id: property.id, type: 'relation', relation: results.map(item => item.relation), has_more: false };
+    }
+    // Aggregates (sum, count, dates...) come computed over all references; arrays as items
+    const rollup = { ...(propertyItem && propertyItem.rollup) };
+    if (rollup.type === 'array' || (!rollup.type && property.rollup?.type === 'array')) {
+      rollup.type = 'array';
+      rollup.array = results.map(propertyValue);
+    }
+    return { id: property.id, type: 'rollup', rollup };
+  }
+
+  async save() {
+    if (!this.dirty) return;
+    await fs.mkdir(path.dirname(this.file), { recursive: true });
+    const tmpFile = `${this.file}.tmp`;
+    await fs.writeFile(tmpFile, JSON.stringify(this.cache), 'utf8');
+    await fs.rename(tmpFile, this.file);
+    this.dirty = false;
+  }
+
+  report() {
+    const { properties, cached, requests, failed } = this.stats;
+    if (properties === 0) return;
+    console.log(`🔗 Relations/rollups over 25 references: ${properties - failed} completed ` +
+      `(${requests} request(s), ${cached} from cache${failed ? `, ${failed} failed` : ''})`);
+  }
+}
+
+module.exports = {
+  CACHE_FILENAME,
+  truncatedProperties,
+  PropertyValues,
+};
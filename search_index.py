@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Incremental full-text search index over exported notes
+Keeps a SQLite FTS5 index of exported pages next to the markdown output
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from tracing import span, traced_main
+
+INDEX_FILENAME = '.search_index.sqlite'
+FEED_FILENAME = '.search_feed.jsonl'
+
+def feed_body(record: Dict, output_dir: Path) -> Optional[str]:
+    """Markdown of a feed record: read from its file (None if it is gone)
+
+    The run.sh exporter streams pages to disk and only records where they
+    went, so it never holds a whole page; older feeds carried the body inline.
+    """
+    if 'body' in record:
+        return record['body']
+    try:
+        return (output_dir / record['path']).read_text(encoding='utf-8')
+    except OSError:
+        return None
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    title, database, properties, body,
+    page_id UNINDEXED, path UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS page_state (
+    page_id TEXT PRIMARY KEY,
+    fts_rowid INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    last_edited_time TEXT,
+    indexed_at TEXT NOT NULL
+);
+"""
+
+# bm25 column weights, in pages_fts column order (unindexed columns last)
+RANK_WEIGHTS = (10.0, 2.0, 3.0, 1.0, 0.0, 0.0)
+
+def build_match_query(text: str) -> str:
+    """Turn free text into an FTS5 MATCH expression
+
+    Words are quoted so punctuation can't break the query syntax; "quoted
+    phrases" are kept together and a trailing * keeps prefix matching.
+    """
+    terms = []
+    for token in re.findall(r'"[^"]+"|\S+', text):
+        prefix = token.endswith('*') and not token.startswith('"')
+        word = token.strip('"').rstrip('*').replace('"', '""')
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return ' '.join(terms)
+
+def title_from_markdown(body: str, fallback: str) -> str:
+    """Use the first markdown heading as the title when none is known"""
+    for line in body.splitlines():
+        if line.startswith('#'):
+            title = line.lstrip('#').strip()
+            if title:
+                return title
+    return fallback
+
+class SearchIndex:
+    def __init__(self, output_dir: str):
+        self.output_dir = Path(output_dir)
+        self.db_path = self.output_dir / INDEX_FILENAME
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+    def relative_path(self, path: str) -> str:
+        """Store paths relative to the output dir (host and container mount it differently)"""
+        try:
+            return str(Path(path).relative_to(self.output_dir))
+        except ValueError:
+            return str(path)
+
+    def upsert_page(self, page_id: str, title: str, path: str, body: str,
+                    database: str = '', properties: Optional[Dict] = None,
+                    last_edited_time: Optional[str] = None) -> bool:
+        """Index a page, returning False if it was already up to date"""
+        page_id = page_id.replace('-', '')
+        props_text = '\n'.join(f"{k}: {v}" for k, v in (properties or {}).items() if v)
+        rel_path = self.relative_path(path)
+        content_hash = hashlib.sha1(
+            '\x1f'.join((title, database, props_text, rel_path, body)).encode('utf-8')
+        ).hexdigest()
+
+        row = self.conn.execute(
+            "SELECT fts_rowid, content_hash FROM page_state WHERE page_id = ?", (page_id,)
+        ).fetchone()
+        if row and row[1] == content_hash:
+            return False
+        if row:
+            self.conn.execute("DELETE FROM pages_fts WHERE rowid = ?", (row[0],))
+
+        cursor = self.conn.execute(
+            "INSERT INTO pages_fts (title, database, properties, body, page_id, path) VALUES (?, ?, ?, ?, ?, ?)",
+            (title, database, props_text, body, page_id, rel_path)
+        )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO page_state (page_id, fts_rowid, content_hash, last_edited_time, indexed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (page_id, cursor.lastrowid, content_hash, last_edited_time, datetime.now().isoformat())
+        )
+        return True
+
+    def remove_page(self, page_id: str) -> None:
+        page_id = page_id.replace('-', '')
+        row = self.conn.execute("SELECT fts_rowid FROM page_state WHERE page_id = ?", (page_id,)).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM pages_fts WHERE rowid = ?", (row[0],))
+            self.conn.execute("DELETE FROM page_state WHERE page_id = ?", (page_id,))
+
+    def index_export_result(self, page_result: Dict, database: str = '') -> int:
+        """Index the files notion_export.js reported for one exported page"""
+        updated = 0
+        with span('search index', 'post', id=page_result.get('pageId')):
+            for file_info in page_result.get('files', []):
+                file_path = Path(file_info['path'])
+                if not file_path.exists():
+                    continue
+                body = file_path.read_text(encoding='utf-8')
+                if file_info.get('type') == 'child':
+                    page_id = file_info.get('childId', str(file_path))
+                    title = title_from_markdown(body, file_path.stem)
+                else:
+                    page_id = page_result.get('pageId', str(file_path))
+                    title = page_result.get('pageName') or title_from_markdown(body, file_path.stem)
+                updated += self.upsert_page(page_id, title, str(file_path), body, database=database)
+            self.conn.commit()
+        return updated
+
+    def ingest_feed(self, feed_path: Path) -> Dict[str, int]:
+        """Index the JSONL feed of pages written by the run.sh exporter, then remove it"""
+        counts = {'updated': 0, 'unchanged': 0, 'missing': 0}
+        with open(feed_path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                body = feed_body(record, feed_path.parent)
+                if body is None:
+                    counts['missing'] += 1
+                    continue
+                changed = self.upsert_page(
+                    record['id'],
+                    record.get('title', 'Untitled'),
+                    record['path'],
+                    body,
+                    database=record.get('database') or '',
+                    properties=record.get('properties'),
+                    last_edited_time=record.get('last_edited_time')
+                )
+                counts['updated' if changed else 'unchanged'] += 1
+        self.conn.commit()
+        feed_path.unlink()
+        return counts
+
+    def search(self, query: str, database: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Return ranked hits (best first) for a free-text query"""
+        match = build_match_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT page_id, path, title, database, bm25(pages_fts, {weights}) AS rank, "
+            "snippet(pages_fts, 3, '[', ']', '…', 12) "
+            "FROM pages_fts WHERE pages_fts MATCH ?"
+        ).format(weights=', '.join(str(w) for w in RANK_WEIGHTS))
+        params: List = [match]
+        if database:
+            # Prefix match so "4. Literature Review" finds "4. Literature Review (30+ Papers)"
+            sql += " AND lower(substr(database, 1, ?)) = lower(?)"
+            params.extend([len(database), database])
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        return [
+            {'page_id': r[0], 'path': r[1], 'title': r[2], 'database': r[3], 'score': -r[4], 'snippet': r[5]}
+            for r in self.conn.execute(sql, params)
+        ]
+
+    def page_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM page_state").fetchone()[0]
+
+def main():
+    """Entry point used by run.sh to fold the exporter's feed into the index"""
+    parser = argparse.ArgumentParser(description='Maintain the full-text search index of exported notes')
+    parser.add_argument('command', choices=['ingest'], help='ingest: index pages from the exporter feed')
+    parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    args = parser.parse_args()
+
+    feed_path = Path(args.output) / FEED_FILENAME
+    if not feed_path.exists():
+        print("ℹ️  No new pages to index")
+        return 0
+
+    with SearchIndex(args.output) as index:
+        counts = index.ingest_feed(feed_path)
+        total = index.page_count()
+    missing = f", {counts['missing']} file(s) gone" if counts['missing'] else ''
+    print(f"🔎 Search index: {counts['updated']} updated, {counts['unchanged']} unchanged{missing} ({total} pages indexed)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(traced_main('search_index', main)())
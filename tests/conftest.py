@@ -0,0 +1,28 @@
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The modules are scripts at the repository root, not an installed package
+sys.path.insert(0, str(ROOT))
+
+@pytest.fixture
+def run_node():
+    """Runs a Node script from the repository root and returns the JSON it prints
+
+    Skips the test without node or the npm dependencies.
+    """
+    if not shutil.which('node') or subprocess.run(
+            ['node', '-e', "require('@notionhq/client')"], cwd=ROOT, capture_output=True).returncode:
+        pytest.skip('needs node and the npm dependencies')
+
+    def run(script, *args, env=None):
+        result = subprocess.run(['node', '-e', script, *map(str, args)], cwd=ROOT, env=env,
+                                capture_output=True, text=True, timeout=60, check=True)
+        return json.loads(result.stdout)
+    return run
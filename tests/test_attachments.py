@@ -0,0 +1,87 @@
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import attachments
+from attachments import AttachmentDownloader, url_key
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """Serves a different body for every path + query, like an image CDN (/expired/ is forbidden)"""
+    requests = []
+
+    def do_GET(self):
+        ImageHandler.requests.append(self.path)
+        if self.path.startswith('/expired/'):
+            self.send_error(403)
+            return
+        body = f'image {self.path}'.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def image_server():
+    ImageHandler.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+def test_signed_notion_links_share_a_key():
+    base = 'https://prod-files-secure.s3.us-west-2.amazonaws.com/space/file/photo.png'
+    assert url_key(base + '?X-Amz-Signature=aaa&X-Amz-Date=1') == url_key(base + '?X-Amz-Signature=bbb&X-Amz-Date=2')
+
+def test_other_hosts_keep_their_query():
+    assert url_key('https://cdn.example.com/img?id=1') != url_key('https://cdn.example.com/img?id=2')
+    assert url_key('https://cdn.example.com/img.png?w=200') != url_key('https://cdn.example.com/img.png?w=800')
+    assert url_key('https://cdn.example.com/img.png?w=200#top') == 'https://cdn.example.com/img.png?w=200'
+
+def test_images_differing_only_by_query_stay_apart(tmp_path, image_server):
+    page = tmp_path / 'Page.md'
+    page.write_text(f'![a]({image_server}/img.png?id=1)\n![b]({image_server}/img.png?id=2)\n'
+                    f'![c]({image_server}/img.png?id=1)\n')
+
+    stats = AttachmentDownloader(str(tmp_path), workers=2).localize([str(page)])
+
+    assert stats['downloaded'] == 2 and stats['failed'] == 0
+    assert sorted(ImageHandler.requests) == ['/img.png?id=1', '/img.png?id=2']
+    links = [line[line.index('(') + 1:-1] for line in page.read_text().splitlines()]
+    assert links[0] == links[2] != links[1]
+    assert (tmp_path / links[0]).read_bytes() == b'image /img.png?id=1'
+    assert (tmp_path / links[1]).read_bytes() == b'image /img.png?id=2'
+
+def test_second_run_uses_the_stored_files(tmp_path, image_server):
+    page = tmp_path / 'Page.md'
+    text = f'![a]({image_server}/img.png?w=200)\n![b]({image_server}/img.png?w=800)\n'
+    page.write_text(text)
+    AttachmentDownloader(str(tmp_path)).localize([str(page)])
+
+    again = tmp_path / 'Again.md'
+    again.write_text(text)
+    stats = AttachmentDownloader(str(tmp_path)).localize([str(again)])
+
+    assert stats['cached'] == 2 and stats['downloaded'] == 0
+    assert len(ImageHandler.requests) == 2
+    assert again.read_text() == page.read_text()
+
+def test_failed_download_keeps_its_link_without_failing_the_run(tmp_path, image_server, monkeypatch, capsys):
+    page = tmp_path / 'Page.md'
+    page.write_text(f'![ok]({image_server}/img.png)\n![gone]({image_server}/expired/img.png)\n')
+    monkeypatch.setattr(sys, 'argv', ['attachments.py', '--output', str(tmp_path), str(page)])
+
+    assert attachments.main() == 0
+
+    assert '1 downloaded' in capsys.readouterr().out
+    ok, gone = page.read_text().splitlines()
+    assert '_attachments/' in ok
+    assert gone == f'![gone]({image_server}/expired/img.png)'
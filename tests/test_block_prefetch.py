@@ -0,0 +1,28 @@
+# A page of 200 toggles with 100 children each, none of them rendered yet
+PREFETCH_SCRIPT = """
+const { BlockPrefetcher } = require('./notion_stream');
+const block = (id, children) => ({ object: 'block', id, type: 'toggle', has_children: children });
+const notion = { blocks: { children: { list: async ({ block_id }) => {
+  await new Promise(resolve => setTimeout(resolve, 5));
+  const results = block_id === 'page'
+    ? Array.from({ length: 200 }, (_, i) => block(`toggle-${i}`, true))
+    : Array.from({ length: 100 }, (_, i) => block(`${block_id}-${i}`, false));
+  return { results, has_more: false };
+} } } };
+(async () => {
+  const prefetcher = new BlockPrefetcher(notion, { concurrency: 8, maxBlocks: 500 });
+  const toggles = [];
+  for await (const child of prefetcher.children('page')) toggles.push(child);
+  await Promise.all(prefetcher.jobs.values());
+  const held = prefetcher.cached;
+  const rendered = [];
+  for (const toggle of toggles) for await (const child of prefetcher.children(toggle.id)) rendered.push(child);
+  console.log(JSON.stringify({ held, rendered: rendered.length, left: prefetcher.cached, pending: prefetcher.pending }));
+})();
+"""
+
+def test_prefetch_counts_lists_in_flight_against_max_blocks(run_node):
+    run = run_node(PREFETCH_SCRIPT)
+    assert run['held'] <= 500
+    assert run['rendered'] == 200 * 100  # The rest is fetched on demand
+    assert run['left'] == 0 and run['pending'] == 0
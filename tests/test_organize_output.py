@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from organize_output import organize_files
+
+ROOT = '10000000000000000000000000000000'
+
+def page(page_id, title, level, parent, **extra):
+    return {'id': page_id, 'title': title, 'level': level, 'parent': parent, **extra}
+
+def row(page_id, title, database_id, database_title):
+    return page(page_id, title, 2, database_id, dataSourceId=database_id, databaseTitle=database_title,
+                databaseParent=ROOT, fromDatabase=True)
+
+def write_export(source, pages, files, page_index=None):
+    source.mkdir()
+    (source / 'structure.json').write_text(json.dumps({'pages': pages}))
+    for rel, text in files.items():
+        (source / rel).parent.mkdir(parents=True, exist_ok=True)
+        (source / rel).write_text(text)
+    if page_index is not None:
+        (source / '.page_index.json').write_text(json.dumps(page_index))
+
+def contents(directory):
+    return sorted(p.read_text() for p in directory.rglob('*.md'))
+
+@pytest.mark.parametrize('mode', ['rename', 'hardlink', 'symlink', 'copy'])
+def test_same_title_rows_in_two_databases(tmp_path, mode):
+    pages = [page(ROOT, 'Workspace', 0, None),
+             row('a1', 'Template', 'db-a', 'Projects'),
+             row('b1', 'Template', 'db-b', 'Areas')]
+    files = {'Projects/01. Template.md': 'project template', 'Areas/01. Template.md': 'area template'}
+    index = {'a1': {'path': 'Projects/01. Template.md'}, 'b1': {'path': 'Areas/01. Template.md'}}
+    write_export(tmp_path / 'output', pages, files, index)
+
+    assert organize_files(tmp_path / 'output', tmp_path / 'organized', mode=mode)
+
+    organized = tmp_path / 'organized'
+    assert (organized / 'Projects' / '01. Template.md').read_text() == 'project template'
+    assert (organized / 'Areas' / '01. Template.md').read_text() == 'area template'
+
+def test_same_title_without_page_index_keeps_both(tmp_path):
+    pages = [page(ROOT, 'Workspace', 0, None),
+             row('a1', 'Template', 'db-a', 'Projects'),
+             row('b1', 'Template', 'db-b', 'Areas')]
+    files = {'Projects/01. Template.md': 'project template', 'Areas/01. Template.md': 'area template'}
+    write_export(tmp_path / 'output', pages, files)
+
+    assert organize_files(tmp_path / 'output', tmp_path / 'organized', mode='rename')
+
+    assert contents(tmp_path / 'organized') == ['area template', 'project template']
+
+def test_colliding_destination_gets_a_numbered_name(tmp_path):
+    # Two pages titled "Template" under the same parent, exported into different folders
+    pages = [page(ROOT, 'Workspace', 0, None),
+             page('p1', 'Notes', 1, ROOT),
+             page('t1', 'Template', 2, 'p1'),
+             page('t2', 'Template', 2, 'p1')]
+    files = {'a/01. Template.md': 'first', 'b/01. Template.md': 'second', '01. Notes.md': 'notes'}
+    index = {'p1': {'path': '01. Notes.md'}, 't1': {'path': 'a/01. Template.md'},
+             't2': {'path': 'b/01. Template.md'}}
+    write_export(tmp_path / 'output', pages, files, index)
+
+    assert organize_files(tmp_path / 'output', tmp_path / 'organized', mode='rename')
+
+    notes = tmp_path / 'organized' / 'Notes'
+    assert (notes / '01. Template.md').read_text() == 'first'
+    assert (notes / '01. Template (2).md').read_text() == 'second'
+
+def test_rerun_does_not_duplicate(tmp_path):
+    pages = [page(ROOT, 'Workspace', 0, None), row('a1', 'Template', 'db-a', 'Projects')]
+    write_export(tmp_path / 'output', pages, {'Projects/01. Template.md': 'project template'},
+                 {'a1': {'path': 'Projects/01. Template.md'}})
+
+    for _ in range(2):
+        assert organize_files(tmp_path / 'output', tmp_path / 'organized', mode='hardlink')
+
+    assert [p.name for p in (tmp_path / 'organized' / 'Projects').iterdir()] == ['01. Template.md']
@@ -0,0 +1,62 @@
+import subprocess
+
+import pytest
+
+from conftest import ROOT
+
+# A page with a toggle, two columns and a callout, each holding a paragraph; the
+# client counts the child lists it serves
+STREAM_SCRIPT = """
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { NotionToMarkdown } = require('notion-to-md');
+const { PageStreamer } = require('./notion_stream');
+
+const text = (content) => ({
+  type: 'text', text: { content, link: null }, plain_text: content, href: null,
+  annotations: { bold: false, italic: false, strikethrough: false, underline: false, code: false, color: 'default' },
+});
+const block = (id, type, body = {}, children = false) => ({ object: 'block', id, type, has_children: children, [type]: body });
+const paragraph = (id) => block(id, 'paragraph', { rich_text: [text(`text of ${id}`)], color: 'default' });
+const children = {
+  page: [
+    block('toggle', 'toggle', { rich_text: [text('Toggle summary')], color: 'default' }, true),
+    block('columns', 'column_list', {}, true),
+    block('callout', 'callout', { rich_text: [text('Callout text')], icon: { type: 'emoji', emoji: '💡' }, color: 'default' }, true),
+  ],
+  toggle: [paragraph('in-toggle')],
+  columns: [block('left', 'column', {}, true), block('right', 'column', {}, true)],
+  left: [paragraph('in-left')],
+  right: [paragraph('in-right')],
+  callout: [paragraph('in-callout')],
+};
+const listed = {};
+const notion = { blocks: { children: { list: async ({ block_id }) => {
+  listed[block_id] = (listed[block_id] || 0) + 1;
+  return { object: 'list', results: children[block_id] || [], has_more: false, next_cursor: null };
+} } } };
+
+(async () => {
+  const streamer = new PageStreamer({ notion, n2m: new NotionToMarkdown({ notionClient: notion }), renderCell: String });
+  const file = path.join(fs.mkdtempSync(path.join(os.tmpdir(), 'stream-')), 'page.md');
+  await streamer.streamPage('page', file);
+  console.log(JSON.stringify({ listed, markdown: fs.readFileSync(file, 'utf8') }));
+})();
+"""
+
+@pytest.fixture
+def notion_to_md(run_node):
+    # The real package, not a stand-in: it renders containers' children itself
+    if subprocess.run(['node', '-e', "require('notion-to-md/package.json')"], cwd=ROOT, capture_output=True).returncode:
+        pytest.skip('needs notion-to-md (npm install)')
+
+def test_containers_are_streamed_once(notion_to_md, run_node):
+    run = run_node(STREAM_SCRIPT)
+    assert all(count == 1 for count in run['listed'].values()), run['listed']
+    markdown = run['markdown']
+    for paragraph in ('in-toggle', 'in-left', 'in-right', 'in-callout'):
+        assert markdown.count(f'text of {paragraph}') == 1, markdown
+    assert markdown.count('<details>') == 1 and markdown.count('Toggle summary') == 1
+    assert markdown.index('Toggle summary') < markdown.index('text of in-toggle') < markdown.index('</details>')
+    assert markdown.count('Callout text') == 1 and '💡' in markdown
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from conftest import ROOT
+
+# A burst of 6 against a server that allows 4 at once, then one request at a time
+LIMITER_SCRIPT = """
+const { AdaptiveRateLimiter } = require('./notion_utils');
+const [port, pageId] = process.argv.slice(1);
+const limiter = new AdaptiveRateLimiter({ initialConcurrency: 6, maxConcurrency: 6, rate: 3 });
+const get = () => limiter.fetch(`http://127.0.0.1:${port}/v1/pages/${pageId}`, {
+  headers: { authorization: 'Bearer test' },
+}).then(response => response.status);
+(async () => {
+  const burst = await Promise.all(Array.from({ length: 6 }, get));
+  const afterCut = limiter.limit;
+  const sequential = [];
+  for (let i = 0; i < 8; i++) sequential.push(await get());
+  console.log(JSON.stringify({ burst, afterCut, sequential, limit: limiter.limit, stats: limiter.summary() }));
+})();
+"""
+
+@pytest.fixture
+def fake_notion(run_node):
+    server = subprocess.Popen(
+        ['node', 'fake_notion.js', '--port', '0', '--pages', '5', '--databases', '0', '--rps', '4'],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        yield json.loads(server.stdout.readline())
+    finally:
+        server.terminate()
+        server.wait()
+
+def test_limit_stays_down_after_a_429_until_callers_fill_it(fake_notion, run_node, tmp_path):
+    run = run_node(LIMITER_SCRIPT, fake_notion['port'], fake_notion['rootPageId'],
+                   env={**os.environ, 'API_RATE_DIR': str(tmp_path)})
+    assert run['burst'] == [200] * 6
+    assert run['stats']['throttled'] >= 1  # Retried after the server's Retry-After
+    assert run['afterCut'] == 3
+    # One request at a time never fills 3 slots, so the 6 seen before the cut
+    # must not let the limit climb back
+    assert run['sequential'] == [200] * 8
+    assert run['limit'] == 3
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Chrome trace timeline of an export run
+With --trace (or TRACE_DIR set by a parent process) every Python and Node
+process of the run records spans -- API requests, rate-limit stalls, pages,
+file writes, post-processing steps -- into output/.traces/<timestamp>/. Each
+process appends to its own <name>.<pid>.trace.jsonl; the run ends by merging
+them into trace.json for chrome://tracing or https://ui.perfetto.dev.
+
+    python tracing.py                 # Merge and summarize the latest trace run
+    python tracing.py <trace dir>     # A specific one
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+TRACES_DIRNAME = '.traces'
+TRACE_FILENAME = 'trace.json'
+EVENTS_SUFFIX = '.trace.jsonl'
+
+def now_us() -> int:
+    """Wall-clock microseconds (the clock the Node processes use too)"""
+    return time.time_ns() // 1000
+
+class Tracer:
+    """Complete ('X') events for one process, appended to its own JSONL file"""
+
+    def __init__(self, trace_dir: str, name: str):
+        Path(trace_dir).mkdir(parents=True, exist_ok=True)
+        self.path = Path(trace_dir) / f'{name}.{os.getpid()}{EVENTS_SUFFIX}'
+        self.pid = os.getpid()
+        self.events: List[Dict] = [{'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+                                    'args': {'name': f'{name} ({self.pid})'}}]
+        self.threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def tid(self) -> int:
+        """Small, stable thread number (thread idents are huge)"""
+        ident = threading.get_ident()
+        with self._lock:
+            if ident not in self.threads:
+                self.threads[ident] = len(self.threads) + 1
+                self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid,
+                                    'tid': self.threads[ident], 'args': {'name': threading.current_thread().name}})
+            return self.threads[ident]
+
+    def record(self, name: str, cat: str, start: int, args: Optional[Dict] = None) -> None:
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start, 'dur': now_us() - start,
+                 'pid': self.pid, 'tid': self.tid(), 'args': args or {}}
+        with self._lock:
+            self.events.append(event)
+            if len(self.events) >= 1000:
+                self._write()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        if self.events:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in self.events))
+            self.events = []
+
+_tracer: Optional[Tracer] = None
+
+def tracer() -> Optional[Tracer]:
+    """This process's tracer, or None when no trace run is active"""
+    global _tracer
+    trace_dir = os.getenv('TRACE_DIR')
+    if not trace_dir:
+        return None
+    if _tracer is None or _tracer.path.parent != Path(trace_dir):
+        _tracer = Tracer(trace_dir, Path(sys.argv[0]).name or 'python')
+    return _tracer
+
+@contextmanager
+def span(name: str, cat: str, **args):
+    """Record the enclosed block as one span (free when tracing is off)"""
+    active = tracer()
+    if not active:
+        yield args
+        return
+    start = now_us()
+    try:
+        yield args  # The block may add results to args
+    finally:
+        active.record(name, cat, start, args)
+
+# ---------------------------------------------------------------------------
+# Trace runs
+# ---------------------------------------------------------------------------
+
+def start_run(output_dir: str) -> Path:
+    """Create output/.traces/<timestamp>/; child processes join it through TRACE_DIR"""
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    trace_dir = Path(output_dir) / TRACES_DIRNAME / stamp
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    os.environ['TRACE_DIR'] = str(trace_dir)
+    return trace_dir
+
+def latest_trace_dir(output_dir: str) -> Optional[Path]:
+    root = Path(output_dir) / TRACES_DIRNAME
+    runs = sorted(p for p in root.iterdir() if p.is_dir()) if root.exists() else []
+    return runs[-1] if runs else None
+
+def merge(trace_dir: Path) -> List[Dict]:
+    """Merge every process's events into trace.json and return them"""
+    if _tracer and _tracer.path.parent == Path(trace_dir):
+        _tracer.flush()
+    events: List[Dict] = []
+    for events_file in sorted(Path(trace_dir).glob(f'*{EVENTS_SUFFIX}')):
+        with open(events_file, encoding='utf-8') as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    tmp_path = Path(trace_dir) / f'{TRACE_FILENAME}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+    os.replace(tmp_path, Path(trace_dir) / TRACE_FILENAME)
+    return events
+
+def summarize(events: List[Dict]) -> List[str]:
+    """Span count and time per category, and the wall time the run covers"""
+    spans = [e for e in events if e.get('ph') == 'X']
+    if not spans:
+        return ["No spans recorded"]
+    totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+    for event in spans:
+        totals[event['cat']][0] += 1
+        totals[event['cat']][1] += event['dur'] / 1e6
+    wall = (max(e['ts'] + e['dur'] for e in spans) - min(e['ts'] for e in spans)) / 1e6
+    processes = len({e['pid'] for e in spans})
+    lines = [f"{len(spans)} spans from {processes} process(es) over {wall:.1f}s"]
+    for cat, (count, seconds) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        lines.append(f"  {cat:<10} {count:>7} span(s) {seconds:9.2f}s")
+    return lines
+
+def print_summary(trace_dir: Path) -> None:
+    events = merge(trace_dir)
+    print("\n🧭 Trace: " + "\n".join(summarize(events)))
+    print(f"📁 Trace saved to: {Path(trace_dir) / TRACE_FILENAME} (open in chrome://tracing or ui.perfetto.dev)")
+
+def traced_main(name: str, main: Callable[[], object], output_dir: Optional[str] = None) -> Callable[[], object]:
+    """Wrap an entry point: one span for the whole process, and --trace starts a trace run
+
+    A trace run started here is merged and summarized once main() returns.
+    """
+    def run():
+        requested = '--trace' in sys.argv
+        if requested:
+            sys.argv.remove('--trace')
+        trace_dir = None
+        if requested and not os.getenv('TRACE_DIR'):
+            trace_dir = start_run(output_dir or os.getenv('OUTPUT_DIR', './output'))
+        try:
+            with span(name, 'process'):
+                return main()
+        finally:
+            if trace_dir:
+                print_summary(trace_dir)
+    return run
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge and summarize a --trace run')
+    parser.add_argument('trace_dir', nargs='?', help='Trace run directory (default: the latest one)')
+    parser.add_argument('--output', '-o', default=os.getenv('OUTPUT_DIR', './output'), help='Output directory')
+    args = parser.parse_args()
+
+    trace_dir = Path(args.trace_dir) if args.trace_dir else latest_trace_dir(args.output)
+    if not trace_dir or not trace_dir.exists():
+        print("ℹ️  No trace runs found. Run with --trace first.")
+        return 1
+    print_summary(trace_dir)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())